@@ -4,7 +4,7 @@ from app.core.database import get_db
 from app.api.dependencies import get_current_user
 from app.schemas.ai import AIHintRequest, AIHintResponse
 from app.models.user import User
-from app.models.quest import UserQuest
+from app.models.quest import ACTIVE_STATES, UserQuest
 from app.models.ai_run import AIRun
 from app.services.groq_client import groq_client
 import uuid
@@ -33,7 +33,7 @@ async def request_ai_hint(
             detail="Quest instance not found"
         )
     
-    if user_quest.state not in ["started", "ongoing"]:
+    if user_quest.state not in ACTIVE_STATES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Quest is not active"
@@ -1,116 +1,353 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
-from typing import List
+from sqlalchemy import desc, or_
+from typing import List, Optional, Tuple
 from datetime import datetime
+import base64
+import json
 from app.core.database import get_db
-from app.schemas.leaderboard import LeaderboardResponse, LeaderboardEntry
+from app.schemas.leaderboard import LeaderboardResponse, LeaderboardEntry, LeaderboardAroundResponse, LeaderboardBulkRequest, LeaderboardBulkResponse, QuestLeaderboardEntry, QuestLeaderboardResponse, XpPercentileResponse, XpQuantile, XpQuantilesResponse, XpHistogramBucket, XpHistogramResponse
 from app.models.user import User
-from app.models.quest import UserQuest
-from app.models.leaderboard import Leaderboard as LeaderboardModel
+from app.models.quest import Quest, UserQuest
+from app.services.leaderboard_store import LeaderboardStore, leaderboard_store
+from app.services.leaderboard_windows import window_leaderboards
+from app.services.leaderboard_cache import leaderboard_snapshots, snapshot_etag, etag_matches
+from app.services.xp_distribution import xp_distribution
 
 router = APIRouter()
 
 
+def encode_cursor(xp: int, user_id: str) -> str:
+    """Opaque keyset cursor for the entry a page ended on"""
+    raw = json.dumps([xp, user_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        xp, user_id = json.loads(base64.urlsafe_b64decode(padded))
+        return int(xp), str(user_id)
+    except (ValueError, TypeError, OverflowError):  # int() of an infinite float overflows
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def get_board(db: Session, window: str) -> LeaderboardStore:
+    """Loaded ranking store for the all-time board or the current window bucket"""
+    if window == "all":
+        leaderboard_store.ensure_loaded(db)
+        return leaderboard_store
+    return window_leaderboards.ensure_loaded(db, window)
+
+
+def to_entries(board: LeaderboardStore, stored_entries, first_position: int) -> List[LeaderboardEntry]:
+    """Response entries for consecutive store entries starting at first_position; tied players share a rank"""
+    entries = []
+    for position, entry in enumerate(stored_entries, first_position):
+        if not entries:
+            rank = board.xp_rank(entry.xp)
+        elif entry.xp != entries[-1].xp:
+            # Everyone ordered before this entry has more XP
+            rank = position
+        entries.append(LeaderboardEntry(
+            user_id=entry.user_id,
+            display_name=entry.display_name,
+            wallet_address=entry.wallet_address,
+            xp=entry.xp,
+            badges=entry.badges,
+            rank=rank
+        ))
+    return entries
+
+
+def build_leaderboard_page(board: LeaderboardStore, limit: int, cursor: Optional[str]) -> LeaderboardResponse:
+    """One leaderboard page from a loaded store"""
+    
+    # Keyset paging on (xp, user_id): locating the page is O(log n) at any depth
+    offset = 0
+    if cursor:
+        offset = board.position_after(*decode_cursor(cursor))
+    top_entries = board.top(limit, offset=offset)
+    entries = to_entries(board, top_entries, offset + 1)
+    
+    next_cursor = None
+    if top_entries and offset + len(top_entries) < board.count():
+        last = top_entries[-1]
+        next_cursor = encode_cursor(last.xp, last.user_id)
+    
+    return LeaderboardResponse(
+        entries=entries,
+        total=len(entries),
+        updated_at=datetime.now().isoformat(),
+        next_cursor=next_cursor
+    )
+
+
 @router.get("/", response_model=LeaderboardResponse)
 async def get_leaderboard(
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    window: str = Query("all", regex="^(all|daily|weekly|season)$"),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Get leaderboard of top players"""
+    """Get leaderboard of top players, paging deeper with the returned cursor"""
     
-    # Calculate XP for each user from completed quests
-    user_xp_query = db.query(
-        UserQuest.user_id,
-        func.sum(UserQuest.score).label('total_xp'),
-        func.count(UserQuest.id).label('quest_count')
-    ).filter(
-        UserQuest.state == "completed"
-    ).group_by(UserQuest.user_id).subquery()
+    # Served from the ranking store; the database is only read on a cold load
+    board = get_board(db, window)
     
-    # Get leaderboard entries with user info
-    leaderboard_entries = db.query(
-        User.id,
-        User.wallet_address,
-        User.display_name,
-        user_xp_query.c.total_xp,
-        user_xp_query.c.quest_count
-    ).join(
-        user_xp_query, User.id == user_xp_query.c.user_id
-    ).order_by(
-        desc(user_xp_query.c.total_xp)
-    ).limit(limit).all()
+    # Pages are cached per store version, which changes whenever XP does
+    snapshot_key = (board.name, board.version(), limit, cursor)
+    etag = snapshot_etag(snapshot_key)
     
-    # Convert to response format
-    entries = []
-    for rank, (user_id, wallet_address, display_name, total_xp, quest_count) in enumerate(leaderboard_entries, 1):
-        # Get badges from completed quests
-        badges = db.query(UserQuest.quest_id).filter(
-            UserQuest.user_id == user_id,
-            UserQuest.state == "completed"
-        ).all()
-        
-        badge_names = [f"quest_{quest_id}" for quest_id, in badges]
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
+    body = leaderboard_snapshots.get(snapshot_key)
+    if body is None:
+        body = build_leaderboard_page(board, limit, cursor).json().encode()
+        leaderboard_snapshots.put(snapshot_key, body)
+    
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+@router.get("/user/{user_id}")
+async def get_user_rank(
+    user_id: str,
+    window: str = Query("all", regex="^(all|daily|weekly|season)$"),
+    db: Session = Depends(get_db)
+):
+    """Get specific user's rank and stats"""
+    
+    board = get_board(db, window)
+    entry = board.get(user_id)
+    
+    if entry:
+        display_name = entry.display_name
+        wallet_address = entry.wallet_address
+        user_xp = entry.xp
+        badges = entry.badges
+        rank = board.rank(user_id)
+    else:
+        # Unranked users sit below everyone with completed quests
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            return {"error": "User not found"}
         
+        display_name = user.display_name
+        wallet_address = user.wallet_address
+        user_xp = 0
+        badges = []
+        rank = board.count() + 1
+    
+    return {
+        "user_id": str(user_id),
+        "display_name": display_name,
+        "wallet_address": wallet_address,
+        "xp": int(user_xp),
+        "rank": rank,
+        "badges": badges,
+        "completed_quests": len(badges)
+    }
+
+
+@router.get("/around/{user_id}", response_model=LeaderboardAroundResponse)
+async def get_leaderboard_around_user(
+    user_id: str,
+    radius: int = Query(5, ge=1, le=50),
+    window: str = Query("all", regex="^(all|daily|weekly|season)$"),
+    db: Session = Depends(get_db)
+):
+    """Get the players ranked just above and below a user"""
+    
+    board = get_board(db, window)
+    position = board.position(user_id)
+    
+    if position is None:
+        # Unranked users sit just below the last ranked player
+        if not db.query(User.id).filter(User.id == user_id).first():
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        position = rank = board.count() + 1
+    else:
+        rank = board.rank(user_id)
+    
+    # The window is sliced by board position, so tied neighbours still appear once each: O(log n + radius)
+    offset = max(position - 1 - radius, 0)
+    neighbours = board.top(position - offset + radius, offset=offset)
+    
+    return LeaderboardAroundResponse(
+        user_id=str(user_id),
+        rank=rank,
+        entries=to_entries(board, neighbours, offset + 1),
+        updated_at=datetime.now().isoformat()
+    )
+
+
+@router.post("/ranks", response_model=LeaderboardBulkResponse)
+async def get_bulk_ranks(
+    request: LeaderboardBulkRequest,
+    window: str = Query("all", regex="^(all|daily|weekly|season)$"),
+    db: Session = Depends(get_db)
+):
+    """Get xp, rank and badges for many users by id or wallet address"""
+    
+    board = get_board(db, window)
+    
+    # Resolve ids and wallets in a single query
+    users = []
+    if request.user_ids or request.wallet_addresses:
+        users = db.query(User.id, User.wallet_address, User.display_name).filter(or_(
+            User.id.in_(request.user_ids),
+            User.wallet_address.in_(request.wallet_addresses)
+        )).all()
+    
+    # ...and every rank in one batched store read
+    ranked = board.rank_many([str(user_id) for user_id, _, _ in users])
+    unranked_rank = board.count() + 1
+    
+    entries = []
+    for user_id, wallet_address, display_name in users:
+        entry, rank = ranked.get(str(user_id), (None, unranked_rank))
         entries.append(LeaderboardEntry(
             user_id=str(user_id),
             display_name=display_name,
             wallet_address=wallet_address,
-            xp=int(total_xp or 0),
-            badges=badge_names,
+            xp=entry.xp if entry else 0,
+            badges=entry.badges if entry else [],
             rank=rank
         ))
+    entries.sort(key=lambda entry: entry.rank)
     
-    return LeaderboardResponse(
+    found = {entry.user_id for entry in entries} | {entry.wallet_address for entry in entries}
+    not_found = [key for key in request.user_ids + request.wallet_addresses if key not in found]
+    
+    return LeaderboardBulkResponse(
+        entries=entries,
+        not_found=not_found,
+        updated_at=datetime.now().isoformat()
+    )
+
+
+def quest_top_scores_query(db: Session, quest_id: str, limit: int):
+    """Top completed runs for a quest, read in order from ix_user_quests_quest_state_score"""
+    return db.query(
+        UserQuest.id,
+        UserQuest.user_id,
+        UserQuest.score,
+        UserQuest.last_updated,
+        User.display_name,
+        User.wallet_address
+    ).join(
+        User, User.id == UserQuest.user_id
+    ).filter(
+        UserQuest.quest_id == quest_id,
+        UserQuest.state == "completed"
+    ).order_by(
+        desc(UserQuest.score)
+    ).limit(limit)
+
+
+@router.get("/quest/{quest_id}", response_model=QuestLeaderboardResponse)
+async def get_quest_leaderboard(
+    quest_id: str,
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Get the top scoring completed runs of a quest"""
+    
+    if not db.query(Quest.id).filter(Quest.id == quest_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Quest not found"
+        )
+    
+    runs = quest_top_scores_query(db, quest_id, limit).all()
+    
+    entries = [
+        QuestLeaderboardEntry(
+            user_quest_id=str(user_quest_id),
+            user_id=str(user_id),
+            display_name=display_name,
+            wallet_address=wallet_address,
+            score=float(score or 0),
+            rank=rank,
+            last_updated=last_updated
+        )
+        for rank, (user_quest_id, user_id, score, last_updated, display_name, wallet_address) in enumerate(runs, 1)
+    ]
+    
+    return QuestLeaderboardResponse(
+        quest_id=quest_id,
         entries=entries,
         total=len(entries),
         updated_at=datetime.now().isoformat()
     )
 
 
-@router.get("/user/{user_id}")
-async def get_user_rank(
+@router.get("/percentile/{user_id}", response_model=XpPercentileResponse)
+async def get_user_percentile(
     user_id: str,
     db: Session = Depends(get_db)
 ):
-    """Get specific user's rank and stats"""
+    """Get the share of players with at least a user's all-time XP"""
     
-    # Calculate user's total XP
-    user_xp = db.query(func.sum(UserQuest.score)).filter(
-        UserQuest.user_id == user_id,
-        UserQuest.state == "completed"
-    ).scalar() or 0
+    leaderboard_store.ensure_loaded(db)
+    xp_distribution.ensure_loaded(db)
     
-    # Count users with higher XP
-    higher_xp_count = db.query(func.count(User.id)).join(
-        UserQuest, User.id == UserQuest.user_id
-    ).filter(
-        UserQuest.state == "completed"
-    ).group_by(User.id).having(
-        func.sum(UserQuest.score) > user_xp
-    ).count()
+    entry = leaderboard_store.get(user_id)
+    if entry is None and not db.query(User.id).filter(User.id == user_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    xp = entry.xp if entry else 0
     
-    rank = higher_xp_count + 1
+    return XpPercentileResponse(
+        user_id=str(user_id),
+        xp=xp,
+        top_percent=xp_distribution.top_percent(xp),
+        total_players=xp_distribution.player_count()
+    )
+
+
+@router.get("/quantiles", response_model=XpQuantilesResponse)
+async def get_xp_quantiles(
+    q: List[float] = Query([0.5, 0.9, 0.99]),
+    db: Session = Depends(get_db)
+):
+    """Get approximate all-time XP at the requested quantiles"""
     
-    # Get user info
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        return {"error": "User not found"}
+    if any(not 0 <= fraction <= 1 for fraction in q):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Quantiles must be between 0 and 1"
+        )
     
-    # Get completed quests
-    completed_quests = db.query(UserQuest).filter(
-        UserQuest.user_id == user_id,
-        UserQuest.state == "completed"
-    ).all()
+    xp_distribution.ensure_loaded(db)
     
-    badges = [f"quest_{uq.quest_id}" for uq in completed_quests]
+    return XpQuantilesResponse(
+        quantiles=[XpQuantile(quantile=fraction, xp=xp) for fraction, xp in xp_distribution.quantiles(q).items()],
+        total_players=xp_distribution.player_count()
+    )
+
+
+@router.get("/histogram", response_model=XpHistogramResponse)
+async def get_xp_histogram(db: Session = Depends(get_db)):
+    """Get player counts per all-time XP range"""
     
-    return {
-        "user_id": str(user_id),
-        "display_name": user.display_name,
-        "wallet_address": user.wallet_address,
-        "xp": int(user_xp),
-        "rank": rank,
-        "badges": badges,
-        "completed_quests": len(completed_quests)
-    }
+    xp_distribution.ensure_loaded(db)
+    
+    return XpHistogramResponse(
+        buckets=[
+            XpHistogramBucket(min_xp=min_xp, max_xp=max_xp, players=players)
+            for min_xp, max_xp, players in xp_distribution.histogram()
+        ],
+        total_players=xp_distribution.player_count()
+    )
@@ -1,13 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
+from typing import List, Optional
 import secrets
 import json
 from app.core.database import get_db
 from app.api.dependencies import get_current_user
-from app.schemas.quest import QuestResponse, QuestStartRequest, QuestStartResponse, QuestActionRequest, QuestActionResponse, QuestStatusResponse
+from app.schemas.quest import QuestResponse, QuestStartRequest, QuestStartResponse, QuestActionRequest, QuestActionResponse, QuestActionBatchRequest, QuestActionBatchResponse, QuestStatusResponse
+from app.schemas.quest import MarketPool, QuestMarketResponse, YieldPool, YieldPoolPage
 from app.models.user import User
-from app.models.quest import Quest, UserQuest
+from app.models.quest import ACTIVE_STATES, Quest, UserQuest
+from app.services.leaderboard import record_quest_completion, publish_completion
+from app.services.leaderboard_windows import record_window_xp
+from app.services.market_graph import seeded_market
+from app.services.quest_catalog import quest_catalog
+from app.services.quest_log import append_action, compact_progress, current_progress
+from app.services.quest_rules import QuestRuleError, quest_validators
+from app.services.yield_screener import DEFAULT_POOL_COUNT, seeded_universe
+from app.websocket.rank_updates import push_rank_change
 
 router = APIRouter()
 
@@ -18,21 +29,20 @@ async def list_quests(
     db: Session = Depends(get_db)
 ):
     """List all active quests"""
-    quests = db.query(Quest).filter(Quest.active == True).all()
-    return quests
+    return Response(content=quest_catalog.get(db), media_type="application/json")
 
 
 @router.get("/public", response_model=List[QuestResponse])
 async def list_public_quests(db: Session = Depends(get_db)):
     """List all active quests for guest users"""
-    quests = db.query(Quest).filter(Quest.active == True).all()
-    return quests
+    return Response(content=quest_catalog.get(db), media_type="application/json")
 
 
 @router.post("/{quest_id}/start", response_model=QuestStartResponse)
 async def start_quest(
     quest_id: str,
     request: QuestStartRequest,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -50,7 +60,7 @@ async def start_quest(
     existing_quest = db.query(UserQuest).filter(
         UserQuest.user_id == current_user.id,
         UserQuest.quest_id == quest_id,
-        UserQuest.state.in_(["started", "ongoing"])
+        UserQuest.state.in_(ACTIVE_STATES)
     ).first()
     
     if existing_quest:
@@ -75,6 +85,9 @@ async def start_quest(
     db.commit()
     db.refresh(user_quest)
     
+    # Build the instance's seeded simulations after responding, while the player reads the quest
+    background_tasks.add_task(warm_quest_simulations, quest.id, quest.game_rules or {}, server_seed)
+    
     return QuestStartResponse(
         user_quest_id=str(user_quest.id),
         state=user_quest.state,
@@ -82,21 +95,17 @@ async def start_quest(
     )
 
 
-@router.post("/{quest_id}/action", response_model=QuestActionResponse)
-async def submit_action(
-    quest_id: str,
-    request: QuestActionRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Submit an action for a quest"""
-    
-    # Get user quest instance
-    user_quest = db.query(UserQuest).filter(
-        UserQuest.id == request.user_quest_id,
+def get_active_user_quest(db: Session, quest_id: str, user_quest_id: str, current_user: User) -> UserQuest:
+    """
+    Load an active quest instance owned by the user, with its quest in the same
+    query. The instance row stays locked until commit, so concurrent actions on
+    it take their log sequence numbers one at a time.
+    """
+    user_quest = db.query(UserQuest).options(joinedload(UserQuest.quest)).filter(
+        UserQuest.id == user_quest_id,
         UserQuest.user_id == current_user.id,
         UserQuest.quest_id == quest_id
-    ).first()
+    ).with_for_update(of=UserQuest).first()
     
     if not user_quest:
         raise HTTPException(
@@ -104,32 +113,83 @@ async def submit_action(
             detail="Quest instance not found"
         )
     
-    if user_quest.state not in ["started", "ongoing"]:
+    if user_quest.state not in ACTIVE_STATES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Quest is not active"
         )
     
-    # Get quest rules
+    return user_quest
+
+
+def commit_quest_update(db: Session, user_quest: UserQuest, current_user: User, background_tasks: BackgroundTasks,
+                        score: float, progress: dict, state: str):
+    """Store the new quest state, crediting XP and badge in the same transaction as a completion"""
+    try:
+        # Actions are already logged; the progress snapshot is only rewritten periodically and on completion
+        compact_progress(user_quest, progress, force=state == "completed")
+        user_quest.score = score
+        user_quest.state = state
+        
+        leaderboard_entry = None
+        if state == "completed":
+            leaderboard_entry = record_quest_completion(db, user_quest)
+            window_rows = record_window_xp(db, user_quest)
+            # A row created by this completion is a new player in the distribution
+            previous_xp = None if leaderboard_entry in db.new else leaderboard_entry.xp - int(score or 0)
+        
+        db.commit()
+    except IntegrityError:
+        # Where the row lock is not enforced (SQLite), a concurrent action can take the same log seq first
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Quest was updated by another request; retry the action"
+        )
+    db.refresh(user_quest)
+    
+    if leaderboard_entry is not None:
+        rank_change = publish_completion(current_user, leaderboard_entry, window_rows, previous_xp)
+        
+        # Push rank deltas to connected players instead of having them poll
+        if rank_change is not None:
+            background_tasks.add_task(push_rank_change, rank_change)
+
+
+@router.post("/{quest_id}/action", response_model=QuestActionResponse)
+async def submit_action(
+    quest_id: str,
+    request: QuestActionRequest,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Submit an action for a quest"""
+    
+    user_quest = get_active_user_quest(db, quest_id, request.user_quest_id, current_user)
     quest = user_quest.quest
-    game_rules = quest.game_rules or {}
     
     # Validate action against game rules
-    score, new_progress, new_state = validate_quest_action(
-        action=request.action,
-        payload=request.payload,
-        game_rules=game_rules,
-        current_progress=user_quest.progress or {},
-        server_seed=user_quest.server_seed
-    )
-    
-    # Update user quest
-    user_quest.progress = new_progress
-    user_quest.score = score
-    user_quest.state = new_state
+    progress = current_progress(db, user_quest)
+    try:
+        # Handlers run numpy simulations; keep them off the event loop
+        score, new_progress, new_state = await run_in_threadpool(
+            validate_quest_action,
+            action=request.action,
+            payload=request.payload,
+            game_rules=quest.game_rules or {},
+            current_progress=progress,
+            server_seed=user_quest.server_seed,
+            quest_id=quest.id
+        )
+    except QuestRuleError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    db.commit()
-    db.refresh(user_quest)
+    append_action(db, user_quest, request.action, request.payload, progress, new_progress, user_quest.score, score, new_state)
+    commit_quest_update(db, user_quest, current_user, background_tasks, score, new_progress, new_state)
     
     return QuestActionResponse(
         progress=new_progress,
@@ -138,6 +198,62 @@ async def submit_action(
     )
 
 
+@router.post("/{quest_id}/actions", response_model=QuestActionBatchResponse)
+async def submit_actions(
+    quest_id: str,
+    request: QuestActionBatchRequest,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Submit an ordered batch of actions for a quest, applied all-or-nothing in one transaction"""
+    
+    user_quest = get_active_user_quest(db, quest_id, request.user_quest_id, current_user)
+    quest = user_quest.quest
+    
+    # Nothing is written until every action has validated
+    progress = current_progress(db, user_quest)
+    score, state = user_quest.score, user_quest.state
+    results = []
+    logged = []
+    
+    for index, item in enumerate(request.actions):
+        if state == "completed":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Quest completed by action {index - 1}; remove the actions after it"
+            )
+        previous_progress, previous_score = progress, score
+        try:
+            score, progress, state = await run_in_threadpool(
+                validate_quest_action,
+                action=item.action,
+                payload=item.payload,
+                game_rules=quest.game_rules or {},
+                current_progress=progress,
+                server_seed=user_quest.server_seed,
+                quest_id=quest.id
+            )
+        except QuestRuleError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Action {index}: {e}"
+            )
+        results.append(QuestActionResponse(progress=progress, score=score, state=state))
+        logged.append((item, previous_progress, progress, previous_score, score, state))
+    
+    for item, previous_progress, new_progress, previous_score, new_score, new_state in logged:
+        append_action(db, user_quest, item.action, item.payload, previous_progress, new_progress, previous_score, new_score, new_state)
+    commit_quest_update(db, user_quest, current_user, background_tasks, score, progress, state)
+    
+    return QuestActionBatchResponse(
+        results=results,
+        progress=progress,
+        score=score,
+        state=state
+    )
+
+
 @router.get("/{user_quest_id}/status", response_model=QuestStatusResponse)
 async def get_quest_status(
     user_quest_id: str,
@@ -160,62 +276,78 @@ async def get_quest_status(
     return QuestStatusResponse(
         user_quest_id=str(user_quest.id),
         state=user_quest.state,
-        progress=user_quest.progress,
+        progress=current_progress(db, user_quest),
         score=user_quest.score,
         last_updated=user_quest.last_updated
     )
 
 
-def validate_quest_action(action: str, payload: dict, game_rules: dict, current_progress: dict, server_seed: str) -> tuple[float, dict, str]:
+@router.get("/{user_quest_id}/market", response_model=QuestMarketResponse)
+async def get_quest_market(
+    user_quest_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the seeded market and yield pools a quest instance's actions are scored against"""
+    
+    user_quest = db.query(UserQuest).options(joinedload(UserQuest.quest)).filter(
+        UserQuest.id == user_quest_id,
+        UserQuest.user_id == current_user.id
+    ).first()
+    
+    if not user_quest:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Quest instance not found"
+        )
+    
+    market = seeded_market(user_quest.server_seed)
+    pools = [
+        MarketPool(
+            tokens=[market.tokens[i], market.tokens[j]],
+            reserves=[float(market.reserves[i, j]), float(market.reserves[j, i])]
+        )
+        for i, j in zip(market.src, market.dst) if i < j
+    ]
+    
+    # Pool ids are positions in the universe, so a page is a slice of its columns
+    yield_pools = None
+    validator = quest_validators.get(user_quest.quest.id, user_quest.quest.game_rules or {})
+    yield_step = validator.dispatch.get("analyze_yield_opportunities")
+    if yield_step is not None:
+        universe = seeded_universe(user_quest.server_seed, int(yield_step.params.get("pool_count", DEFAULT_POOL_COUNT)))
+        page = range(min(offset, len(universe)), min(offset + limit, len(universe)))
+        yield_pools = YieldPoolPage(
+            total=len(universe),
+            offset=offset,
+            pools=[
+                YieldPool(id=pool, apy=float(universe.apy[pool]), tvl=float(universe.tvl[pool]), risk=float(universe.risk[pool]))
+                for pool in page
+            ]
+        )
+    
+    return QuestMarketResponse(
+        user_quest_id=str(user_quest.id),
+        tokens=list(market.tokens),
+        prices={token: float(market.value(i, 1.0)) for i, token in enumerate(market.tokens)},
+        fee=market.fee,
+        pools=pools,
+        yield_pools=yield_pools
+    )
+
+
+def validate_quest_action(action: str, payload: dict, game_rules: dict, current_progress: dict, server_seed: str,
+                          quest_id: Optional[str] = None) -> tuple[float, dict, str]:
     """
-    Validate quest action against game rules and return score, progress, and state
-    This is a simplified implementation - in production, you'd have more sophisticated validation
+    Validate quest action against game rules and return score, progress, and state.
+    Rules are compiled once per (quest_id, rules hash); see app.services.quest_rules.
     """
-    
-    # Default response
-    score = 0.0
-    new_progress = current_progress.copy()
-    new_state = "ongoing"
-    
-    # Example validation for liquidity kata quest
-    if action == "simulate_add_liquidity":
-        # Validate required parameters
-        if "pair" in payload and "amount" in payload:
-            pair = payload["pair"]
-            amount = payload["amount"]
-            
-            # Simple scoring based on amount and pair
-            if pair == "STX/sBTC" and amount >= 1:
-                score = 80.0
-                new_progress["liquidity_added"] = True
-                new_progress["pair"] = pair
-                new_progress["amount"] = amount
-                
-                # Check if quest is complete
-                if game_rules.get("type") == "liquidity-kata":
-                    new_state = "completed"
-                    score = 100.0
-    
-    elif action == "predict_price_move":
-        # Validate price prediction
-        if "prediction" in payload and "confidence" in payload:
-            prediction = payload["prediction"]
-            confidence = payload["confidence"]
-            
-            # Simple scoring based on confidence
-            score = min(confidence * 20, 100.0)
-            new_progress["price_predicted"] = True
-            new_progress["prediction"] = prediction
-            new_progress["confidence"] = confidence
-    
-    elif action == "submit_tx_proof":
-        # For real on-chain actions, validate transaction
-        if "txid" in payload:
-            txid = payload["txid"]
-            # In production, verify txid via Stacks API
-            new_progress["tx_submitted"] = True
-            new_progress["txid"] = txid
-            score = 100.0
-            new_state = "completed"
-    
-    return score, new_progress, new_state
+    validator = quest_validators.get(quest_id, game_rules)
+    return validator.validate(action, payload, current_progress, server_seed)
+
+
+def warm_quest_simulations(quest_id: str, game_rules: dict, server_seed: str):
+    """Precompute a new instance's seeded simulations; runs as a background task after /start responds"""
+    quest_validators.get(quest_id, game_rules).warm(server_seed)
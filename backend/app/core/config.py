@@ -10,6 +10,18 @@ class Settings(BaseSettings):
     # Redis
     redis_url: str = "redis://localhost:6379/0"
     
+    # Leaderboard ranking store: "memory" (single process) or "redis"
+    leaderboard_backend: str = "memory"
+    
+    # Seconds between checks for a leaderboard rewritten by another process (reconcile)
+    leaderboard_reload_check_seconds: int = 30
+    
+    # Seconds a cached quest catalog is served before it is reloaded
+    quest_catalog_ttl_seconds: int = 300
+    
+    # Actions logged between rewrites of a quest's progress snapshot
+    quest_progress_compact_every: int = 20
+    
     # Security
     secret_key: str = "your-secret-key-here"
     
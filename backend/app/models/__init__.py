@@ -1,14 +1,18 @@
 from .user import User
 from .quest import Quest, UserQuest
+from .quest_action import QuestAction
 from .ai_run import AIRun
-from .leaderboard import Leaderboard
+from .leaderboard import Leaderboard, LeaderboardRevision, LeaderboardWindow
 from .reward_transaction import RewardTransaction
 
 __all__ = [
     "User",
     "Quest", 
     "UserQuest",
+    "QuestAction",
     "AIRun",
     "Leaderboard",
+    "LeaderboardWindow",
+    "LeaderboardRevision",
     "RewardTransaction"
 ]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, BigInteger, ForeignKey
+from sqlalchemy import Column, String, DateTime, BigInteger, Integer, ForeignKey, Index
 from sqlalchemy.dialects.sqlite import JSON
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -9,9 +9,37 @@ class Leaderboard(Base):
     __tablename__ = "leaderboard"
     
     user_id = Column(String, ForeignKey("users.id"), primary_key=True)
-    xp = Column(BigInteger, default=0)
+    xp = Column(BigInteger, default=0, index=True)
     badges = Column(JSON, nullable=True)  # List of badge names
     updated_at = Column(DateTime, default=func.now())
     
     def __repr__(self):
         return f"<Leaderboard(user_id={self.user_id}, xp={self.xp})>"
+
+
+class LeaderboardWindow(Base):
+    __tablename__ = "leaderboard_windows"
+    __table_args__ = (
+        Index("ix_leaderboard_windows_bucket_xp", "period", "bucket", "xp"),
+    )
+    
+    period = Column(String, primary_key=True)  # 'daily', 'weekly', 'season'
+    bucket = Column(String, primary_key=True)  # '2026-10-17', '2026-W42', '2026-Q4'
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    xp = Column(BigInteger, default=0)
+    updated_at = Column(DateTime, default=func.now())
+    
+    def __repr__(self):
+        return f"<LeaderboardWindow(period={self.period}, bucket={self.bucket}, user_id={self.user_id}, xp={self.xp})>"
+
+
+class LeaderboardRevision(Base):
+    """Bumped whenever a job rewrites a table wholesale, so other processes know to reload it"""
+    __tablename__ = "leaderboard_revisions"
+    
+    name = Column(String, primary_key=True)  # 'leaderboard'
+    revision = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<LeaderboardRevision(name={self.name}, revision={self.revision})>"
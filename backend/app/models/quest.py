@@ -1,10 +1,14 @@
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, ForeignKey, Numeric
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, ForeignKey, Numeric, Index, text
 from sqlalchemy.dialects.sqlite import JSON
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 import uuid
 
+# Quest instance states that still accept actions
+ACTIVE_STATES = ("started", "ongoing")
+ACTIVE_STATES_SQL = text("state IN ('started', 'ongoing')")
+
 
 class Quest(Base):
     __tablename__ = "quests"
@@ -28,12 +32,26 @@ class Quest(Base):
 
 class UserQuest(Base):
     __tablename__ = "user_quests"
+    __table_args__ = (
+        # Per-quest leaderboards: top completed scores for one quest
+        Index("ix_user_quests_quest_state_score", "quest_id", "state", "score"),
+        # Keyset scans of completed runs per user (leaderboard rebuilds); also serves (state, user_id) lookups
+        Index("ix_user_quests_state_user", "state", "user_id", "id"),
+        # A user's instances of a quest by state (start_quest's "already started" check)
+        Index("ix_user_quests_user_quest_state", "user_id", "quest_id", "state"),
+        # Only active instances; stays small as quests complete. Planners match it only against literal
+        # states (PostgreSQL via psycopg2's client-side binding; SQLite with ACTIVE_STATES_SQL)
+        Index("ix_user_quests_active", "user_id", "quest_id",
+              sqlite_where=ACTIVE_STATES_SQL, postgresql_where=ACTIVE_STATES_SQL),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
     quest_id = Column(String, ForeignKey("quests.id"), nullable=False)
     state = Column(String, default="started")  # 'started', 'completed', 'failed'
-    progress = Column(JSON, nullable=True)
+    progress = Column(JSON, nullable=True)  # snapshot through action snapshot_seq; later actions are in quest_actions
+    action_count = Column(Integer, default=0)
+    snapshot_seq = Column(Integer, default=0)
     score = Column(Numeric, nullable=True)
     server_seed = Column(String, nullable=True)  # for deterministic simulation
     last_updated = Column(DateTime, default=func.now())
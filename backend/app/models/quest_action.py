@@ -0,0 +1,25 @@
+from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.sqlite import JSON
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class QuestAction(Base):
+    """One accepted quest action, appended in order and never updated"""
+    __tablename__ = "quest_actions"
+    __table_args__ = (
+        Index("ix_quest_actions_user_quest_seq", "user_quest_id", "seq", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_quest_id = Column(String, ForeignKey("user_quests.id"), nullable=False)
+    seq = Column(Integer, nullable=False)  # 1-based position in the quest instance's log
+    action = Column(String, nullable=False)
+    payload = Column(JSON, nullable=True)
+    progress_delta = Column(JSON, nullable=True)  # progress keys the action set
+    score_delta = Column(Float, default=0.0)
+    state = Column(String, nullable=False)  # quest state after the action
+    created_at = Column(DateTime, default=func.now())
+    
+    def __repr__(self):
+        return f"<QuestAction(user_quest_id={self.user_quest_id}, seq={self.seq}, action={self.action})>"
@@ -1,8 +1,8 @@
 from .auth import NonceRequest, VerifyRequest, AuthResponse
-from .quest import QuestResponse, QuestStartRequest, QuestActionRequest, QuestStatusResponse
+from .quest import QuestResponse, QuestStartRequest, QuestActionRequest, QuestActionBatchRequest, QuestActionBatchResponse, QuestStatusResponse
 from .ai import AIHintRequest, AIHintResponse
 from .rewards import RewardPrepareRequest, RewardExecuteRequest, RewardStatusResponse
-from .leaderboard import LeaderboardResponse
+from .leaderboard import LeaderboardResponse, LeaderboardAroundResponse, LeaderboardBulkRequest, LeaderboardBulkResponse, QuestLeaderboardResponse, XpPercentileResponse, XpQuantilesResponse, XpHistogramResponse
 from .user import UserResponse
 
 __all__ = [
@@ -12,6 +12,8 @@ __all__ = [
     "QuestResponse",
     "QuestStartRequest",
     "QuestActionRequest",
+    "QuestActionBatchRequest",
+    "QuestActionBatchResponse",
     "QuestStatusResponse",
     "AIHintRequest",
     "AIHintResponse",
@@ -19,5 +21,12 @@ __all__ = [
     "RewardExecuteRequest",
     "RewardStatusResponse",
     "LeaderboardResponse",
+    "LeaderboardAroundResponse",
+    "LeaderboardBulkRequest",
+    "LeaderboardBulkResponse",
+    "QuestLeaderboardResponse",
+    "XpPercentileResponse",
+    "XpQuantilesResponse",
+    "XpHistogramResponse",
     "UserResponse"
 ]
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, conlist
 from typing import List, Optional, Dict, Any
+from datetime import datetime
 
 
 class LeaderboardEntry(BaseModel):
@@ -15,3 +16,67 @@ class LeaderboardResponse(BaseModel):
     entries: List[LeaderboardEntry]
     total: int
     updated_at: str
+    next_cursor: Optional[str] = None
+
+
+class LeaderboardAroundResponse(BaseModel):
+    user_id: str
+    rank: int
+    entries: List[LeaderboardEntry]
+    updated_at: str
+
+
+class LeaderboardBulkRequest(BaseModel):
+    user_ids: conlist(str, max_items=500) = []
+    wallet_addresses: conlist(str, max_items=500) = []
+
+
+class LeaderboardBulkResponse(BaseModel):
+    entries: List[LeaderboardEntry]
+    not_found: List[str]
+    updated_at: str
+
+
+class QuestLeaderboardEntry(BaseModel):
+    user_quest_id: str
+    user_id: str
+    display_name: Optional[str]
+    wallet_address: str
+    score: float
+    rank: int
+    last_updated: Optional[datetime]
+
+
+class QuestLeaderboardResponse(BaseModel):
+    quest_id: str
+    entries: List[QuestLeaderboardEntry]
+    total: int
+    updated_at: str
+
+
+class XpPercentileResponse(BaseModel):
+    user_id: str
+    xp: int
+    top_percent: float
+    total_players: int
+
+
+class XpQuantile(BaseModel):
+    quantile: float
+    xp: int
+
+
+class XpQuantilesResponse(BaseModel):
+    quantiles: List[XpQuantile]
+    total_players: int
+
+
+class XpHistogramBucket(BaseModel):
+    min_xp: int
+    max_xp: Optional[int]
+    players: int
+
+
+class XpHistogramResponse(BaseModel):
+    buckets: List[XpHistogramBucket]
+    total_players: int
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from pydantic import BaseModel, conlist
+from typing import List, Optional, Dict, Any
 from datetime import datetime
 
 
@@ -39,6 +39,51 @@ class QuestActionResponse(BaseModel):
     state: str
 
 
+class QuestActionItem(BaseModel):
+    action: str
+    payload: Dict[str, Any]
+    signature: Optional[str] = None
+
+
+class QuestActionBatchRequest(BaseModel):
+    user_quest_id: str
+    actions: conlist(QuestActionItem, min_items=1, max_items=50)
+
+
+class QuestActionBatchResponse(BaseModel):
+    results: List[QuestActionResponse]  # state after each action, in order
+    progress: Dict[str, Any]
+    score: Optional[float]
+    state: str
+
+
+class MarketPool(BaseModel):
+    tokens: List[str]  # the pair, in market order
+    reserves: List[float]  # reserve of each token, same order
+
+
+class YieldPool(BaseModel):
+    id: int  # the id analyze_yield_opportunities picks by
+    apy: float  # percent
+    tvl: float  # USD
+    risk: float  # 0 (safe) .. 1
+
+
+class YieldPoolPage(BaseModel):
+    total: int
+    offset: int
+    pools: List[YieldPool]
+
+
+class QuestMarketResponse(BaseModel):
+    user_quest_id: str
+    tokens: List[str]
+    prices: Dict[str, float]  # mid price of each token in the numeraire
+    fee: float
+    pools: List[MarketPool]
+    yield_pools: Optional[YieldPoolPage]  # only for quests that screen yield pools
+
+
 class QuestStatusResponse(BaseModel):
     user_quest_id: str
     state: str
@@ -0,0 +1,152 @@
+"""
+Constant-product AMM simulation
+
+Pools follow the x * y = k invariant with a swap fee taken on the input
+token, Uniswap v2 style. A quest instance's pool and its price path both come
+from the instance's server seed (see app.services.price_paths), so the
+outcome of providing liquidity is fixed and replayable.
+
+Holding a position over a price path is simulated in closed form over the
+whole path at once: arbitrageurs keep the pool on the market price, so the
+reserves at each step follow from k and the price, and the fees are taken on
+each step's arbitrage input.
+"""
+from dataclasses import dataclass
+from math import sqrt
+from typing import Optional, Tuple
+import numpy as np
+from app.services.price_paths import PathModel, seeded_rng, simulate_price_path
+
+
+class Pool:
+    """Constant-product pool of token X priced in token Y"""
+
+    __slots__ = ("reserve_x", "reserve_y", "fee", "total_shares")
+
+    def __init__(self, reserve_x: float, reserve_y: float, fee: float = 0.003, total_shares: Optional[float] = None):
+        self.reserve_x = reserve_x
+        self.reserve_y = reserve_y
+        self.fee = fee
+        self.total_shares = sqrt(reserve_x * reserve_y) if total_shares is None else total_shares
+
+    @property
+    def price(self) -> float:
+        """Price of X in Y"""
+        return self.reserve_y / self.reserve_x
+
+    def quote_x_for_y(self, amount_x: float) -> float:
+        """Y received for selling amount_x of X"""
+        effective = amount_x * (1 - self.fee)
+        return self.reserve_y * effective / (self.reserve_x + effective)
+
+    def swap_x_for_y(self, amount_x: float) -> float:
+        amount_y = self.quote_x_for_y(amount_x)
+        self.reserve_x += amount_x
+        self.reserve_y -= amount_y
+        return amount_y
+
+    def swap_y_for_x(self, amount_y: float) -> float:
+        effective = amount_y * (1 - self.fee)
+        amount_x = self.reserve_x * effective / (self.reserve_y + effective)
+        self.reserve_y += amount_y
+        self.reserve_x -= amount_x
+        return amount_x
+
+    def add_liquidity(self, amount_x: float, amount_y: float) -> Tuple[float, float, float]:
+        """
+        Deposit at the pool ratio and mint LP shares.
+        Returns (shares, used_x, used_y); the unused side of an unbalanced deposit is refunded.
+        """
+        used_x = min(amount_x, amount_y / self.price)
+        used_y = used_x * self.price
+        shares = self.total_shares * used_x / self.reserve_x
+
+        self.reserve_x += used_x
+        self.reserve_y += used_y
+        self.total_shares += shares
+        return shares, used_x, used_y
+
+    def remove_liquidity(self, shares: float) -> Tuple[float, float]:
+        """Burn LP shares for their slice of both reserves"""
+        fraction = shares / self.total_shares
+        amount_x, amount_y = self.reserve_x * fraction, self.reserve_y * fraction
+
+        self.reserve_x -= amount_x
+        self.reserve_y -= amount_y
+        self.total_shares -= shares
+        return amount_x, amount_y
+
+
+def impermanent_loss(price_ratio) -> np.ndarray:
+    """LP value relative to holding, minus 1, at each price ratio to the entry price (fees excluded)"""
+    price_ratio = np.asarray(price_ratio, dtype=float)
+    return 2 * np.sqrt(price_ratio) / (1 + price_ratio) - 1
+
+
+def seeded_pool(server_seed: str, pair: str, fee: float = 0.003, liquidity_x: float = 1_000_000.0) -> Pool:
+    """A quest instance's starting pool for a pair"""
+    rng = seeded_rng(server_seed, "amm-pool", pair)
+    reserve_x = liquidity_x * rng.uniform(0.5, 2.0)
+    price = float(rng.lognormal(0.0, 0.5))
+    return Pool(reserve_x, reserve_x * price, fee=fee)
+
+
+@dataclass
+class LiquidityOutcome:
+    shares: float
+    pool_share: float
+    deposit_value: float  # value of the tokens offered, in Y at entry
+    used_fraction: float  # share of the offered value actually deposited
+    hodl_value: float  # deposited tokens held instead, in Y at exit
+    lp_value: float  # position reserves at exit, in Y
+    fees_earned: float  # the position's share of arbitrage fees, in Y
+    impermanent_loss: float  # at exit, fees excluded
+
+    @property
+    def value_vs_hodl(self) -> float:
+        return (self.lp_value + self.fees_earned) / self.hodl_value if self.hodl_value else 0.0
+
+
+def simulate_liquidity_position(pool: Pool, amount_x: float, amount_y: Optional[float], path: np.ndarray) -> LiquidityOutcome:
+    """
+    Add liquidity to `pool`, then hold while the market follows `path`
+    (prices relative to entry). Omitting amount_y deposits the matching Y.
+    The pool is left holding the position at its entry state.
+    """
+    entry_price = pool.price
+    offered_y = amount_x * entry_price if amount_y is None else amount_y
+    deposit_value = amount_x * entry_price + offered_y
+
+    shares, used_x, used_y = pool.add_liquidity(amount_x, offered_y)
+    pool_share = shares / pool.total_shares
+
+    # Arbitrage keeps the pool on the market price: x = sqrt(k / p), y = sqrt(k * p)
+    k = pool.reserve_x * pool.reserve_y
+    prices = entry_price * path
+    reserves_x = np.sqrt(k / prices)
+    reserves_y = np.sqrt(k * prices)
+
+    # Each step's arbitrage pays the fee on whichever token flows in
+    inflow_x = np.clip(np.diff(reserves_x), 0, None)
+    inflow_y = np.clip(np.diff(reserves_y), 0, None)
+    pool_fees = pool.fee * (inflow_x * prices[1:] + inflow_y).sum()
+
+    exit_price = prices[-1]
+    return LiquidityOutcome(
+        shares=shares,
+        pool_share=pool_share,
+        deposit_value=deposit_value,
+        used_fraction=(used_x * entry_price + used_y) / deposit_value if deposit_value else 0.0,
+        hodl_value=used_x * exit_price + used_y,
+        lp_value=pool_share * (reserves_x[-1] * exit_price + reserves_y[-1]),
+        fees_earned=pool_share * pool_fees,
+        impermanent_loss=float(impermanent_loss(path[-1]))
+    )
+
+
+def simulate_add_liquidity(server_seed: str, pair: str, amount_x: float, amount_y: Optional[float] = None,
+                           hold_minutes: int = 60, fee: float = 0.003, model: PathModel = PathModel()) -> LiquidityOutcome:
+    """Seeded pool and price path for a quest instance, then the position's outcome"""
+    pool = seeded_pool(server_seed, pair, fee=fee)
+    path = simulate_price_path(server_seed, hold_minutes, model)
+    return simulate_liquidity_position(pool, amount_x, amount_y, path)
@@ -0,0 +1,218 @@
+"""
+Flash-loan strategy simulator
+
+A strategy is a list of borrow, swap and repay ops executed as one
+transaction against a quest instance's seeded market (see
+app.services.market_graph). Every op is charged gas from GAS_COSTS; the
+transaction reverts if an op fails, gas runs past the limit, or a loan is
+still open at the end.
+
+Swaps move pool reserves, so each run works on a PoolSnapshot: a
+copy-on-write view over the market's read-only reserve matrix that records
+only the pools it has touched. Evaluating a strategy, or forking one
+snapshot into many candidates, copies a few touched pools, never the market.
+"""
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import math
+import numpy as np
+from app.services.market_graph import MarketGraph, seeded_market
+
+FLASH_LOAN_FEE = 0.0009
+MAX_OPS = 20
+
+GAS_COSTS = {
+    "transaction": 21_000,
+    "borrow": 60_000,
+    "swap": 90_000,
+    "repay": 40_000
+}
+
+
+class StrategyReverted(Exception):
+    """A strategy op failed and the whole transaction reverts"""
+
+    def __init__(self, step: int, reason: str):
+        super().__init__(f"step {step}: {reason}")
+        self.step = step
+        self.reason = reason
+
+
+class PoolSnapshot:
+    """Copy-on-write pool reserves over a market's shared reserve matrix"""
+
+    __slots__ = ("market", "_touched")
+
+    def __init__(self, market: MarketGraph, touched: Optional[Dict[Tuple[int, int], Tuple[float, float]]] = None):
+        self.market = market
+        self._touched = touched if touched is not None else {}
+
+    def fork(self) -> "PoolSnapshot":
+        return PoolSnapshot(self.market, dict(self._touched))
+
+    def commit(self, fork: "PoolSnapshot"):
+        """Adopt a fork's pool state"""
+        self._touched = fork._touched
+
+    def reserves(self, i: int, j: int) -> Tuple[float, float]:
+        """(reserve of i, reserve of j) in the i/j pool"""
+        key = (min(i, j), max(i, j))
+        if key in self._touched:
+            low, high = self._touched[key]
+            return (low, high) if i < j else (high, low)
+        return float(self.market.reserves[i, j]), float(self.market.reserves[j, i])
+
+    def swap(self, i: int, j: int, amount_in: float) -> float:
+        """Sell amount_in of token i for token j, moving only this snapshot's reserves"""
+        reserve_in, reserve_out = self.reserves(i, j)
+        effective = amount_in * (1 - self.market.fee)
+        amount_out = reserve_out * effective / (reserve_in + effective)
+
+        reserve_in, reserve_out = reserve_in + amount_in, reserve_out - amount_out
+        self._touched[(min(i, j), max(i, j))] = (reserve_in, reserve_out) if i < j else (reserve_out, reserve_in)
+        return amount_out
+
+
+@dataclass
+class StrategyResult:
+    success: bool
+    gas_used: int
+    profit: float = 0.0  # value left after repaying, in the market numeraire
+    balances: Dict[str, float] = field(default_factory=dict)
+    failure: Optional[str] = None
+    failed_step: Optional[int] = None
+
+
+def _amount(op: dict, step: int, default: float) -> float:
+    if "amount" not in op:
+        return default
+    try:
+        amount = float(op["amount"])
+    except (TypeError, ValueError):
+        raise StrategyReverted(step, "amount must be a number")
+    # NaN fails every comparison, so it would pass the checks below and every debt check after them
+    if not math.isfinite(amount):
+        raise StrategyReverted(step, "amount must be a finite number")
+    if amount <= 0:
+        raise StrategyReverted(step, "amount must be positive")
+    return amount
+
+
+class StrategyRun:
+    """One transaction's balances, open loans and gas while its ops execute"""
+
+    def __init__(self, snapshot: PoolSnapshot, max_gas: int):
+        self.snapshot = snapshot
+        self.market = snapshot.market
+        self.max_gas = max_gas
+        self.gas = GAS_COSTS["transaction"]
+        self.balances: Dict[int, float] = {}
+        self.debts: Dict[int, float] = {}
+
+    def execute(self, ops: List[dict]):
+        """Apply ops in order; raises StrategyReverted"""
+        if len(ops) > MAX_OPS:
+            raise StrategyReverted(MAX_OPS, f"at most {MAX_OPS} ops")
+
+        for step, op in enumerate(ops):
+            kind = op.get("op") if isinstance(op, dict) else None
+            if kind not in ("borrow", "swap", "repay"):
+                raise StrategyReverted(step, f"unknown op: {kind}")
+            self.gas += GAS_COSTS[kind]
+            if self.gas > self.max_gas:
+                raise StrategyReverted(step, f"out of gas ({self.gas} > {self.max_gas})")
+            getattr(self, kind)(step, op)
+
+        open_loans = [self.market.tokens[token] for token, owed in self.debts.items() if owed > 1e-12]
+        if open_loans:
+            raise StrategyReverted(len(ops), f"flash loan not repaid: {', '.join(open_loans)}")
+
+    def token(self, op: dict, name: str, step: int) -> int:
+        token = op.get(name)
+        if token not in self.market.index:
+            raise StrategyReverted(step, f"unknown token: {token}")
+        return self.market.index[token]
+
+    def borrow(self, step: int, op: dict):
+        token = self.token(op, "token", step)
+        if "amount" not in op:
+            raise StrategyReverted(step, "borrow needs an amount")
+        amount = _amount(op, step, 0.0)
+        self.balances[token] = self.balances.get(token, 0.0) + amount
+        self.debts[token] = self.debts.get(token, 0.0) + amount * (1 + FLASH_LOAN_FEE)
+
+    def swap(self, step: int, op: dict):
+        """Swaps the whole balance of the source token unless an amount is given"""
+        source, target = self.token(op, "from", step), self.token(op, "to", step)
+        if self.market.rates[source, target] <= 0:
+            raise StrategyReverted(step, f"no pool for {self.market.tokens[source]}/{self.market.tokens[target]}")
+        available = self.balances.get(source, 0.0)
+        amount = _amount(op, step, available)
+        if amount <= 0 or amount > available * (1 + 1e-12):
+            raise StrategyReverted(step, f"insufficient {self.market.tokens[source]} balance")
+        self.balances[source] = max(available - amount, 0.0)
+        self.balances[target] = self.balances.get(target, 0.0) + self.snapshot.swap(source, target, amount)
+
+    def repay(self, step: int, op: dict):
+        """Repays the whole debt, fee included, unless an amount is given"""
+        token = self.token(op, "token", step)
+        owed = self.debts.get(token, 0.0)
+        if owed <= 0:
+            raise StrategyReverted(step, f"no {self.market.tokens[token]} loan to repay")
+        amount = min(_amount(op, step, owed), owed)
+        available = self.balances.get(token, 0.0)
+        if amount > available * (1 + 1e-12):
+            raise StrategyReverted(step, f"insufficient {self.market.tokens[token]} balance to repay")
+        self.balances[token] = max(available - amount, 0.0)
+        self.debts[token] = owed - amount
+
+
+def simulate_strategy(snapshot: PoolSnapshot, ops: List[dict], max_gas: int = 500_000) -> StrategyResult:
+    """
+    Execute a strategy against a snapshot. On success the snapshot holds the
+    pools after the trade; a reverted strategy leaves it untouched.
+    """
+    run = StrategyRun(snapshot.fork(), max_gas)
+    try:
+        run.execute(ops)
+    except StrategyReverted as e:
+        return StrategyResult(False, min(run.gas, max_gas), failure=e.reason, failed_step=e.step)
+
+    snapshot.commit(run.snapshot)
+    market = snapshot.market
+    return StrategyResult(
+        success=True,
+        gas_used=run.gas,
+        profit=sum(market.value(token, amount) for token, amount in run.balances.items()),
+        balances={market.tokens[token]: amount for token, amount in run.balances.items() if amount > 0}
+    )
+
+
+def strategy_gas(swaps: int) -> int:
+    """Gas for a single borrow, `swaps` swaps and a repay"""
+    return GAS_COSTS["transaction"] + GAS_COSTS["borrow"] + swaps * GAS_COSTS["swap"] + GAS_COSTS["repay"]
+
+
+@lru_cache(maxsize=1024)
+def best_flash_loan(server_seed: str, max_gas: int = 500_000, samples: int = 256) -> Tuple[float, int]:
+    """
+    (profit, gas) of the best single-loop flash loan within max_gas: borrow
+    the loop's first token, swap around it and repay, at the best size on a
+    geometric grid. (0.0, 0) when no loop clears the loan fee.
+    """
+    market = seeded_market(server_seed)
+    best_profit, best_gas = 0.0, 0
+
+    for _, cycle in market.arbitrage_cycles:
+        gas = strategy_gas(len(cycle) - 1)
+        if gas > max_gas:
+            continue
+        depth = market.reserves[cycle[0], cycle[1]]
+        amounts = np.geomspace(depth * 1e-7, depth * 0.2, samples)
+        profits = market.quote(cycle, amounts) - amounts * (1 + FLASH_LOAN_FEE)
+        profit = market.value(cycle[0], float(profits.max()))
+        if profit > best_profit:
+            best_profit, best_gas = profit, gas
+
+    return best_profit, best_gas
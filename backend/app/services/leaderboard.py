@@ -0,0 +1,214 @@
+"""
+Materialized leaderboard maintenance
+
+The `leaderboard` table holds each user's running XP total and badge list so
+the public leaderboard endpoints never have to aggregate `user_quests`.
+Rows are updated incrementally when a quest completes, inside the caller's
+transaction.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+from sqlalchemy import Float, func, tuple_, type_coerce
+from sqlalchemy.orm import Session
+from app.models.leaderboard import Leaderboard, LeaderboardWindow
+from app.models.quest import UserQuest
+from app.models.user import User
+from app.services.leaderboard_store import bump_leaderboard_revision, entry_from_rows, leaderboard_store
+from app.services.leaderboard_windows import window_leaderboards
+from app.services.xp_distribution import xp_distribution
+
+
+@dataclass
+class RankChange:
+    user_id: str
+    xp: int
+    previous_rank: Optional[int]  # None when the user was not ranked before
+    rank: int
+    previous_xp: Optional[int] = None  # None when the user was not ranked before
+
+
+def badge_name(quest_id) -> str:
+    """Badge name awarded for completing a quest"""
+    return f"quest_{quest_id}"
+
+
+def record_quest_completion(db: Session, user_quest: UserQuest) -> Leaderboard:
+    """
+    Add a completed quest's score and badge to the user's leaderboard row.
+    Does not commit - the caller commits this together with the quest update.
+    """
+    score = int(user_quest.score or 0)
+    badge = badge_name(user_quest.quest_id)
+    now = datetime.utcnow()
+
+    # Increment in SQL so concurrent completions by one user cannot overwrite each other's XP;
+    # the UPDATE also holds the row until commit, so the badge append below is not lost either
+    updated = db.query(Leaderboard).filter(Leaderboard.user_id == user_quest.user_id).update(
+        {Leaderboard.xp: func.coalesce(Leaderboard.xp, 0) + score, Leaderboard.updated_at: now},
+        synchronize_session=False
+    )
+    if not updated:
+        entry = Leaderboard(user_id=user_quest.user_id, xp=score, badges=[badge], updated_at=now)
+        db.add(entry)
+        return entry
+
+    entry = db.query(Leaderboard).populate_existing().filter(Leaderboard.user_id == user_quest.user_id).one()
+    # Reassign rather than append so the JSON column is flagged dirty
+    entry.badges = list(entry.badges or []) + [badge]
+    return entry
+
+
+def publish_completion(user: User, entry: Leaderboard, window_rows: List[LeaderboardWindow],
+                       previous_xp: Optional[int] = None) -> Optional[RankChange]:
+    """
+    Push a committed completion into the all-time and window ranking stores
+    and the XP distribution. previous_xp is None for a player's first entry.
+    Returns how the user's all-time rank moved, or None if the store was cold
+    and there is no previous rank to compare against.
+    """
+    was_loaded = leaderboard_store.is_loaded()
+    previous_rank = leaderboard_store.rank(user.id)
+    leaderboard_store.upsert(entry_from_rows(user, entry))
+    xp_distribution.record(previous_xp, int(entry.xp))
+
+    for row in window_rows:
+        window_leaderboards.upsert(row.period, row.bucket, entry_from_rows(user, entry, xp=row.xp))
+
+    if not was_loaded:
+        return None
+
+    return RankChange(
+        user_id=str(user.id),
+        xp=int(entry.xp),
+        previous_rank=previous_rank,
+        rank=leaderboard_store.rank(user.id),
+        previous_xp=previous_xp if previous_rank is not None else None
+    )
+
+
+def iter_completed_totals(db: Session, chunk_size: int = 10_000) -> Iterator[Tuple[str, int, List[str]]]:
+    """
+    Stream (user_id, xp, badges) per user from completed quests, in user id
+    order. Rows are read in keyset-paginated chunks on (user_id, id), so
+    memory is bounded by the chunk size rather than the table size.
+    """
+    last_key = None
+    current_user, xp, badges = None, 0, []
+
+    while True:
+        # Read scores as floats: Decimal conversion dominates the row cost
+        query = db.query(UserQuest.user_id, UserQuest.id, UserQuest.quest_id, type_coerce(UserQuest.score, Float)).filter(
+            UserQuest.state == "completed"
+        )
+        if last_key is not None:
+            # Row-value comparison: an index seek, where the equivalent OR expansion rescans from the start
+            query = query.filter(tuple_(UserQuest.user_id, UserQuest.id) > tuple_(*last_key))
+        rows = query.order_by(UserQuest.user_id, UserQuest.id).limit(chunk_size).all()
+        if not rows:
+            break
+
+        for user_id, _, quest_id, score in rows:
+            if user_id != current_user:
+                if current_user is not None:
+                    yield current_user, xp, badges
+                current_user, xp, badges = user_id, 0, []
+            xp += int(score or 0)
+            badges.append(badge_name(quest_id))
+
+        last_key = (rows[-1][0], rows[-1][1])
+
+    if current_user is not None:
+        yield current_user, xp, badges
+
+
+@dataclass
+class ReconcileReport:
+    users: int = 0
+    inserted: int = 0
+    updated: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    # (user_id, stored xp or None, recomputed xp or None) for the first drifted users
+    samples: List[Tuple[str, Optional[int], Optional[int]]] = field(default_factory=list)
+
+    @property
+    def drifted(self) -> int:
+        return self.inserted + self.updated + self.removed
+
+
+def reconcile_leaderboard(db: Session, chunk_size: int = 10_000, dry_run: bool = False,
+                          max_samples: int = 20) -> ReconcileReport:
+    """
+    Recompute leaderboard rows from completed quests and write only the rows
+    that drifted. Works through users in chunks, committing each one, so no
+    long-running transaction holds the database.
+    """
+    report = ReconcileReport()
+    now = datetime.utcnow()
+
+    def sample(user_id, stored, recomputed):
+        if len(report.samples) < max_samples:
+            report.samples.append((user_id, stored, recomputed))
+
+    def apply(batch: List[Tuple[str, int, List[str]]], low: Optional[str], high: Optional[str]):
+        # Stored rows for the whole key range, so users who lost every completion show up too
+        query = db.query(Leaderboard.user_id, Leaderboard.xp, Leaderboard.badges)
+        if low is not None:
+            query = query.filter(Leaderboard.user_id > low)
+        if high is not None:
+            query = query.filter(Leaderboard.user_id <= high)
+        stored = {user_id: (xp, badges) for user_id, xp, badges in query}
+
+        inserts, updates = [], []
+        for user_id, xp, badges in batch:
+            row = stored.pop(user_id, None)
+            if row is None:
+                inserts.append({"user_id": user_id, "xp": xp, "badges": badges, "updated_at": now})
+                sample(user_id, None, xp)
+            elif row[0] != xp or sorted(row[1] or []) != sorted(badges):
+                updates.append({"user_id": user_id, "xp": xp, "badges": badges, "updated_at": now})
+                sample(user_id, row[0], xp)
+            else:
+                report.unchanged += 1
+
+        for user_id, (xp, _) in stored.items():
+            sample(user_id, xp, None)
+
+        report.users += len(batch)
+        report.inserted += len(inserts)
+        report.updated += len(updates)
+        report.removed += len(stored)
+
+        if dry_run:
+            return
+        db.bulk_insert_mappings(Leaderboard, inserts)
+        db.bulk_update_mappings(Leaderboard, updates)
+        if stored:
+            db.query(Leaderboard).filter(Leaderboard.user_id.in_(list(stored))).delete(synchronize_session=False)
+        db.commit()
+
+    batch, low = [], None
+    for totals in iter_completed_totals(db, chunk_size):
+        batch.append(totals)
+        if len(batch) >= chunk_size:
+            apply(batch, low, batch[-1][0])
+            batch, low = [], batch[-1][0]
+    apply(batch, low, None)
+
+    if report.drifted and not dry_run:
+        # Running servers reload their in-process stores once they see the new revision
+        bump_leaderboard_revision(db)
+        db.commit()
+        leaderboard_store.clear()
+        xp_distribution.clear()
+
+    return report
+
+
+def rebuild_leaderboard(db: Session) -> int:
+    """
+    Recompute every leaderboard row from completed quests.
+    Used to backfill the table for data written before it was maintained.
+    """
+    return reconcile_leaderboard(db).users
@@ -0,0 +1,56 @@
+"""
+Serialized leaderboard page cache
+
+The leaderboard is polled far more often than it changes. Pages are cached
+as JSON bytes keyed by the ranking store's name and version plus the page
+parameters, so a repeat poll costs neither serialization nor a store scan,
+and an ETag derived from the same key lets clients revalidate with 304s.
+"""
+from collections import OrderedDict
+from threading import Lock
+from typing import Hashable, Optional
+import hashlib
+
+
+def snapshot_etag(key: Hashable) -> str:
+    """Strong ETag for a snapshot key"""
+    return '"' + hashlib.sha1(repr(key).encode()).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names the current ETag"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+class SnapshotCache:
+    """Bounded LRU of serialized response bodies"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._bodies: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is not None:
+                self._bodies.move_to_end(key)
+            return body
+
+    def put(self, key: Hashable, body: bytes):
+        with self._lock:
+            self._bodies[key] = body
+            self._bodies.move_to_end(key)
+            while len(self._bodies) > self.max_entries:
+                self._bodies.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._bodies.clear()
+
+
+# Global leaderboard page cache
+leaderboard_snapshots = SnapshotCache()
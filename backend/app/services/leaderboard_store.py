@@ -0,0 +1,388 @@
+"""
+Leaderboard ranking stores
+
+A LeaderboardStore keeps every ranked user's XP in a sorted set alongside the
+profile fields the leaderboard endpoints return, so top-N and rank lookups
+never touch the database once the store is loaded. Players are ordered by XP
+descending, ties by user id descending (Redis ZREVRANGE order). That order is
+only used for paging: a player's rank is one more than the number of players
+with strictly more XP, so tied players share a rank.
+
+Two backends are provided:
+- MemoryLeaderboardStore: sorted list + bisect, for single-process use and tests
+- RedisLeaderboardStore: ZADD / ZREVRANK / ZREVRANGE, shared across workers
+
+The store is loaded from the `leaderboard` table on first use and updated by
+the quest completion path after each commit. Every write bumps the store's
+version, which the leaderboard endpoints use to cache serialized pages.
+
+Jobs that rewrite the table from another process (reconcile_leaderboard.py)
+bump its row in `leaderboard_revisions`. Redis stores are shared, so the job
+clears them directly; in-process stores poll the revision at most every
+`leaderboard_reload_check_seconds` and reload when it has moved.
+"""
+from bisect import bisect_left, insort
+from dataclasses import dataclass, field, asdict
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import secrets
+import time
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.leaderboard import Leaderboard, LeaderboardRevision
+from app.models.user import User
+
+
+@dataclass
+class StoredEntry:
+    user_id: str
+    xp: int
+    display_name: Optional[str] = None
+    wallet_address: Optional[str] = None
+    badges: List[str] = field(default_factory=list)
+
+
+def entry_from_rows(user: User, leaderboard: Leaderboard, xp: Optional[int] = None) -> StoredEntry:
+    """Build a store entry from a user and their leaderboard row, optionally with window XP"""
+    return StoredEntry(
+        user_id=str(user.id),
+        xp=int((leaderboard.xp if xp is None else xp) or 0),
+        display_name=user.display_name,
+        wallet_address=user.wallet_address,
+        badges=list(leaderboard.badges or [])
+    )
+
+
+def leaderboard_revision(db: Session, name: str = "leaderboard") -> int:
+    """Current revision of a table, 0 if it was never rewritten"""
+    return db.query(LeaderboardRevision.revision).filter(LeaderboardRevision.name == name).scalar() or 0
+
+
+def bump_leaderboard_revision(db: Session, name: str = "leaderboard"):
+    """
+    Tell other processes a table was rewritten.
+    Does not commit - the caller commits this together with the rewrite.
+    """
+    updated = db.query(LeaderboardRevision).filter(LeaderboardRevision.name == name).update(
+        {LeaderboardRevision.revision: LeaderboardRevision.revision + 1}, synchronize_session=False
+    )
+    if not updated:
+        db.add(LeaderboardRevision(name=name, revision=1))
+
+
+class RevisionCheck:
+    """Polls a table's stored revision, at most once per interval, to notice rewrites by other processes"""
+
+    def __init__(self, interval_seconds: float, clock=time.monotonic):
+        self.interval_seconds = interval_seconds
+        self.clock = clock
+        self.revision: Optional[int] = None
+        self._checked_at = 0.0
+
+    def loading(self, db: Session):
+        """Record the revision a load is about to read; call before reading the rows"""
+        self.revision = leaderboard_revision(db)
+        self._checked_at = self.clock()
+
+    def stale(self, db: Session) -> bool:
+        """True once the stored revision differs from the loaded one"""
+        if self.clock() - self._checked_at < self.interval_seconds:
+            return False
+        self._checked_at = self.clock()
+        return leaderboard_revision(db) != self.revision
+
+
+class LeaderboardStore:
+    """Sorted-set interface over leaderboard entries"""
+
+    name: str
+
+    def is_loaded(self) -> bool:
+        raise NotImplementedError
+
+    def version(self) -> str:
+        """Opaque token that changes whenever the store contents change"""
+        raise NotImplementedError
+
+    def load(self, entries: Iterable[StoredEntry]):
+        """Replace the store contents and mark it loaded"""
+        raise NotImplementedError
+
+    def upsert(self, entry: StoredEntry):
+        """Insert or move an entry. Ignored until loaded, since the load reads committed rows."""
+        raise NotImplementedError
+
+    def get(self, user_id: str) -> Optional[StoredEntry]:
+        raise NotImplementedError
+
+    def rank(self, user_id: str) -> Optional[int]:
+        """1-based rank of a user (tied players share one), or None if they are not ranked"""
+        raise NotImplementedError
+
+    def xp_rank(self, xp: int) -> int:
+        """Rank an XP total would have: one more than the number of entries with more XP"""
+        raise NotImplementedError
+
+    def position(self, user_id: str) -> Optional[int]:
+        """1-based position of a user in board order (ties by user id), or None if they are not ranked"""
+        raise NotImplementedError
+
+    def top(self, limit: int, offset: int = 0) -> List[StoredEntry]:
+        """Entries at positions offset+1 .. offset+limit"""
+        raise NotImplementedError
+
+    def rank_many(self, user_ids: List[str]) -> Dict[str, Tuple[StoredEntry, int]]:
+        """Entry and rank for each ranked user among user_ids"""
+        raise NotImplementedError
+
+    def position_after(self, xp: int, user_id: str) -> int:
+        """
+        Number of entries ordered at or before the (xp, user_id) key.
+        Used as the offset of a keyset page, so it must not depend on the
+        key's user still holding that score.
+        """
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def clear(self):
+        """Drop all entries so the next ensure_loaded reloads from the database"""
+        raise NotImplementedError
+
+    def ensure_loaded(self, db: Session):
+        """Load the store from the leaderboard table if not yet loaded"""
+        if self.is_loaded():
+            return
+        self.load_from(db)
+
+    def load_from(self, db: Session):
+        """Replace the store contents with the leaderboard table"""
+        rows = db.query(User, Leaderboard).join(Leaderboard, User.id == Leaderboard.user_id).all()
+        self.load(entry_from_rows(user, leaderboard) for user, leaderboard in rows)
+
+
+class MemoryLeaderboardStore(LeaderboardStore):
+    def __init__(self, prefix: str = "leaderboard"):
+        self.name = prefix
+        self._entries: Dict[str, StoredEntry] = {}
+        self._keys: List[Tuple[int, str]] = []  # (xp, user_id) ascending
+        self._lock = Lock()
+        self._loaded = False
+        # Versions are per process, so tag them with this instance
+        self._instance = secrets.token_hex(4)
+        self._version = 0
+        self._revision = RevisionCheck(settings.leaderboard_reload_check_seconds)
+
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    def ensure_loaded(self, db: Session):
+        # Only this process sees these entries, so a reconcile elsewhere is noticed through the revision
+        if self._loaded and not self._revision.stale(db):
+            return
+        self._revision.loading(db)
+        self.load_from(db)
+
+    def version(self) -> str:
+        return f"{self._instance}.{self._version}"
+
+    def load(self, entries: Iterable[StoredEntry]):
+        entries = {entry.user_id: entry for entry in entries}
+
+        with self._lock:
+            self._entries = entries
+            self._keys = sorted((entry.xp, user_id) for user_id, entry in entries.items())
+            self._loaded = True
+            self._version += 1
+
+    def upsert(self, entry: StoredEntry):
+        with self._lock:
+            if not self._loaded:
+                return
+
+            old = self._entries.get(entry.user_id)
+            if old is not None:
+                del self._keys[bisect_left(self._keys, (old.xp, old.user_id))]
+
+            self._entries[entry.user_id] = entry
+            insort(self._keys, (entry.xp, entry.user_id))
+            self._version += 1
+
+    def get(self, user_id: str) -> Optional[StoredEntry]:
+        return self._entries.get(str(user_id))
+
+    def rank(self, user_id: str) -> Optional[int]:
+        entry = self._entries.get(str(user_id))
+        return None if entry is None else self.xp_rank(entry.xp)
+
+    def xp_rank(self, xp: int) -> int:
+        # (xp + 1,) sorts before every key with that XP, so this counts keys with strictly more XP
+        return len(self._keys) - bisect_left(self._keys, (xp + 1,)) + 1
+
+    def position(self, user_id: str) -> Optional[int]:
+        entry = self._entries.get(str(user_id))
+        if entry is None:
+            return None
+        return len(self._keys) - bisect_left(self._keys, (entry.xp, entry.user_id))
+
+    def top(self, limit: int, offset: int = 0) -> List[StoredEntry]:
+        end = len(self._keys) - offset
+        start = max(end - limit, 0)
+        if end <= 0:
+            return []
+        return [self._entries[user_id] for _, user_id in reversed(self._keys[start:end])]
+
+    def position_after(self, xp: int, user_id: str) -> int:
+        return len(self._keys) - bisect_left(self._keys, (xp, user_id))
+
+    def rank_many(self, user_ids: List[str]) -> Dict[str, Tuple[StoredEntry, int]]:
+        ranked = {}
+        for user_id in user_ids:
+            entry = self._entries.get(str(user_id))
+            if entry is not None:
+                ranked[entry.user_id] = (entry, self.rank(entry.user_id))
+        return ranked
+
+    def count(self) -> int:
+        return len(self._keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._keys = []
+            self._loaded = False
+            self._version += 1
+
+
+class RedisLeaderboardStore(LeaderboardStore):
+    def __init__(self, client, prefix: str = "leaderboard"):
+        self.name = prefix
+        self.client = client
+        self.scores_key = f"{prefix}:xp"
+        self.entries_key = f"{prefix}:entries"
+        self.loaded_key = f"{prefix}:loaded"
+        self.version_key = f"{prefix}:version"
+
+    def is_loaded(self) -> bool:
+        # Under allkeys-lru Redis can evict the board's keys while the flag survives; the flag
+        # records whether the board had entries, so a board missing its data reads as cold
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(self.loaded_key)
+        pipe.exists(self.scores_key, self.entries_key)
+        flag, present = pipe.execute()
+        if flag is None:
+            return False
+        return present == 2 if int(flag) else present == 0
+
+    def version(self) -> str:
+        version = self.client.get(self.version_key)
+        return version.decode() if version else "0"
+
+    def load(self, entries: Iterable[StoredEntry], chunk_size: int = 10_000):
+        # MULTI/EXEC so readers never see a half-loaded set
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(self.scores_key, self.entries_key, self.loaded_key)
+
+        chunk, count = [], 0
+        for entry in entries:
+            chunk.append(entry)
+            count += 1
+            if len(chunk) >= chunk_size:
+                self._write(pipe, chunk)
+                chunk = []
+        if chunk:
+            self._write(pipe, chunk)
+
+        pipe.set(self.loaded_key, 1 if count else 0)
+        pipe.incr(self.version_key)
+        pipe.execute()
+
+    def upsert(self, entry: StoredEntry):
+        if not self.is_loaded():
+            return
+
+        pipe = self.client.pipeline(transaction=True)
+        self._write(pipe, [entry])
+        pipe.set(self.loaded_key, 1)
+        pipe.incr(self.version_key)
+        pipe.execute()
+
+    def get(self, user_id: str) -> Optional[StoredEntry]:
+        raw = self.client.hget(self.entries_key, str(user_id))
+        return self._decode(raw) if raw else None
+
+    def rank(self, user_id: str) -> Optional[int]:
+        score = self.client.zscore(self.scores_key, str(user_id))
+        return None if score is None else self.xp_rank(int(score))
+
+    def xp_rank(self, xp: int) -> int:
+        return self.client.zcount(self.scores_key, f"({xp}", "+inf") + 1
+
+    def position(self, user_id: str) -> Optional[int]:
+        position = self.client.zrevrank(self.scores_key, str(user_id))
+        return None if position is None else position + 1
+
+    def top(self, limit: int, offset: int = 0) -> List[StoredEntry]:
+        user_ids = self.client.zrevrange(self.scores_key, offset, offset + limit - 1)
+        if not user_ids:
+            return []
+        return [self._decode(raw) for raw in self.client.hmget(self.entries_key, user_ids) if raw]
+
+    def rank_many(self, user_ids: List[str]) -> Dict[str, Tuple[StoredEntry, int]]:
+        if not user_ids:
+            return {}
+
+        # Two round trips whatever the batch size: every profile, then a count above each XP
+        entries = [self._decode(raw) for raw in self.client.hmget(self.entries_key, user_ids) if raw is not None]
+        if not entries:
+            return {}
+
+        pipe = self.client.pipeline(transaction=False)
+        for entry in entries:
+            pipe.zcount(self.scores_key, f"({entry.xp}", "+inf")
+        higher = pipe.execute()
+
+        return {entry.user_id: (entry, above + 1) for entry, above in zip(entries, higher)}
+
+    def position_after(self, xp: int, user_id: str) -> int:
+        # Fast path: the cursor's user has not moved since the page was served
+        score = self.client.zscore(self.scores_key, user_id)
+        if score is not None and int(score) == xp:
+            return self.client.zrevrank(self.scores_key, user_id) + 1
+
+        # Otherwise count higher scores plus ties ordered at or before the key
+        higher = self.client.zcount(self.scores_key, f"({xp}", "+inf")
+        tied = self.client.zrangebyscore(self.scores_key, xp, xp)
+        return higher + sum(1 for member in tied if member.decode() >= user_id)
+
+    def count(self) -> int:
+        return self.client.zcard(self.scores_key)
+
+    def clear(self):
+        # The version key survives so versions never repeat for this prefix
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(self.scores_key, self.entries_key, self.loaded_key)
+        pipe.incr(self.version_key)
+        pipe.execute()
+
+    def _write(self, pipe, entries: List[StoredEntry]):
+        pipe.zadd(self.scores_key, {entry.user_id: entry.xp for entry in entries})
+        pipe.hset(self.entries_key, mapping={entry.user_id: json.dumps(asdict(entry)) for entry in entries})
+
+    @staticmethod
+    def _decode(raw) -> StoredEntry:
+        return StoredEntry(**json.loads(raw))
+
+
+def create_leaderboard_store(prefix: str = "leaderboard") -> LeaderboardStore:
+    """Build the store selected by settings.leaderboard_backend"""
+    if settings.leaderboard_backend == "redis":
+        import redis
+        return RedisLeaderboardStore(redis.Redis.from_url(settings.redis_url), prefix=prefix)
+    return MemoryLeaderboardStore(prefix=prefix)
+
+
+# Global leaderboard store
+leaderboard_store = create_leaderboard_store()
@@ -0,0 +1,162 @@
+"""
+Time-windowed leaderboards
+
+XP is bucketed per period (daily, weekly, season) in `leaderboard_windows`
+as quests complete, so a window board is served from a ranking store for the
+current bucket exactly like the all-time board - there is no range scan over
+completion timestamps. Bucket keys sort chronologically, and each bucket gets
+its own store prefix, so a new day/week/season simply starts a fresh store.
+`rollover_leaderboards.py` prunes expired buckets on a schedule.
+"""
+from datetime import date, datetime, timedelta
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.leaderboard import Leaderboard, LeaderboardWindow
+from app.models.quest import UserQuest
+from app.models.user import User
+from app.services.leaderboard_store import LeaderboardStore, StoredEntry, create_leaderboard_store
+
+PERIODS = ("daily", "weekly", "season")
+
+
+def period_bucket(period: str, at: datetime) -> str:
+    """Bucket key containing `at` for a period"""
+    if period == "daily":
+        return at.strftime("%Y-%m-%d")
+    if period == "weekly":
+        year, week, _ = at.isocalendar()
+        return f"{year}-W{week:02d}"
+    if period == "season":
+        return f"{at.year}-Q{(at.month - 1) // 3 + 1}"
+    raise ValueError(f"Unknown leaderboard period: {period}")
+
+
+def previous_bucket(period: str, at: datetime) -> str:
+    """Bucket key immediately before the one containing `at`"""
+    if period == "daily":
+        return period_bucket(period, at - timedelta(days=1))
+    if period == "weekly":
+        return period_bucket(period, at - timedelta(days=7))
+    season_start = date(at.year, 3 * ((at.month - 1) // 3) + 1, 1)
+    return period_bucket(period, season_start - timedelta(days=1))
+
+
+def record_window_xp(db: Session, user_quest: UserQuest, at: Optional[datetime] = None) -> List[LeaderboardWindow]:
+    """
+    Add a completed quest's score to the user's current bucket for every period.
+    Does not commit - the caller commits this together with the quest update.
+    """
+    at = at or datetime.utcnow()
+    score = int(user_quest.score or 0)
+    rows = []
+
+    for period in PERIODS:
+        bucket = period_bucket(period, at)
+        key = (
+            LeaderboardWindow.period == period,
+            LeaderboardWindow.bucket == bucket,
+            LeaderboardWindow.user_id == user_quest.user_id
+        )
+        # Increment in SQL, like the all-time row, so concurrent completions are not lost
+        updated = db.query(LeaderboardWindow).filter(*key).update(
+            {LeaderboardWindow.xp: func.coalesce(LeaderboardWindow.xp, 0) + score, LeaderboardWindow.updated_at: at},
+            synchronize_session=False
+        )
+        if updated:
+            row = db.query(LeaderboardWindow).populate_existing().filter(*key).one()
+        else:
+            row = LeaderboardWindow(period=period, bucket=bucket, user_id=user_quest.user_id, xp=score, updated_at=at)
+            db.add(row)
+        rows.append(row)
+
+    return rows
+
+
+class WindowedLeaderboards:
+    """Ranking store for the current bucket of each period"""
+
+    def __init__(self, store_factory=create_leaderboard_store):
+        self.store_factory = store_factory
+        self._current: Dict[str, Tuple[str, LeaderboardStore]] = {}
+        self._lock = Lock()
+
+    def store_for(self, period: str, bucket: str) -> LeaderboardStore:
+        """Store for a bucket, replacing the period's store when the bucket rolls over"""
+        with self._lock:
+            current = self._current.get(period)
+            if current is None or current[0] != bucket:
+                current = (bucket, self.store_factory(prefix=f"leaderboard:{period}:{bucket}"))
+                self._current[period] = current
+            return current[1]
+
+    def ensure_loaded(self, db: Session, period: str, at: Optional[datetime] = None) -> LeaderboardStore:
+        """Current-bucket store for a period, loaded from leaderboard_windows if cold"""
+        bucket = period_bucket(period, at or datetime.utcnow())
+        store = self.store_for(period, bucket)
+
+        if not store.is_loaded():
+            rows = db.query(User, LeaderboardWindow.xp, Leaderboard.badges).join(
+                LeaderboardWindow, User.id == LeaderboardWindow.user_id
+            ).outerjoin(
+                Leaderboard, User.id == Leaderboard.user_id
+            ).filter(
+                LeaderboardWindow.period == period,
+                LeaderboardWindow.bucket == bucket
+            ).all()
+
+            store.load(
+                StoredEntry(
+                    user_id=str(user.id),
+                    xp=int(xp or 0),
+                    display_name=user.display_name,
+                    wallet_address=user.wallet_address,
+                    badges=list(badges or [])
+                )
+                for user, xp, badges in rows
+            )
+
+        return store
+
+    def upsert(self, period: str, bucket: str, entry: StoredEntry):
+        """Move an entry within a bucket's store"""
+        self.store_for(period, bucket).upsert(entry)
+
+    def clear(self):
+        """Drop all current stores so the next read reloads them"""
+        with self._lock:
+            for _, store in self._current.values():
+                store.clear()
+            self._current = {}
+
+
+def rollover(db: Session, at: Optional[datetime] = None) -> int:
+    """
+    Delete buckets older than the previous one for each period, along with
+    their ranking stores. Returns the number of buckets removed.
+    """
+    at = at or datetime.utcnow()
+    removed = 0
+
+    for period in PERIODS:
+        oldest_kept = previous_bucket(period, at)
+        stale = db.query(LeaderboardWindow.bucket).filter(
+            LeaderboardWindow.period == period,
+            LeaderboardWindow.bucket < oldest_kept
+        ).distinct().all()
+
+        for bucket, in stale:
+            db.query(LeaderboardWindow).filter(
+                LeaderboardWindow.period == period,
+                LeaderboardWindow.bucket == bucket
+            ).delete(synchronize_session=False)
+            create_leaderboard_store(prefix=f"leaderboard:{period}:{bucket}").clear()
+            removed += 1
+
+    db.commit()
+    return removed
+
+
+# Global windowed leaderboards
+window_leaderboards = WindowedLeaderboards()
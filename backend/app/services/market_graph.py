@@ -0,0 +1,215 @@
+"""
+Seeded multi-pool market for the arbitrage and routing quests
+
+A quest instance's market is a set of constant-product pools between a few
+tokens, priced from its server seed with small per-pool mispricings, so that
+arbitrage cycles exist and differ per instance.
+
+The graph is built once per seed into adjacency arrays: an n x n matrix of
+reserves per direction and an edge list (src, dst, -log rate) for
+Bellman-Ford. Arbitrage detection is vectorized negative-cycle detection on
+-log rates; only a market with a negative cycle gets its loops enumerated and
+ranked, once per seed. Swap routing searches simple paths up to max_hops,
+quoting each with slippage. Scoring an action against the optimum runs in well
+under a millisecond once the seed's market is cached.
+"""
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.services.price_paths import seeded_rng
+
+TOKENS = ("STX", "sBTC", "USDA", "ALEX", "xBTC")
+USD_PRICES = (1.5, 60_000.0, 1.0, 0.1, 60_000.0)
+NUMERAIRE = "USDA"
+# Every seeded market's best loop clears this spread, so quests can ask for up to it
+MIN_ARBITRAGE_SPREAD = 0.015
+
+
+@dataclass
+class Route:
+    tokens: List[str]
+    amount_in: float
+    amount_out: float
+
+
+class MarketGraph:
+    """Constant-product pools between tokens, as adjacency arrays"""
+
+    def __init__(self, tokens: Sequence[str], reserves: np.ndarray, fee: float = 0.003):
+        """reserves[i, j] is pool (i, j)'s reserve of token i; 0 where there is no pool"""
+        self.tokens = tuple(tokens)
+        self.index: Dict[str, int] = {token: i for i, token in enumerate(self.tokens)}
+        self.fee = fee
+        self.reserves = reserves
+
+        # Edge i -> j exists when pool (i, j) does; rate is the fee-adjusted spot price
+        has_pool = (reserves > 0) & (reserves.T > 0)
+        self.src, self.dst = np.nonzero(has_pool)
+        self.reserve_in = reserves[self.src, self.dst]
+        self.reserve_out = reserves.T[self.src, self.dst]
+        self.rates = np.zeros_like(reserves)
+        self.rates[self.src, self.dst] = (1 - fee) * self.reserve_out / self.reserve_in
+        self.weights = -np.log(self.rates[self.src, self.dst])
+        self.neighbors = [self.dst[self.src == i] for i in range(len(self.tokens))]
+        self._arbitrage_profit: Dict[float, float] = {}
+
+    def token_indices(self, route: Sequence[str]) -> List[int]:
+        try:
+            return [self.index[token] for token in route]
+        except KeyError as e:
+            raise ValueError(f"Unknown token: {e.args[0]}")
+
+    def has_edges(self, indices: Sequence[int]) -> bool:
+        return all(self.rates[i, j] > 0 for i, j in zip(indices, indices[1:]))
+
+    def spot_rate(self, indices: Sequence[int]) -> float:
+        """Product of fee-adjusted spot rates along a path (no slippage)"""
+        return float(np.prod([self.rates[i, j] for i, j in zip(indices, indices[1:])]))
+
+    def value(self, token: int, amount: float) -> float:
+        """Amount of a token at mid price in the numeraire"""
+        numeraire = self.index[NUMERAIRE]
+        if token == numeraire:
+            return amount
+        return amount * self.reserves[numeraire, token] / self.reserves[token, numeraire]
+
+    def quote(self, indices: Sequence[int], amount_in):
+        """
+        Output of swapping amount_in along a path, with slippage. Accepts an
+        array of amounts. Each pool is assumed to appear at most once per path.
+        """
+        amount = np.asarray(amount_in, dtype=float)
+        for i, j in zip(indices, indices[1:]):
+            effective = amount * (1 - self.fee)
+            amount = self.reserves[j, i] * effective / (self.reserves[i, j] + effective)
+        return amount
+
+    def find_arbitrage(self) -> Optional[List[int]]:
+        """A negative cycle on -log rates (a profitable loop), or None. Bellman-Ford from a virtual source."""
+        n = len(self.tokens)
+        dist = np.zeros(n)
+        pred = np.full(n, -1)
+        improved_node = -1
+
+        for _ in range(n):
+            candidate = dist[self.src] + self.weights
+            best = dist.copy()
+            np.minimum.at(best, self.dst, candidate)
+            improved = best < dist - 1e-12
+            if not improved.any():
+                return None
+
+            # Record the edge that produced each improvement
+            winners = improved[self.dst] & (candidate == best[self.dst])
+            pred[self.dst[winners]] = self.src[winners]
+            dist = best
+            improved_node = int(np.flatnonzero(improved)[0])
+
+        # Still improving after n rounds: walk back n steps to land on the cycle
+        node = improved_node
+        for _ in range(n):
+            node = int(pred[node])
+        cycle = [node]
+        current = int(pred[node])
+        while current != node:
+            cycle.append(current)
+            current = int(pred[current])
+        cycle.append(node)
+        return cycle[::-1]
+
+    @cached_property
+    def arbitrage_cycles(self) -> List[Tuple[float, List[int]]]:
+        """Every profitable simple loop as (spot rate, cycle), best first; one rotation per loop"""
+        if self.find_arbitrage() is None:
+            return []
+
+        cycles = []
+        for start in range(len(self.tokens)):
+            # Loops through only higher-numbered tokens, so each loop is listed from its lowest token once
+            stack = [[start]]
+            while stack:
+                path = stack.pop()
+                for nxt in self.neighbors[path[-1]]:
+                    nxt = int(nxt)
+                    if nxt == start and len(path) > 2:
+                        rate = self.spot_rate(path + [start])
+                        if rate > 1:
+                            cycles.append((rate, path + [start]))
+                    elif nxt > start and nxt not in path:
+                        stack.append(path + [nxt])
+        return sorted(cycles, key=lambda item: item[0], reverse=True)
+
+    def best_arbitrage_profit(self, max_slippage: float) -> float:
+        """Largest profit, in the numeraire, of any single loop traded within max_slippage"""
+        if max_slippage not in self._arbitrage_profit:
+            self._arbitrage_profit[max_slippage] = max(
+                (self.value(cycle[0], self.best_arbitrage_amount(cycle, max_slippage)[1]) for _, cycle in self.arbitrage_cycles),
+                default=0.0
+            )
+        return self._arbitrage_profit[max_slippage]
+
+    def best_arbitrage_amount(self, cycle: Sequence[int], max_slippage: float, samples: int = 256) -> Tuple[float, float]:
+        """(amount_in, profit) maximizing profit around a cycle with slippage within max_slippage"""
+        start = cycle[0]
+        amounts = np.geomspace(self.reserves[start, cycle[1]] * 1e-7, self.reserves[start, cycle[1]] * 0.2, samples)
+        outputs = self.quote(cycle, amounts)
+
+        slippage = 1 - (outputs / amounts) / self.spot_rate(cycle)
+        profit = np.where(slippage <= max_slippage, outputs - amounts, -np.inf)
+        best = int(np.argmax(profit))
+        if not np.isfinite(profit[best]) or profit[best] <= 0:
+            return 0.0, 0.0
+        return float(amounts[best]), float(profit[best])
+
+    def best_route(self, start: int, end: int, amount_in: float, max_hops: int = 3) -> Optional[Route]:
+        """Simple path from start to end with at most max_hops pools that returns the most output"""
+        best_path, best_out = None, 0.0
+        stack = [[start]]
+        while stack:
+            path = stack.pop()
+            for nxt in self.neighbors[path[-1]]:
+                nxt = int(nxt)
+                if nxt == end:
+                    out = float(self.quote(path + [end], amount_in))
+                    if out > best_out:
+                        best_path, best_out = path + [end], out
+                elif nxt not in path and len(path) < max_hops:
+                    stack.append(path + [nxt])
+
+        if best_path is None:
+            return None
+        return Route([self.tokens[i] for i in best_path], amount_in, best_out)
+
+
+@lru_cache(maxsize=1024)
+def seeded_market(server_seed: str, liquidity_usd: float = 2_000_000.0, mispricing: float = 0.01) -> MarketGraph:
+    """
+    A quest instance's market: one pool per token pair, each priced off a
+    seeded fair value with its own mispricing, plus one pool pushed 3-5%
+    out of line. The other pools' mispricings can cancel most of that push,
+    so about 0.6% of draws have no loop clearing MIN_ARBITRAGE_SPREAD; those
+    are redrawn from the same generator, leaving every other seed's market
+    as it was.
+    """
+    rng = seeded_rng(server_seed, "market-graph")
+    n = len(TOKENS)
+    fair = np.array(USD_PRICES) * rng.lognormal(0.0, 0.05, n)
+    pairs = [(i, j) for i in range(n) for j in range(i + 1, n)]
+
+    while True:
+        skewed = rng.integers(len(pairs))
+        reserves = np.zeros((n, n))
+        for pool_number, (i, j) in enumerate(pairs):
+            depth = liquidity_usd * rng.uniform(0.5, 1.5)
+            skew = rng.normal(0.0, mispricing)
+            if pool_number == skewed:
+                skew += rng.choice([-1, 1]) * rng.uniform(0.03, 0.05)
+            reserves[i, j] = depth / 2 / fair[i] * np.exp(skew / 2)
+            reserves[j, i] = depth / 2 / fair[j] * np.exp(-skew / 2)
+
+        reserves.setflags(write=False)
+        market = MarketGraph(TOKENS, reserves)
+        cycles = market.arbitrage_cycles
+        if cycles and cycles[0][0] - 1 >= MIN_ARBITRAGE_SPREAD:
+            return market
@@ -0,0 +1,75 @@
+"""
+Deterministic price-path simulation
+
+Every quest instance gets a `server_seed` at start. Market simulations derive
+their random generator from that seed, so a quest's market is fixed the moment
+it starts: the server can replay and verify any action, and the player cannot
+re-roll the outcome by retrying.
+
+Prices follow Merton jump-diffusion (geometric Brownian motion plus Poisson
+jumps), generated for a whole window in one vectorized call. Paths are cached
+per (seed, model, window) with LRU eviction, so repeat actions in a quest cost
+a dict lookup.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+import hashlib
+import numpy as np
+
+MINUTES_PER_YEAR = 365 * 24 * 60
+
+
+def seeded_rng(server_seed: str, *salt) -> np.random.Generator:
+    """Generator derived from a quest's server seed and a purpose salt"""
+    material = ":".join([server_seed or "", *map(str, salt)]).encode()
+    return np.random.default_rng(int.from_bytes(hashlib.sha256(material).digest()[:16], "big"))
+
+
+@dataclass(frozen=True)
+class PathModel:
+    """Annualized jump-diffusion parameters"""
+    start_price: float = 1.0
+    drift: float = 0.0
+    volatility: float = 0.8
+    jump_intensity: float = 50.0  # expected jumps per year
+    jump_mean: float = -0.01  # mean log jump size
+    jump_std: float = 0.03
+
+    @classmethod
+    def from_params(cls, params: dict) -> "PathModel":
+        """Model from step params, ignoring keys that are not model fields"""
+        fields = cls.__dataclass_fields__
+        return cls(**{key: float(value) for key, value in params.items() if key in fields})
+
+
+@lru_cache(maxsize=4096)
+def simulate_price_path(server_seed: str, minutes: int, model: PathModel = PathModel()) -> np.ndarray:
+    """
+    Prices at each minute from 0 to `minutes` (minutes + 1 points).
+    The returned array is shared through the cache and is read-only.
+    """
+    rng = seeded_rng(server_seed, "price-path", minutes, model)
+    dt = 1 / MINUTES_PER_YEAR
+
+    # Compensate the drift for the jumps' expected relative move
+    jump_compensation = model.jump_intensity * (np.exp(model.jump_mean + 0.5 * model.jump_std ** 2) - 1)
+    drift = (model.drift - 0.5 * model.volatility ** 2 - jump_compensation) * dt
+
+    diffusion = model.volatility * np.sqrt(dt) * rng.standard_normal(minutes)
+    jump_counts = rng.poisson(model.jump_intensity * dt, minutes)
+    jumps = model.jump_mean * jump_counts + model.jump_std * np.sqrt(jump_counts) * rng.standard_normal(minutes)
+
+    log_prices = np.empty(minutes + 1)
+    log_prices[0] = np.log(model.start_price)
+    np.cumsum(drift + diffusion + jumps, out=log_prices[1:])
+    log_prices[1:] += log_prices[0]
+
+    path = np.exp(log_prices)
+    path.setflags(write=False)
+    return path
+
+
+def price_change(server_seed: str, minutes: int, model: PathModel = PathModel()) -> float:
+    """Relative price move over a window"""
+    path = simulate_price_path(server_seed, minutes, model)
+    return float(path[-1] / path[0] - 1)
@@ -0,0 +1,77 @@
+"""
+Quest catalog cache
+
+The active quest list is read on every page load but changes only when a
+quest is edited. The catalog keeps it as pre-serialized JSON bytes, so a
+list request costs neither a query nor ORM/pydantic serialization.
+
+Any committed session that inserted, updated or deleted a Quest invalidates
+the catalog. Writes made outside this process (or via bulk query updates,
+which bypass the ORM unit of work) are picked up when the TTL expires.
+"""
+from threading import Lock
+from typing import Optional
+import json
+import time
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.quest import Quest
+from app.schemas.quest import QuestResponse
+
+
+class QuestCatalogCache:
+    """Serialized list of active quests with explicit invalidation and a TTL"""
+
+    def __init__(self, ttl_seconds: float = 300, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._body: Optional[bytes] = None
+        self._expires_at = 0.0
+        self._generation = 0
+        self._lock = Lock()
+
+    def get(self, db: Session) -> bytes:
+        """JSON bytes for the active quest list, loading it if missing or expired"""
+        body = self._body
+        if body is not None and self.clock() < self._expires_at:
+            return body
+
+        generation = self._generation
+        quests = db.query(Quest).filter(Quest.active == True).all()
+        body = json.dumps(jsonable_encoder([QuestResponse.from_orm(quest) for quest in quests])).encode()
+
+        with self._lock:
+            # An invalidation during the load means these rows may already be stale
+            if generation == self._generation:
+                self._body = body
+                self._expires_at = self.clock() + self.ttl_seconds
+        return body
+
+    def invalidate(self):
+        with self._lock:
+            self._body = None
+            self._generation += 1
+
+
+# Global quest catalog
+quest_catalog = QuestCatalogCache(ttl_seconds=settings.quest_catalog_ttl_seconds)
+
+
+@event.listens_for(Session, "after_flush")
+def _flag_quest_writes(session, flush_context):
+    if any(isinstance(obj, Quest) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["quest_catalog_dirty"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    # Invalidate only once the write is visible to other sessions
+    if session.info.pop("quest_catalog_dirty", False):
+        quest_catalog.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_flag_on_rollback(session):
+    session.info.pop("quest_catalog_dirty", None)
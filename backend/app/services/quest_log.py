@@ -0,0 +1,68 @@
+"""
+Append-only quest action log
+
+Every accepted action is appended to quest_actions with its payload, the
+progress keys it set and its score delta, instead of rewriting the quest's
+whole progress document. UserQuest.progress is a snapshot of the log through
+UserQuest.snapshot_seq, rewritten every `quest_progress_compact_every`
+actions and on completion; the current progress is the snapshot plus the
+deltas logged after it.
+
+The log is also the audit trail: with the quest's server_seed it replays to
+the same progress and score.
+"""
+from typing import Any, Dict, Iterator, Optional
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.quest import UserQuest
+from app.models.quest_action import QuestAction
+
+
+def progress_delta(previous: dict, progress: dict) -> Dict[str, Any]:
+    """Keys an action set or changed; actions never remove progress keys"""
+    return {key: value for key, value in progress.items() if key not in previous or previous[key] != value}
+
+
+def pending_actions(db: Session, user_quest: UserQuest) -> Iterator[QuestAction]:
+    """Logged actions not yet folded into the progress snapshot, in order"""
+    if (user_quest.action_count or 0) <= (user_quest.snapshot_seq or 0):
+        return iter(())
+    return iter(db.query(QuestAction).filter(
+        QuestAction.user_quest_id == user_quest.id,
+        QuestAction.seq > (user_quest.snapshot_seq or 0)
+    ).order_by(QuestAction.seq).all())
+
+
+def current_progress(db: Session, user_quest: UserQuest) -> dict:
+    """The snapshot with every later logged delta applied"""
+    progress = dict(user_quest.progress or {})
+    for entry in pending_actions(db, user_quest):
+        progress.update(entry.progress_delta or {})
+    return progress
+
+
+def append_action(db: Session, user_quest: UserQuest, action: str, payload: dict, previous_progress: dict,
+                  progress: dict, previous_score: Optional[float], score: float, state: str) -> QuestAction:
+    """Log an accepted action as the quest instance's next entry"""
+    user_quest.action_count = (user_quest.action_count or 0) + 1
+    entry = QuestAction(
+        user_quest_id=user_quest.id,
+        seq=user_quest.action_count,
+        action=action,
+        payload=payload,
+        progress_delta=progress_delta(previous_progress, progress),
+        score_delta=round(float(score or 0) - float(previous_score or 0), 2),
+        state=state
+    )
+    db.add(entry)
+    return entry
+
+
+def compact_progress(user_quest: UserQuest, progress: dict, force: bool = False) -> bool:
+    """Rewrite the progress snapshot if enough actions are pending (or forced); True if it was rewritten"""
+    pending = (user_quest.action_count or 0) - (user_quest.snapshot_seq or 0)
+    if pending <= 0 or not (force or pending >= settings.quest_progress_compact_every):
+        return False
+    user_quest.progress = progress
+    user_quest.snapshot_seq = user_quest.action_count
+    return True
@@ -0,0 +1,196 @@
+"""
+Deterministic replay of completed quests
+
+A completed quest's action log (see app.services.quest_log) and server_seed
+fully determine its score: replaying the logged actions through the quest's
+current rules must land on the stored score, state and progress. A mismatch
+means the row was tampered with or scoring changed since the quest was played.
+
+Completed rows are streamed in keyset-paginated chunks on (user_id, id) and
+cut at user boundaries, so each shard holds whole users. Shards carry plain
+data (rules, seeds, logs) and are replayed in worker processes without
+touching the database, so throughput scales with cores while the parent only
+streams reads.
+"""
+from concurrent.futures import FIRST_COMPLETED, Executor, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import json
+import os
+from sqlalchemy import Float, tuple_, type_coerce
+from sqlalchemy.orm import Session
+from app.models.quest import Quest, UserQuest
+from app.models.quest_action import QuestAction
+from app.services.quest_rules import QuestRuleError, QuestValidator
+
+
+@dataclass
+class ReplayInput:
+    user_quest_id: str
+    user_id: str
+    quest_id: str
+    server_seed: str
+    score: Optional[float]
+    progress: Optional[dict]
+    actions: List[Tuple[str, dict]] = field(default_factory=list)
+
+
+@dataclass
+class ReplayShard:
+    rules: Dict[str, dict]  # quest_id -> game_rules
+    quests: List[ReplayInput]
+
+
+@dataclass
+class Discrepancy:
+    user_quest_id: str
+    user_id: str
+    quest_id: str
+    reason: str
+    stored_score: Optional[float] = None
+    replayed_score: Optional[float] = None
+
+
+@dataclass
+class ReplayReport:
+    checked: int = 0
+    unlogged: int = 0  # completed before the action log existed; nothing to replay
+    discrepancies: List[Discrepancy] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            "checked": self.checked,
+            "unlogged": self.unlogged,
+            "discrepancies": [asdict(discrepancy) for discrepancy in self.discrepancies]
+        }
+
+
+def _normalized(progress: Optional[dict]) -> Any:
+    """Progress as it reads back from a JSON column"""
+    return json.loads(json.dumps(progress or {}, sort_keys=True))
+
+
+def replay_quest(validator: QuestValidator, quest: ReplayInput) -> Optional[Discrepancy]:
+    """Replay one quest's log from empty progress; None if it matches what is stored"""
+    def discrepancy(reason: str, replayed_score: Optional[float] = None) -> Discrepancy:
+        return Discrepancy(quest.user_quest_id, quest.user_id, quest.quest_id, reason, quest.score, replayed_score)
+
+    score, progress, state = 0.0, {}, "started"
+    for seq, (action, payload) in enumerate(quest.actions, start=1):
+        try:
+            score, progress, state = validator.validate(action, payload or {}, progress, quest.server_seed)
+        except QuestRuleError as e:
+            return discrepancy(f"action {seq} rejected on replay: {e}")
+
+    if state != "completed":
+        return discrepancy(f"replay ends {state}", score)
+    if quest.score is None or abs(float(quest.score) - score) > 0.005:
+        return discrepancy("score mismatch", score)
+    if _normalized(progress) != _normalized(quest.progress):
+        return discrepancy("progress mismatch", score)
+    return None
+
+
+def replay_shard(shard: ReplayShard) -> Tuple[int, int, List[Discrepancy]]:
+    """Replay a shard of whole users; returns (checked, unlogged, discrepancies). Runs in worker processes."""
+    validators = {quest_id: QuestValidator(rules) for quest_id, rules in shard.rules.items()}
+    checked, unlogged, discrepancies = 0, 0, []
+
+    for quest in shard.quests:
+        if not quest.actions:
+            unlogged += 1
+            continue
+        checked += 1
+        found = replay_quest(validators[quest.quest_id], quest)
+        if found is not None:
+            discrepancies.append(found)
+
+    return checked, unlogged, discrepancies
+
+
+def iter_replay_shards(db: Session, chunk_size: int = 500) -> Iterator[ReplayShard]:
+    """
+    Stream completed quests with their action logs as shards of whole users,
+    of about chunk_size quests each (more when one user has more).
+    """
+    rules: Dict[str, dict] = {}
+    last_key = None
+    carry: List[tuple] = []
+
+    def load(rows: List[tuple]) -> ReplayShard:
+        quest_ids = {row[2] for row in rows} - rules.keys()
+        if quest_ids:
+            rules.update(db.query(Quest.id, Quest.game_rules).filter(Quest.id.in_(quest_ids)).all())
+
+        quests = {
+            user_quest_id: ReplayInput(user_quest_id, user_id, quest_id, server_seed, score, progress)
+            for user_id, user_quest_id, quest_id, server_seed, score, progress in rows
+        }
+        log = db.query(QuestAction.user_quest_id, QuestAction.action, QuestAction.payload).filter(
+            QuestAction.user_quest_id.in_(quests.keys())
+        ).order_by(QuestAction.user_quest_id, QuestAction.seq)
+        for user_quest_id, action, payload in log:
+            quests[user_quest_id].actions.append((action, payload))
+
+        return ReplayShard({quest_id: rules[quest_id] or {} for quest_id in {row[2] for row in rows}}, list(quests.values()))
+
+    while True:
+        query = db.query(
+            UserQuest.user_id, UserQuest.id, UserQuest.quest_id, UserQuest.server_seed,
+            type_coerce(UserQuest.score, Float), UserQuest.progress
+        ).filter(UserQuest.state == "completed")
+        if last_key is not None:
+            query = query.filter(tuple_(UserQuest.user_id, UserQuest.id) > tuple_(*last_key))
+        rows = query.order_by(UserQuest.user_id, UserQuest.id).limit(chunk_size).all()
+        if not rows:
+            break
+        last_key = (rows[-1][0], rows[-1][1])
+
+        # The last user may continue in the next chunk, so it waits for the next shard
+        batch = carry + rows
+        split = next(i for i, row in enumerate(batch) if row[0] == batch[-1][0])
+        carry = batch[split:]
+        if split > 0:
+            yield load(batch[:split])
+
+    if carry:
+        yield load(carry)
+
+
+def _bounded_map(executor: Executor, fn, items: Iterable, in_flight: int) -> Iterator:
+    """executor.map that keeps at most in_flight tasks queued, so a large input is not read up front"""
+    pending = set()
+    for item in items:
+        pending.add(executor.submit(fn, item))
+        if len(pending) >= in_flight:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    for future in wait(pending).done:
+        yield future.result()
+
+
+def verify_completed_quests(db: Session, workers: Optional[int] = None, chunk_size: int = 500) -> ReplayReport:
+    """
+    Replay every completed quest that has an action log and report the ones
+    that do not reproduce. workers=1 replays in this process; otherwise
+    shards go to a process pool of `workers` (default: one per core).
+    """
+    report = ReplayReport()
+    shards = iter_replay_shards(db, chunk_size)
+    workers = workers or os.cpu_count() or 1
+
+    def collect(results):
+        for checked, unlogged, discrepancies in results:
+            report.checked += checked
+            report.unlogged += unlogged
+            report.discrepancies.extend(discrepancies)
+
+    if workers == 1:
+        collect(map(replay_shard, shards))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            collect(_bounded_map(executor, replay_shard, shards, in_flight=2 * workers))
+
+    report.discrepancies.sort(key=lambda discrepancy: (discrepancy.user_id, discrepancy.user_quest_id))
+    return report
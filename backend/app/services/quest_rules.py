@@ -0,0 +1,543 @@
+"""
+Quest rules engine
+
+Each quest's `game_rules` is compiled once into a QuestValidator: a dispatch
+table from action name to the step it satisfies, the step's params, and the
+handler that checks the payload. Scoring weights and max_score are resolved
+at compile time, so validating an action costs one dict lookup plus the
+handler's own logic. Compiled validators are cached per (quest_id, rules
+hash), so editing a quest's rules recompiles it on the next action.
+
+Handlers are registered by action name with @action_handler. A new quest
+type only needs handlers for any new actions; its steps, params and weights
+come from its game_rules.
+
+Rules format:
+    {
+        "type": "liquidity-kata",
+        "steps": [{"action": "simulate_add_liquidity", "params": {"pair": "STX/sBTC", "min_amount": 1}}, ...],
+        "scoring": {"correctness": 0.6, "efficiency": 0.4},
+        "max_score": 100
+    }
+
+A quest is completed once every step has passed. Quests without steps accept
+any registered action and complete on an action whose handler completes the
+quest (an on-chain transaction proof).
+
+Some handlers score against a seeded simulation that is expensive to build
+for a new seed (the risk engine's scenario matrix takes about 100 ms). Those
+register an @action_warmer, and QuestValidator.warm builds a quest's
+simulations when it starts, off the request path, so its actions find them
+cached.
+"""
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import hashlib
+import json
+import math
+from app.services import amm, risk
+from app.services.flash_loans import PoolSnapshot, best_flash_loan, simulate_strategy
+from app.services.market_graph import MarketGraph, seeded_market
+from app.services.price_paths import PathModel, price_change
+from app.services.yield_screener import DEFAULT_POOL_COUNT, seeded_universe
+
+
+class QuestRuleError(ValueError):
+    """An action that the quest's rules do not accept"""
+
+
+@dataclass
+class StepResult:
+    passed: bool
+    quality: float = 0.0  # 0..1, used for any scoring weight the handler does not report
+    metrics: Dict[str, float] = field(default_factory=dict)  # 0..1 per scoring key
+    progress: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class ActionHandler:
+    action: str
+    fn: Callable[[dict, dict, dict, str], StepResult]
+    required: Tuple[str, ...]
+    completes_quest: bool = False
+
+
+ACTION_HANDLERS: Dict[str, ActionHandler] = {}
+ACTION_WARMERS: Dict[str, Callable[[dict, str], None]] = {}
+
+
+def action_handler(action: str, required: Tuple[str, ...] = (), completes_quest: bool = False):
+    """
+    Register fn(payload, params, progress, server_seed) -> StepResult for an
+    action. `required` payload fields are checked before fn is called.
+    """
+    def register(fn):
+        ACTION_HANDLERS[action] = ActionHandler(action, fn, tuple(required), completes_quest)
+        return fn
+    return register
+
+
+def action_warmer(*actions: str):
+    """Register fn(params, server_seed) that builds and caches the seeded simulation the actions score against"""
+    def register(fn):
+        for action in actions:
+            ACTION_WARMERS[action] = fn
+        return fn
+    return register
+
+
+def rules_hash(game_rules: Optional[dict]) -> str:
+    """Stable digest of a rules document"""
+    return hashlib.sha1(json.dumps(game_rules or {}, sort_keys=True, default=str).encode()).hexdigest()
+
+
+@dataclass
+class CompiledStep:
+    handler: ActionHandler
+    params: Dict[str, Any]
+
+
+class QuestValidator:
+    """A quest's game_rules compiled into a dispatch table"""
+
+    def __init__(self, game_rules: Optional[dict]):
+        game_rules = game_rules or {}
+        self.quest_type = game_rules.get("type")
+        self.max_score = float(game_rules.get("max_score", 100))
+
+        weights = game_rules.get("scoring") or {}
+        total = sum(weights.values())
+        self.weights = {key: weight / total for key, weight in weights.items()} if total else {}
+
+        steps = game_rules.get("steps") or []
+        self.step_actions: List[str] = [step["action"] for step in steps]
+        self.dispatch: Dict[str, CompiledStep] = {}
+
+        for step in steps:
+            # Steps without a handler stay in step_actions, so the quest cannot complete without them
+            handler = ACTION_HANDLERS.get(step["action"])
+            if handler is not None:
+                self.dispatch[step["action"]] = CompiledStep(handler, dict(step.get("params") or {}))
+
+        if not steps:
+            # Free-form quests accept every registered action with default params
+            self.dispatch = {action: CompiledStep(handler, {}) for action, handler in ACTION_HANDLERS.items()}
+
+    def warm(self, server_seed: str):
+        """Build the seeded simulations this quest's steps score against, so the first action finds them cached"""
+        for action in self.step_actions:
+            warmer = ACTION_WARMERS.get(action)
+            if warmer is not None and action in self.dispatch:
+                warmer(self.dispatch[action].params, server_seed)
+
+    def step_score(self, result: StepResult) -> float:
+        # Plain floats: numpy's round differs from Python's on ties, so a score would change once it
+        # went through a JSON column and the total rounded again
+        if not self.weights:
+            return round(float(self.max_score * result.quality), 2)
+        weighted = sum(weight * result.metrics.get(key, result.quality) for key, weight in self.weights.items())
+        return round(float(self.max_score * weighted), 2)
+
+    def total_score(self, step_scores: Dict[str, float]) -> float:
+        if not self.step_actions:
+            return max(step_scores.values(), default=0.0)
+        return round(sum(step_scores.get(action, 0.0) for action in self.step_actions) / len(self.step_actions), 2)
+
+    def validate(self, action: str, payload: dict, current_progress: dict, server_seed: str) -> Tuple[float, dict, str]:
+        """Apply an action and return (score, progress, state)"""
+        step = self.dispatch.get(action)
+        if step is None:
+            if action in self.step_actions:
+                raise QuestRuleError(f"Unsupported quest action: {action}")
+            raise QuestRuleError(f"Action not allowed in this quest: {action}")
+
+        missing = [name for name in step.handler.required if name not in payload]
+        if missing:
+            raise QuestRuleError(f"Missing action parameters: {', '.join(missing)}")
+
+        new_progress = dict(current_progress)
+        step_scores = dict(new_progress.get("step_scores") or {})
+        result = step.handler.fn(payload, step.params, current_progress, server_seed)
+
+        if result.passed:
+            score = self.step_score(result)
+            if not math.isfinite(score):
+                raise QuestRuleError(f"Action could not be scored: {action}")
+            new_progress.update(result.progress)
+            # Retrying a step can only improve its score
+            step_scores[action] = max(step_scores.get(action, 0.0), score)
+            new_progress["step_scores"] = step_scores
+
+        if self.step_actions:
+            completed = all(action in step_scores for action in self.step_actions)
+        else:
+            completed = result.passed and step.handler.completes_quest
+
+        return self.total_score(step_scores), new_progress, "completed" if completed else "ongoing"
+
+
+class ValidatorCache:
+    """Compiled validators keyed by quest id, recompiled when the rules hash changes"""
+
+    def __init__(self):
+        self._validators: Dict[Any, Tuple[str, QuestValidator]] = {}
+        self._lock = Lock()
+
+    def get(self, quest_id, game_rules: Optional[dict]) -> QuestValidator:
+        digest = rules_hash(game_rules)
+        cached = self._validators.get(quest_id)
+        if cached is not None and cached[0] == digest:
+            return cached[1]
+
+        validator = QuestValidator(game_rules)
+        with self._lock:
+            self._validators[quest_id] = (digest, validator)
+        return validator
+
+    def clear(self):
+        with self._lock:
+            self._validators = {}
+
+
+# Global compiled validator cache
+quest_validators = ValidatorCache()
+
+
+def _number(payload: dict, name: str) -> float:
+    try:
+        value = float(payload[name])
+    except (TypeError, ValueError):
+        raise QuestRuleError(f"Action parameter must be a number: {name}")
+    # "nan", "inf", "1e400" and bare NaN/Infinity JSON literals all parse as floats
+    if not math.isfinite(value):
+        raise QuestRuleError(f"Action parameter must be a finite number: {name}")
+    return value
+
+
+@action_handler("simulate_add_liquidity", required=("pair", "amount"))
+def simulate_add_liquidity(payload: dict, params: dict, progress: dict, server_seed: str) -> StepResult:
+    pair = payload["pair"]
+    amount = _number(payload, "amount")
+    amount_y = _number(payload, "amount_y") if "amount_y" in payload else None
+
+    if pair != params.get("pair", "STX/sBTC") or amount < params.get("min_amount", 1):
+        return StepResult(passed=False)
+    if amount_y is not None and amount_y <= 0:
+        raise QuestRuleError("amount_y must be positive")
+
+    outcome = amm.simulate_add_liquidity(
+        server_seed, pair, amount, amount_y,
+        hold_minutes=int(params.get("hold_minutes", 1440)),
+        fee=float(params.get("fee", 0.003)),
+        model=PathModel.from_params(params)
+    )
+
+    # Efficiency: how much of the offer went in at the pool ratio, and how the position fared against holding
+    efficiency = outcome.used_fraction * min(outcome.value_vs_hodl, 1.0)
+
+    return StepResult(
+        passed=True,
+        quality=efficiency,
+        metrics={"correctness": 1.0},
+        progress={
+            "liquidity_added": True,
+            "pair": pair,
+            "amount": payload["amount"],
+            "lp_shares": round(outcome.shares, 6),
+            "pool_share": round(outcome.pool_share, 8),
+            "impermanent_loss": round(outcome.impermanent_loss, 6),
+            "fees_earned": round(outcome.fees_earned, 6),
+            "value_vs_hodl": round(outcome.value_vs_hodl, 6)
+        }
+    )
+
+
+@action_handler("predict_price_move", required=("prediction", "confidence"))
+def predict_price_move(payload: dict, params: dict, progress: dict, server_seed: str) -> StepResult:
+    # Single-shot: the result reveals the outcome, so a retry could simply resubmit it
+    if progress.get("price_predicted"):
+        raise QuestRuleError("Price prediction already submitted")
+    prediction = str(payload["prediction"]).lower()
+    if prediction not in ("up", "down"):
+        raise QuestRuleError("prediction must be 'up' or 'down'")
+
+    # Confidence 0-5 maps to the probability given to the predicted direction
+    confidence = min(max(_number(payload, "confidence") / 5, 0.0), 1.0)
+    probability = 0.5 + 0.5 * confidence
+
+    minutes = int(params.get("window_minutes", 15))
+    change = price_change(server_seed, minutes, PathModel.from_params(params))
+    outcome = "up" if change >= 0 else "down"
+    correct = prediction == outcome
+
+    # Brier score: rewards calibrated confidence, punishes confident misses
+    brier = 1 - ((1.0 if correct else 0.0) - probability) ** 2
+
+    return StepResult(
+        passed=True,
+        quality=brier,
+        metrics={"correctness": 1.0 if correct else 0.0},
+        progress={
+            "price_predicted": True,
+            "prediction": payload["prediction"],
+            "confidence": payload["confidence"],
+            "outcome": outcome,
+            "price_change": round(change, 6)
+        }
+    )
+
+
+def _market_path(market: MarketGraph, payload: dict, name: str, cycle: bool = False) -> List[int]:
+    """Token route from the payload as market indices; a cycle starts and ends on the same token"""
+    route = payload[name]
+    if not isinstance(route, list) or not all(isinstance(token, str) for token in route):
+        raise QuestRuleError(f"{name} must be a list of tokens")
+    try:
+        indices = market.token_indices(route)
+    except ValueError as e:
+        raise QuestRuleError(str(e))
+
+    visited = indices[:-1] if cycle else indices
+    if len(indices) < (4 if cycle else 2) or len(set(visited)) != len(visited):
+        raise QuestRuleError(f"{name} must visit each token once" + (" and close on its first token" if cycle else ""))
+    if cycle and indices[0] != indices[-1]:
+        raise QuestRuleError(f"{name} must visit each token once and close on its first token")
+    if not market.has_edges(indices):
+        raise QuestRuleError(f"{name} uses a pair without a pool")
+    return indices
+
+
+@action_warmer("identify_price_differences", "execute_arbitrage", "multi_hop_swap")
+def warm_market(params: dict, server_seed: str):
+    seeded_market(server_seed).arbitrage_cycles
+
+
+@action_handler("identify_price_differences", required=("cycle",))
+def identify_price_differences(payload: dict, params: dict, progress: dict, server_seed: str) -> StepResult:
+    market = seeded_market(server_seed)
+    cycle = _market_path(market, payload, "cycle", cycle=True)
+
+    spread = market.spot_rate(cycle) - 1
+    if spread <= 0 or spread < float(params.get("min_spread", 0.01)):
+        return StepResult(passed=False)
+
+    best_spread = market.arbitrage_cycles[0][0] - 1
+    margin = min(spread / best_spread, 1.0)
+
+    return StepResult(
+        passed=True,
+        quality=margin,
+        metrics={"profit_margin": margin},
+        progress={
+            "price_difference_found": True,
+            "cycle": payload["cycle"],
+            "spread": round(spread, 6),
+            "best_spread": round(best_spread, 6)
+        }
+    )
+
+
+@action_handler("execute_arbitrage", required=("cycle", "amount"))
+def execute_arbitrage(payload: dict, params: dict, progress: dict, server_seed: str) -> StepResult:
+    market = seeded_market(server_seed)
+    cycle = _market_path(market, payload, "cycle", cycle=True)
+    amount = _number(payload, "amount")
+    if amount <= 0:
+        raise QuestRuleError("amount must be positive")
+
+    max_slippage = float(params.get("max_slippage", 0.005))
+    amount_out = float(market.quote(cycle, amount))
+    slippage = 1 - (amount_out / amount) / market.spot_rate(cycle)
+    profit = market.value(cycle[0], amount_out - amount)
+    if profit <= 0 or slippage > max_slippage:
+        return StepResult(passed=False)
+
+    # Profit against the best single loop within the slippage limit; speed against the shortest profitable loop
+    margin = profit / max(market.best_arbitrage_profit(max_slippage), profit)
+    fewest_swaps = min(len(loop) - 1 for _, loop in market.arbitrage_cycles)
+    speed = fewest_swaps / (len(cycle) - 1)
+
+    return StepResult(
+        passed=True,
+        quality=margin,
+        metrics={"profit_margin": margin, "execution_speed": speed},
+        progress={
+            "arbitrage_executed": True,
+            "cycle": payload["cycle"],
+            "amount": payload["amount"],
+            "amount_out": round(amount_out, 8),
+            "profit": round(profit, 6),
+            "slippage": round(slippage, 6)
+        }
+    )
+
+
+@action_handler("multi_hop_swap", required=("route", "amount"))
+def multi_hop_swap(payload: dict, params: dict, progress: dict, server_seed: str) -> StepResult:
+    market = seeded_market(server_seed)
+    route = _market_path(market, payload, "route")
+    amount = _number(payload, "amount")
+    if amount <= 0:
+        raise QuestRuleError("amount must be positive")
+
+    max_hops = int(params.get("max_hops", 3))
+    if len(route) - 1 > max_hops:
+        return StepResult(passed=False)
+
+    amount_out = float(market.quote(route, amount))
+    best = market.best_route(route[0], route[-1], amount, max_hops)
+    if best is None or amount_out <= 0:
+        # Only an amount small enough to round to nothing at every pool gets here
+        raise QuestRuleError("amount is too small to swap")
+
+    # Output against the best route for the same trade; gas against that route's swap count
+    optimization = min(amount_out / best.amount_out, 1.0)
+    gas_efficiency = min((len(best.tokens) - 1) / (len(route) - 1), 1.0)
+
+    return StepResult(
+        passed=True,
+        quality=optimization,
+        metrics={"profit_optimization": optimization, "gas_efficiency": gas_efficiency},
+        progress={
+            "swap_executed": True,
+            "route": payload["route"],
+            "amount": payload["amount"],
+            "amount_out": round(amount_out, 8),
+            "best_route": best.tokens,
+            "best_amount_out": round(best.amount_out, 8)
+        }
+    )
+
+
+@action_warmer("analyze_yield_opportunities")
+def warm_yield_universe(params: dict, server_seed: str):
+    seeded_universe(server_seed, int(params.get("pool_count", DEFAULT_POOL_COUNT)))
+
+
+@action_handler("analyze_yield_opportunities", required=("pools",))
+def analyze_yield_opportunities(payload: dict, params: dict, progress: dict, server_seed: str) -> StepResult:
+    universe = seeded_universe(server_seed, int(params.get("pool_count", DEFAULT_POOL_COUNT)))
+    top_k = int(params.get("top_k", 5))
+
+    picks = payload["pools"]
+    # bool is an int subclass, and a list of bools would index the pools as a mask
+    if not isinstance(picks, list) or not all(
+        isinstance(pool, int) and not isinstance(pool, bool) and 0 <= pool < len(universe) for pool in picks
+    ):
+        raise QuestRuleError(f"pools must be a list of pool ids below {len(universe)}")
+    if not 0 < len(picks) <= top_k or len(set(picks)) != len(picks):
+        raise QuestRuleError(f"Pick between 1 and {top_k} different pools")
+
+    filters = {
+        "min_apy": float(params.get("min_apy", 0.0)),
+        "min_tvl": float(params.get("min_tvl", 0.0)),
+        "max_risk": float(params.get("max_risk_score", 1.0))
+    }
+    if not universe.screen(**filters)[picks].all():
+        return StepResult(passed=False)
+
+    # Risk-adjusted APY of the picks against the true top-k
+    best = universe.top_k(top_k, **filters)
+    adjusted = universe.risk_adjusted_apy()
+    apy_achieved = min(float(adjusted[picks].sum() / adjusted[best].sum()), 1.0)
+
+    return StepResult(
+        passed=True,
+        quality=apy_achieved,
+        metrics={"apy_achieved": apy_achieved},
+        progress={
+            "yield_analyzed": True,
+            "pools": picks,
+            "picked_apy": [round(float(universe.apy[pool]), 4) for pool in picks],
+            "best_pools": best.tolist()
+        }
+    )
+
+
+@action_warmer("calculate_risk_reward")
+def warm_risk(params: dict, server_seed: str):
+    # The best return within the budget builds the scenario matrix on the way
+    risk.best_expected_return(server_seed, float(params.get("max_risk", 0.3)), float(params.get("confidence", 0.95)))
+
+
+@action_handler("calculate_risk_reward", required=("allocation",))
+def calculate_risk_reward(payload: dict, params: dict, progress: dict, server_seed: str) -> StepResult:
+    allocation = payload["allocation"]
+    if not isinstance(allocation, dict):
+        raise QuestRuleError("allocation must map assets to amounts")
+    try:
+        weights = risk.allocation_weights({name: float(amount) for name, amount in allocation.items()})
+    except (TypeError, ValueError) as e:
+        raise QuestRuleError(str(e))
+
+    max_risk = float(params.get("max_risk", 0.3))
+    confidence = float(params.get("confidence", 0.95))
+    report = risk.evaluate_allocation(server_seed, weights, confidence)
+    if report.cvar > max_risk:
+        return StepResult(passed=False)
+
+    # Return against the best allocation within the same CVaR budget; risk by how little of the budget drawdowns use
+    best = risk.best_expected_return(server_seed, max_risk, confidence)
+    apy_achieved = min(max(report.expected_return / best, 0.0), 1.0) if best > 0 else 1.0
+    risk_management = min(max(1 - report.max_drawdown / max_risk, 0.0), 1.0)
+
+    return StepResult(
+        passed=True,
+        quality=(apy_achieved + risk_management) / 2,
+        metrics={"apy_achieved": apy_achieved, "risk_management": risk_management},
+        progress={
+            "risk_calculated": True,
+            "allocation": allocation,
+            "expected_apy": round(report.expected_apy, 6),
+            "var": round(report.var, 6),
+            "cvar": round(report.cvar, 6),
+            "max_drawdown": round(report.max_drawdown, 6)
+        }
+    )
+
+
+@action_warmer("flash_loan_strategy")
+def warm_flash_loans(params: dict, server_seed: str):
+    best_flash_loan(server_seed, int(params.get("max_gas", 500_000)))
+
+
+@action_handler("flash_loan_strategy", required=("ops",))
+def flash_loan_strategy(payload: dict, params: dict, progress: dict, server_seed: str) -> StepResult:
+    ops = payload["ops"]
+    if not isinstance(ops, list) or not ops:
+        raise QuestRuleError("ops must be a list of borrow, swap and repay steps")
+
+    max_gas = int(params.get("max_gas", 500_000))
+    result = simulate_strategy(PoolSnapshot(seeded_market(server_seed)), ops, max_gas)
+    if not result.success:
+        raise QuestRuleError(f"Strategy reverted at op {result.failed_step}: {result.failure}")
+    if result.profit <= 0:
+        return StepResult(passed=False)
+
+    # Profit against the best single-loop flash loan within the gas limit; gas against what that loan uses
+    best_profit, best_gas = best_flash_loan(server_seed, max_gas)
+    profit_optimization = min(result.profit / best_profit, 1.0) if best_profit > 0 else 1.0
+    gas_efficiency = min(best_gas / result.gas_used, 1.0) if best_gas else 1.0
+
+    return StepResult(
+        passed=True,
+        quality=profit_optimization,
+        metrics={"profit_optimization": profit_optimization, "gas_efficiency": gas_efficiency},
+        progress={
+            "flash_loan_executed": True,
+            "profit": round(result.profit, 6),
+            "gas_used": result.gas_used,
+            "balances": {token: round(amount, 8) for token, amount in result.balances.items()}
+        }
+    )
+
+
+@action_handler("submit_tx_proof", required=("txid",), completes_quest=True)
+def submit_tx_proof(payload: dict, params: dict, progress: dict, server_seed: str) -> StepResult:
+    # In production, verify txid via Stacks API
+    return StepResult(
+        passed=True,
+        quality=1.0,
+        progress={"tx_submitted": True, "txid": payload["txid"]}
+    )
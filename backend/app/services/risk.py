@@ -0,0 +1,175 @@
+"""
+Monte Carlo risk engine for yield allocations
+
+A quest instance's scenarios are a fixed-size matrix of daily growth paths
+for every asset, generated from its server seed and cached: SCENARIOS paths
+of HORIZON_DAYS days, with correlated diffusion, per-asset yield accrual and
+Poisson shock events (depegs, exploits). The matrix is float32, about 6 MB per
+seed, so the cache is kept small. Building one takes about 100 ms, so a quest
+builds its seed's matrix when it starts (QuestValidator.warm), not on its
+first risk action.
+
+Evaluating an allocation is one batched contraction of the matrix with the
+weights, then VaR and CVaR from a partition of the final losses and drawdowns
+from a running maximum along each path. The same tail maths runs column-wise
+over a grid of allocations to find the best return inside a risk budget.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import product
+from typing import Dict
+import numpy as np
+from app.services.price_paths import seeded_rng
+
+SCENARIOS = 10_000
+HORIZON_DAYS = 30
+DAYS_PER_YEAR = 365
+
+
+@dataclass(frozen=True)
+class RiskAsset:
+    """Annualized yield, volatility and shock parameters"""
+    name: str
+    apy: float
+    volatility: float
+    shock_intensity: float  # expected shocks per year
+    shock_mean: float  # mean log size of a shock
+    shock_std: float
+
+
+ASSETS = (
+    RiskAsset("USDA", apy=0.08, volatility=0.03, shock_intensity=0.5, shock_mean=-0.10, shock_std=0.05),
+    RiskAsset("STX", apy=0.09, volatility=0.75, shock_intensity=2.0, shock_mean=-0.05, shock_std=0.10),
+    RiskAsset("sBTC", apy=0.01, volatility=0.55, shock_intensity=1.0, shock_mean=-0.03, shock_std=0.05),
+    RiskAsset("ALEX", apy=0.35, volatility=1.10, shock_intensity=3.0, shock_mean=-0.10, shock_std=0.15),
+    RiskAsset("STX-sBTC-LP", apy=0.22, volatility=0.50, shock_intensity=1.0, shock_mean=-0.05, shock_std=0.05),
+)
+ASSET_INDEX = {asset.name: i for i, asset in enumerate(ASSETS)}
+
+# Volatile assets move together; the stablecoin barely follows them
+CRYPTO_CORRELATION = 0.6
+STABLE_CORRELATION = 0.1
+
+
+@dataclass
+class RiskReport:
+    expected_return: float  # mean return over the horizon
+    expected_apy: float  # expected_return annualized
+    var: float  # value at risk: loss not exceeded at the confidence level
+    cvar: float  # expected loss in the tail beyond the VaR
+    max_drawdown: float  # mean over scenarios of the worst peak-to-trough fall
+
+
+def _correlation() -> np.ndarray:
+    n = len(ASSETS)
+    stable = np.array([asset.volatility < 0.1 for asset in ASSETS])
+    corr = np.full((n, n), CRYPTO_CORRELATION)
+    corr[stable, :] = corr[:, stable] = STABLE_CORRELATION
+    np.fill_diagonal(corr, 1.0)
+    return corr
+
+
+@lru_cache(maxsize=16)
+def scenario_matrix(server_seed: str) -> np.ndarray:
+    """
+    Growth of one unit of each asset, shape (assets, HORIZON_DAYS + 1, SCENARIOS),
+    starting at 1. Scenarios are the last axis so a portfolio's value on a day is
+    one contiguous row. The returned array is shared through the cache and is read-only.
+    """
+    rng = seeded_rng(server_seed, "risk-scenarios", SCENARIOS, HORIZON_DAYS)
+    dt = 1 / DAYS_PER_YEAR
+    apy, vol, intensity, shock_mean, shock_std = (
+        np.array([getattr(asset, name) for asset in ASSETS])
+        for name in ("apy", "volatility", "shock_intensity", "shock_mean", "shock_std")
+    )
+
+    shape = (len(ASSETS), HORIZON_DAYS, SCENARIOS)
+    normals = rng.standard_normal(shape, dtype=np.float32)
+    diffusion = np.tensordot(np.linalg.cholesky(_correlation()), normals, axes=1)
+    log_returns = diffusion * (vol * np.sqrt(dt))[:, None, None] + ((np.log1p(apy) - 0.5 * vol ** 2) * dt)[:, None, None]
+
+    # Shocks are rare, so only the days that have one draw a size
+    shock_counts = rng.poisson((intensity * dt)[:, None, None], shape)
+    hit = np.nonzero(shock_counts)
+    counts = shock_counts[hit]
+    asset = hit[0]
+    log_returns[hit] += shock_mean[asset] * counts + shock_std[asset] * np.sqrt(counts) * rng.standard_normal(len(counts))
+
+    growth = np.empty((len(ASSETS), HORIZON_DAYS + 1, SCENARIOS), dtype=np.float32)
+    growth[:, 0] = 1.0
+    np.exp(np.cumsum(log_returns, axis=1), out=growth[:, 1:])
+    growth.setflags(write=False)
+    return growth
+
+
+def allocation_weights(allocation: Dict[str, float]) -> np.ndarray:
+    """Asset weights summing to 1 from a name -> amount (or fraction) mapping"""
+    weights = np.zeros(len(ASSETS))
+    for name, amount in allocation.items():
+        if name not in ASSET_INDEX:
+            raise ValueError(f"Unknown asset: {name}")
+        # NaN fails every comparison, so it would slip past the sign check and poison the weights
+        if not np.isfinite(amount):
+            raise ValueError(f"Allocation must be a finite number: {name}")
+        if amount < 0:
+            raise ValueError(f"Allocation must not be negative: {name}")
+        weights[ASSET_INDEX[name]] = amount
+
+    total = weights.sum()
+    if total <= 0:
+        raise ValueError("Allocation must not be empty")
+    return weights / total
+
+
+def tail_risk(losses: np.ndarray, confidence: float):
+    """(VaR, CVaR) of losses along axis 0; works column-wise on a (scenarios, portfolios) matrix"""
+    tail = max(1, int(round((1 - confidence) * len(losses))))
+    cut = len(losses) - tail
+    partitioned = np.partition(losses, cut, axis=0)
+    return partitioned[cut], partitioned[cut:].mean(axis=0)
+
+
+def max_drawdowns(values: np.ndarray) -> np.ndarray:
+    """Worst peak-to-trough fall of each path, for values shaped (days, scenarios)"""
+    # A running peak row by row; np.maximum.accumulate along the day axis is several times slower
+    peak = values[0].copy()
+    worst = np.ones_like(peak)
+    ratio = np.empty_like(peak)
+    for day in values[1:]:
+        np.maximum(peak, day, out=peak)
+        np.divide(day, peak, out=ratio)
+        np.minimum(worst, ratio, out=worst)
+    return 1 - worst
+
+
+def evaluate_allocation(server_seed: str, weights: np.ndarray, confidence: float = 0.95) -> RiskReport:
+    """Buy-and-hold risk of an allocation over the seed's scenarios"""
+    values = np.tensordot(weights.astype(np.float32), scenario_matrix(server_seed), axes=1)  # (days + 1, scenarios)
+    returns = values[-1] - 1
+    var, cvar = tail_risk(-returns, confidence)
+    expected_return = float(returns.mean())
+
+    return RiskReport(
+        expected_return=expected_return,
+        expected_apy=(1 + expected_return) ** (DAYS_PER_YEAR / HORIZON_DAYS) - 1,
+        var=float(var),
+        cvar=float(cvar),
+        max_drawdown=float(max_drawdowns(values).mean())
+    )
+
+
+def simplex_grid(assets: int, steps: int) -> np.ndarray:
+    """Every allocation in 1/steps increments, shape (assets, allocations)"""
+    grid = [point for point in product(range(steps + 1), repeat=assets) if sum(point) == steps]
+    return np.array(grid, dtype=np.float32).T / steps
+
+
+@lru_cache(maxsize=256)
+def best_expected_return(server_seed: str, max_risk: float, confidence: float = 0.95, steps: int = 5) -> float:
+    """Highest expected return of any grid allocation whose CVaR is within max_risk"""
+    final_growth = scenario_matrix(server_seed)[:, -1]  # (assets, scenarios)
+    returns = final_growth.T @ simplex_grid(len(ASSETS), steps) - 1  # (scenarios, allocations)
+    _, cvar = tail_risk(-returns, confidence)
+    expected = returns.mean(axis=0)
+    within = expected[cvar <= max_risk]
+    return float(within.max()) if within.size else 0.0
@@ -0,0 +1,213 @@
+"""
+XP distribution: streaming percentiles and histogram
+
+A KLL quantile sketch (Karnin, Lang & Liberty) keeps a few hundred weighted
+samples of everyone's XP, so "top N%" and quantile queries answer from a
+small sorted summary instead of scanning the leaderboard. Sketches are
+mergeable, so per-worker or per-shard sketches can be combined.
+
+Alongside it, fixed histogram buckets hold exact player counts per XP range.
+
+Both are loaded from the `leaderboard` table on first use and updated by the
+quest completion path. A sketch cannot forget a player's old XP, so once too
+many players have moved the distribution is reloaded on the next read. It is
+also reloaded once the table's revision moves (see app.services.leaderboard_store).
+"""
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from math import ceil
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+import random
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.leaderboard import Leaderboard
+from app.services.leaderboard_store import RevisionCheck
+
+# Lower XP bound of each histogram bucket; the last bucket is open-ended
+HISTOGRAM_EDGES = (0, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+
+class KllSketch:
+    """Mergeable streaming quantile sketch over numbers"""
+
+    def __init__(self, k: int = 200, c: float = 2 / 3, seed: Optional[int] = None):
+        self.k = k
+        self.c = c
+        self.n = 0
+        self.compactors: List[List[float]] = [[]]
+        self._size = 0
+        self._max_size = 0
+        self._rng = random.Random(seed)
+        self._cdf: Optional[Tuple[List[float], List[int]]] = None
+        self._update_max_size()
+
+    def update(self, value: float):
+        self.compactors[0].append(value)
+        self._size += 1
+        self.n += 1
+        self._cdf = None
+        if self._size >= self._max_size:
+            self._compress()
+
+    def merge(self, other: "KllSketch"):
+        """Fold another sketch's samples into this one"""
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+
+        self.n += other.n
+        self._size = sum(len(items) for items in self.compactors)
+        self._cdf = None
+        while self._size >= self._max_size:
+            self._compress()
+
+    def rank(self, value: float) -> int:
+        """Approximate number of values strictly below `value`"""
+        values, cumulative = self._weighted_cdf()
+        position = bisect_left(values, value)
+        return cumulative[position - 1] if position else 0
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate value at fraction q (0..1) of the distribution"""
+        values, cumulative = self._weighted_cdf()
+        if not values:
+            return None
+        target = q * cumulative[-1]
+        return values[min(bisect_left(cumulative, target), len(values) - 1)]
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return int(ceil(self.c ** depth * self.k)) + 1
+
+    def _update_max_size(self):
+        self._max_size = sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def _grow(self):
+        self.compactors.append([])
+        self._update_max_size()
+
+    def _compress(self):
+        # Halve the lowest full level, promoting every other sample at double weight
+        for level in range(len(self.compactors)):
+            if len(self.compactors[level]) >= self._capacity(level):
+                if level + 1 >= len(self.compactors):
+                    self._grow()
+
+                items = sorted(self.compactors[level])
+                leftover = [items.pop()] if len(items) % 2 else []
+                self.compactors[level + 1].extend(items[self._rng.randint(0, 1)::2])
+                self.compactors[level] = leftover
+
+                self._size = sum(len(items) for items in self.compactors)
+                if self._size < self._max_size:
+                    break
+
+    def _weighted_cdf(self) -> Tuple[List[float], List[int]]:
+        """Sorted samples with cumulative weights, cached until the next write"""
+        if self._cdf is None:
+            weighted = sorted(
+                (value, 1 << level)
+                for level, items in enumerate(self.compactors)
+                for value in items
+            )
+            self._cdf = (
+                [value for value, _ in weighted],
+                list(accumulate(weight for _, weight in weighted))
+            )
+        return self._cdf
+
+
+def histogram_bucket(xp: int) -> int:
+    """Index of the histogram bucket containing an XP total"""
+    return max(bisect_right(HISTOGRAM_EDGES, xp) - 1, 0)
+
+
+class XpDistribution:
+    """Quantile sketch and histogram over every ranked player's XP"""
+
+    def __init__(self, k: int = 200, max_stale_fraction: float = 0.1):
+        self.k = k
+        self.max_stale_fraction = max_stale_fraction
+        self._lock = Lock()
+        self._revision = RevisionCheck(settings.leaderboard_reload_check_seconds)
+        self._reset()
+
+    def _reset(self):
+        self._sketch = KllSketch(k=self.k)
+        self._counts = [0] * len(HISTOGRAM_EDGES)
+        self._players = 0
+        self._stale = 0
+        self._loaded = False
+
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    def load(self, xp_values):
+        """Replace the distribution with the given XP totals and mark it loaded"""
+        with self._lock:
+            self._reset()
+            for xp in xp_values:
+                xp = int(xp or 0)
+                self._sketch.update(xp)
+                self._counts[histogram_bucket(xp)] += 1
+                self._players += 1
+            self._loaded = True
+
+    def record(self, previous_xp: Optional[int], xp: int):
+        """
+        Move a player from previous_xp (None for a new player) to xp.
+        Ignored until loaded, since the load reads committed rows.
+        """
+        with self._lock:
+            if not self._loaded:
+                return
+
+            if previous_xp is None:
+                self._players += 1
+            else:
+                self._counts[histogram_bucket(previous_xp)] -= 1
+                self._stale += 1
+
+            self._counts[histogram_bucket(xp)] += 1
+            self._sketch.update(xp)
+
+            if self._stale > self.max_stale_fraction * max(self._players, 1):
+                # Too many superseded samples: rebuild from the table on the next read
+                self._loaded = False
+
+    def ensure_loaded(self, db: Session, chunk_size: int = 10_000):
+        """Load from the leaderboard table if not yet loaded, or rewritten since"""
+        if self.is_loaded() and not self._revision.stale(db):
+            return
+        self._revision.loading(db)
+        self.load(xp for xp, in db.query(Leaderboard.xp).yield_per(chunk_size))
+
+    def player_count(self) -> int:
+        return self._players
+
+    def top_percent(self, xp: int) -> float:
+        """Percentage of players with at least this much XP"""
+        if not self._sketch.n:
+            return 100.0
+        below = self._sketch.rank(xp) / self._sketch.n
+        return round(100 * (1 - below), 1)
+
+    def quantiles(self, fractions: List[float]) -> Dict[float, int]:
+        """Approximate XP at each fraction of the distribution"""
+        return {q: int(self._sketch.quantile(q) or 0) for q in fractions}
+
+    def histogram(self) -> List[Tuple[int, Optional[int], int]]:
+        """(min_xp, max_xp or None, players) for each bucket"""
+        upper_bounds = [edge - 1 for edge in HISTOGRAM_EDGES[1:]] + [None]
+        return list(zip(HISTOGRAM_EDGES, upper_bounds, self._counts))
+
+    def clear(self):
+        """Drop everything so the next ensure_loaded reloads from the database"""
+        with self._lock:
+            self._reset()
+
+
+# Global XP distribution
+xp_distribution = XpDistribution()
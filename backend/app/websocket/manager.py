@@ -7,6 +7,8 @@ class ConnectionManager:
     def __init__(self):
         # Store active connections by user_id
         self.active_connections: Dict[str, List[WebSocket]] = {}
+        # Store topic subscribers, e.g. "leaderboard"
+        self.topic_connections: Dict[str, List[WebSocket]] = {}
     
     async def connect(self, websocket: WebSocket, user_id: str):
         """Accept WebSocket connection and add to user's connections"""
@@ -26,6 +28,24 @@ class ConnectionManager:
             # Clean up empty user connections
             if not self.active_connections[user_id]:
                 del self.active_connections[user_id]
+        
+        for topic in list(self.topic_connections):
+            self.unsubscribe(websocket, topic)
+    
+    def subscribe(self, websocket: WebSocket, topic: str):
+        """Add connection to a topic's subscribers"""
+        subscribers = self.topic_connections.setdefault(topic, [])
+        if websocket not in subscribers:
+            subscribers.append(websocket)
+    
+    def unsubscribe(self, websocket: WebSocket, topic: str):
+        """Remove connection from a topic's subscribers"""
+        if topic in self.topic_connections:
+            if websocket in self.topic_connections[topic]:
+                self.topic_connections[topic].remove(websocket)
+            
+            if not self.topic_connections[topic]:
+                del self.topic_connections[topic]
     
     async def send_personal_message(self, message: dict, user_id: str):
         """Send message to specific user"""
@@ -47,6 +67,16 @@ class ConnectionManager:
                     # Remove dead connections
                     connections.remove(connection)
 
+    
+    async def publish(self, topic: str, message: dict):
+        """Send message to every subscriber of a topic"""
+        for connection in list(self.topic_connections.get(topic, [])):
+            try:
+                await connection.send_text(json.dumps(message))
+            except:
+                # Remove dead connections
+                self.unsubscribe(connection, topic)
+
 
 # Global connection manager
 manager = ConnectionManager()
@@ -0,0 +1,57 @@
+"""
+Leaderboard rank change pushes
+
+When a completion moves a player up the all-time board, everyone they passed
+drops one place: the players whose XP was at or above the mover's old XP
+(tied players share a rank) and is below the new XP. Connected players among
+them get a `rank_update`, the mover gets theirs, and subscribers of the
+`leaderboard` topic get the mover's delta, so clients no longer poll to
+notice changes.
+Pushes reach connections held by this process.
+"""
+from app.services.leaderboard import RankChange
+from app.services.leaderboard_store import LeaderboardStore, leaderboard_store
+from app.websocket.manager import ConnectionManager, manager
+
+TOPICS = {"leaderboard"}
+
+
+async def push_rank_change(
+    change: RankChange,
+    store: LeaderboardStore = leaderboard_store,
+    connections: ConnectionManager = manager
+):
+    """Send rank_update deltas for a rank change and publish it to the leaderboard topic"""
+    
+    await connections.send_personal_message({
+        "type": "rank_update",
+        "user_id": change.user_id,
+        "xp": change.xp,
+        "rank": change.rank,
+        "previous_rank": change.previous_rank
+    }, change.user_id)
+    
+    # A new entrant passes everyone below their XP
+    lowest_passed = change.previous_xp if change.previous_xp is not None else float("-inf")
+    
+    if change.xp > lowest_passed:
+        # Only connected players can be told, so rank just those in one batch
+        others = [user_id for user_id in connections.active_connections if user_id != change.user_id]
+        for user_id, (entry, rank) in store.rank_many(others).items():
+            if lowest_passed <= entry.xp < change.xp:
+                # The mover is the one player newly above them, so they were ranked one place higher
+                await connections.send_personal_message({
+                    "type": "rank_update",
+                    "user_id": user_id,
+                    "xp": entry.xp,
+                    "rank": rank,
+                    "previous_rank": rank - 1
+                }, user_id)
+    
+    await connections.publish("leaderboard", {
+        "type": "leaderboard_update",
+        "user_id": change.user_id,
+        "xp": change.xp,
+        "rank": change.rank,
+        "previous_rank": change.previous_rank
+    })
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query
 from app.websocket.manager import manager
+from app.websocket.rank_updates import TOPICS
 from app.core.security import verify_token
 import json
 
@@ -46,6 +47,13 @@ async def websocket_endpoint(
                     "timestamp": message.get("timestamp")
                 }, user_id)
             
+            elif message.get("type") == "subscribe" and message.get("topic") in TOPICS:
+                manager.subscribe(websocket, message["topic"])
+                await manager.send_personal_message({
+                    "type": "subscribed",
+                    "topic": message["topic"]
+                }, user_id)
+            
     except WebSocketDisconnect:
         manager.disconnect(websocket, user_id)
     except Exception as e:
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark the AMM simulator on one core
+
+Measures raw pool swaps, and full liquidity simulations (seeded pool, price
+path generation and the vectorized hold over it) with a fresh seed each time
+so the path cache never hits.
+
+Usage (from backend/):
+    python -m benchmarks.bench_amm [hold_minutes ...]
+"""
+import sys
+import time
+from app.services.amm import Pool, simulate_add_liquidity
+from app.services.price_paths import simulate_price_path
+
+
+def per_second(fn, seconds: float = 1.0) -> float:
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn(count)
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def run(hold_minutes: int):
+    pool = Pool(1_000_000.0, 2_000_000.0)
+    swaps = per_second(lambda i: pool.swap_x_for_y(10.0) if i % 2 else pool.swap_y_for_x(20.0))
+
+    simulate_price_path.cache_clear()
+    simulations = per_second(lambda i: simulate_add_liquidity(f"seed-{i}", "STX/sBTC", 5.0, hold_minutes=hold_minutes))
+
+    print(f"{hold_minutes:>6} minute hold")
+    print(f"  swaps        {swaps:>12,.0f} /s")
+    print(f"  simulations  {simulations:>12,.0f} /s")
+
+
+if __name__ == "__main__":
+    windows = [int(arg) for arg in sys.argv[1:]] or [60, 1440, 10080]
+    for window in windows:
+        run(window)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark the chunked leaderboard rebuild at 1M and 10M completed runs
+
+Builds an on-disk SQLite database with ~10 completed quests per user,
+corrupts a slice of the leaderboard, then times a reconcile dry run and
+records the peak Python heap (tracemalloc) while the fix is applied, so the
+bounded-memory claim is checked alongside throughput.
+
+Usage (from backend/):
+    python -m benchmarks.bench_leaderboard_rebuild [row_count ...]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models.leaderboard import Leaderboard
+from app.models.quest import UserQuest
+from app.services.leaderboard import badge_name, reconcile_leaderboard
+
+RUNS_PER_USER = 10
+
+
+def build_session(path: str, row_count: int):
+    """Database with row_count completed runs and a leaderboard that has drifted for 1% of users"""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    rng = random.Random(42)
+    quest_ids = [f"quest-{i}" for i in range(RUNS_PER_USER)]
+    user_count = row_count // RUNS_PER_USER
+
+    for start in range(0, user_count, 10_000):
+        runs, rows = [], []
+        for u in range(start, min(start + 10_000, user_count)):
+            user_id = f"user-{u:08d}"
+            scores = [rng.randint(0, 200) for _ in quest_ids]
+            runs.extend(
+                {"id": f"uq-{u}-{q}", "user_id": user_id, "quest_id": quest_id, "state": "completed", "score": score}
+                for q, (quest_id, score) in enumerate(zip(quest_ids, scores))
+            )
+            xp = sum(scores) + (1 if u % 100 == 0 else 0)
+            rows.append({"user_id": user_id, "xp": xp, "badges": [badge_name(quest_id) for quest_id in quest_ids]})
+        db.execute(UserQuest.__table__.insert(), runs)
+        db.execute(Leaderboard.__table__.insert(), rows)
+        db.commit()
+
+    return db, user_count
+
+
+def run(row_count: int, chunk_size: int = 10_000):
+    with tempfile.TemporaryDirectory() as tmp:
+        db, user_count = build_session(os.path.join(tmp, "bench.db"), row_count)
+
+        # Time a dry run, then apply the fix under tracemalloc for the peak heap
+        start = time.perf_counter()
+        report = reconcile_leaderboard(db, chunk_size=chunk_size, dry_run=True)
+        seconds = time.perf_counter() - start
+
+        tracemalloc.start()
+        applied = reconcile_leaderboard(db, chunk_size=chunk_size)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert report.users == user_count
+        assert report.updated == applied.updated == len(range(0, user_count, 100))
+        db.close()
+
+    print(f"{row_count:>11,} rows  {user_count:>10,} users")
+    print(f"  reconcile  {seconds:>9.1f} s  {row_count / seconds:>12,.0f} rows/s  "
+          f"peak heap {peak / 2**20:>7.1f} MiB  ({applied.updated:,} drifted rows fixed)")
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or [1_000_000, 10_000_000]
+    for count in counts:
+        run(count)
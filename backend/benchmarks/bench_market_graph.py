@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark the market graph behind the arbitrage and routing quests
+
+"cold" builds a fresh seed's market every time (graph arrays, Bellman-Ford,
+loop ranking, best-profit search), which is what a quest instance's first
+arbitrage action pays. "warm" scores actions against a cached market, which
+is every later action.
+
+Usage (from backend/):
+    python -m benchmarks.bench_market_graph
+"""
+import time
+from app.services.market_graph import seeded_market
+from app.services.quest_rules import QuestValidator
+
+VALIDATOR = QuestValidator({
+    "steps": [
+        {"action": "execute_arbitrage", "params": {"max_slippage": 0.005}},
+        {"action": "multi_hop_swap", "params": {"max_hops": 3}}
+    ]
+})
+
+MARKET = seeded_market("seed")
+BEST_CYCLE = [MARKET.tokens[token] for token in MARKET.arbitrage_cycles[0][1]]
+BEST_AMOUNT, _ = MARKET.best_arbitrage_amount(MARKET.arbitrage_cycles[0][1], 0.005)
+
+
+def per_second(fn, seconds: float = 1.0) -> float:
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn(count)
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def cold(i: int):
+    market = seeded_market(f"seed-{i}")
+    market.best_arbitrage_profit(0.005)
+    market.best_route(0, 1, 1_000.0)
+
+
+def warm_arbitrage(i: int):
+    VALIDATOR.validate("execute_arbitrage", {"cycle": BEST_CYCLE, "amount": BEST_AMOUNT * (0.5 + i % 100 / 100)}, {}, "seed")
+
+
+def warm_swap(i: int):
+    VALIDATOR.validate("multi_hop_swap", {"route": ["STX", "USDA", "sBTC"], "amount": 1_000 + i % 100}, {}, "seed")
+
+
+if __name__ == "__main__":
+    seeded_market.cache_clear()
+    for name, fn in (("cold market", cold), ("warm arbitrage", warm_arbitrage), ("warm swap", warm_swap)):
+        rate = per_second(fn)
+        print(f"  {name:<15} {rate:>10,.0f} /s  {1_000_000 / rate:>8,.0f} us")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark GET /quests/public requests per second with and without the catalog cache
+
+"uncached" is the original handler: query active quests and let FastAPI
+serialize the ORM rows through the response model on every request. "cached"
+is the current handler serving pre-serialized bytes from the quest catalog.
+Both run end-to-end through FastAPI's TestClient against in-memory SQLite.
+
+Usage (from backend/):
+    python -m benchmarks.bench_quest_catalog [quest_count ...]
+"""
+import sys
+import time
+from typing import List
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.api.v1.quests import list_public_quests
+from app.core.database import Base, get_db
+from app.models.quest import Quest
+from app.schemas.quest import QuestResponse
+from app.services.quest_catalog import quest_catalog
+
+
+def build_sessionmaker(quest_count: int):
+    """In-memory database with quest_count active quests"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+
+    db = SessionLocal()
+    db.add_all(
+        Quest(
+            slug=f"quest-{i}",
+            title=f"Quest {i}",
+            description="Master the art of providing liquidity to DeFi pools. " * 2,
+            difficulty=i % 4 + 1,
+            reward_json={"xp": 50 + i, "badge": f"quest-{i}", "badge_id": i},
+            game_rules={"type": "liquidity-kata", "steps": [{"action": "simulate_add_liquidity"}]},
+            active=True
+        )
+        for i in range(quest_count)
+    )
+    db.commit()
+    db.close()
+    return SessionLocal
+
+
+def build_app(SessionLocal, cached: bool) -> FastAPI:
+    app = FastAPI()
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    if cached:
+        app.get("/quests/public", response_model=List[QuestResponse])(list_public_quests)
+    else:
+        @app.get("/quests/public", response_model=List[QuestResponse])
+        async def uncached_public_quests(db: Session = Depends(get_db)):
+            return db.query(Quest).filter(Quest.active == True).all()
+
+    app.dependency_overrides[get_db] = override_get_db
+    return app
+
+
+def requests_per_second(client: TestClient, seconds: float = 2.0) -> float:
+    client.get("/quests/public")  # warm up
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        client.get("/quests/public")
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def run(quest_count: int):
+    SessionLocal = build_sessionmaker(quest_count)
+    quest_catalog.invalidate()
+
+    results = {}
+    for name, cached in (("uncached", False), ("cached", True)):
+        with TestClient(build_app(SessionLocal, cached)) as client:
+            results[name] = requests_per_second(client)
+
+    print(f"{quest_count:>5} quests")
+    for name, rps in results.items():
+        print(f"  {name:<9} {rps:>10,.0f} req/s  {rps / results['uncached']:>6.1f}x")
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or [4, 50, 500]
+    for count in counts:
+        run(count)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark user rank lookups at 100k and 1M users
+
+Compares the original per-request aggregation over user_quests, a COUNT
+range query on the indexed leaderboard.xp column, and the in-memory
+leaderboard store's sorted-set rank.
+
+Usage (from backend/):
+    python -m benchmarks.bench_rank_lookup [user_count ...]
+"""
+import random
+import sys
+import time
+import uuid
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models.leaderboard import Leaderboard
+from app.models.quest import UserQuest
+from app.services.leaderboard_store import MemoryLeaderboardStore, StoredEntry
+
+
+def build_session(user_count: int):
+    """In-memory database with one completed quest and leaderboard row per user"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    rng = random.Random(42)
+    quest_id = str(uuid.uuid4())
+    user_ids = [f"user-{i}" for i in range(user_count)]
+    xp_values = [rng.randint(0, 10_000) for _ in user_ids]
+
+    db.execute(UserQuest.__table__.insert(), [
+        {"id": f"uq-{i}", "user_id": user_id, "quest_id": quest_id, "state": "completed", "score": xp}
+        for i, (user_id, xp) in enumerate(zip(user_ids, xp_values))
+    ])
+    db.execute(Leaderboard.__table__.insert(), [
+        {"user_id": user_id, "xp": xp} for user_id, xp in zip(user_ids, xp_values)
+    ])
+    db.commit()
+
+    return db, list(zip(user_ids, xp_values))
+
+
+def aggregate_rank(db, xp: int) -> int:
+    """Rank as originally computed: group every user's completions on each lookup"""
+    return db.query(func.count(UserQuest.user_id)).filter(
+        UserQuest.state == "completed"
+    ).group_by(UserQuest.user_id).having(
+        func.sum(UserQuest.score) > xp
+    ).count() + 1
+
+
+def count_rank(db, xp: int) -> int:
+    """Rank from a COUNT range query on leaderboard.xp"""
+    return db.query(func.count(Leaderboard.user_id)).filter(Leaderboard.xp > xp).scalar() + 1
+
+
+def time_per_call(fn, samples, repeat: int) -> float:
+    """Average seconds per call over `repeat` lookups"""
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(samples[i % len(samples)])
+    return (time.perf_counter() - start) / repeat
+
+
+def run(user_count: int):
+    db, rows = build_session(user_count)
+    store = MemoryLeaderboardStore()
+    store.load(StoredEntry(user_id=user_id, xp=xp) for user_id, xp in rows)
+
+    samples = random.Random(7).sample(rows, 100)
+    assert all(count_rank(db, xp) == store.rank(user_id) for user_id, xp in samples[:3])
+
+    results = {
+        "aggregate": time_per_call(lambda row: aggregate_rank(db, row[1]), samples, 3),
+        "count": time_per_call(lambda row: count_rank(db, row[1]), samples, 20),
+        "store": time_per_call(lambda row: store.rank(row[0]), samples, 100_000),
+    }
+
+    print(f"{user_count:>9,} users")
+    for name, seconds in results.items():
+        speedup = results["aggregate"] / seconds
+        print(f"  {name:<11} {seconds * 1e6:>12,.2f} us/lookup  {speedup:>12,.0f}x")
+
+    db.close()
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    for count in counts:
+        run(count)
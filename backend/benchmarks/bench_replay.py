@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark the replay verifier's throughput by worker count
+
+Builds an in-memory database of completed yield-sprint and liquidity quests,
+each with its own seed and a logged action history, then times a full
+verification at each worker count. Workers only replay; the parent streams
+shards from the database, so quests/s should grow with the worker count up
+to the number of cores.
+
+Usage (from backend/):
+    python -m benchmarks.bench_replay [quest_count] [workers ...]
+"""
+import os
+import sys
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.core.database import Base
+from app.models.quest import Quest, UserQuest
+from app.models.quest_action import QuestAction
+from app.services.quest_log import progress_delta
+from app.services.quest_replay import verify_completed_quests
+from app.services.quest_rules import QuestValidator
+from app.services.yield_screener import seeded_universe
+
+QUESTS = {
+    "liquidity": (
+        {"steps": [{"action": "simulate_add_liquidity", "params": {"pair": "STX/sBTC", "min_amount": 1}},
+                   {"action": "predict_price_move", "params": {"window_minutes": 60}}]},
+        lambda seed: [("simulate_add_liquidity", {"pair": "STX/sBTC", "amount": 5}),
+                      ("predict_price_move", {"prediction": "up", "confidence": 2})]
+    ),
+    "yield": (
+        {"steps": [{"action": "analyze_yield_opportunities", "params": {"min_apy": 5}},
+                   {"action": "calculate_risk_reward", "params": {"max_risk": 0.3}}]},
+        lambda seed: [("analyze_yield_opportunities", {"pools": seeded_universe(seed).top_k(5, min_apy=5).tolist()}),
+                      ("calculate_risk_reward", {"allocation": {"USDA": 70, "STX-sBTC-LP": 30}})]
+    )
+}
+
+
+def build_session(quest_count: int):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all(Quest(id=name, slug=name, title=name, game_rules=rules) for name, (rules, _) in QUESTS.items())
+
+    names = list(QUESTS)
+    for i in range(quest_count):
+        name = names[i % len(names)]
+        rules, actions = QUESTS[name]
+        validator = QuestValidator(rules)
+        seed = f"bench-{i}"
+
+        progress, score, state, log = {}, 0.0, "started", []
+        for seq, (action, payload) in enumerate(actions(seed), start=1):
+            previous, previous_score = progress, score
+            score, progress, state = validator.validate(action, payload, progress, seed)
+            log.append(QuestAction(user_quest_id=f"uq-{i}", seq=seq, action=action, payload=payload,
+                                   progress_delta=progress_delta(previous, progress), score_delta=score - previous_score, state=state))
+        db.add(UserQuest(id=f"uq-{i}", user_id=f"user-{i // 5:06d}", quest_id=name, state=state, score=score,
+                         progress=progress, server_seed=seed, action_count=len(log), snapshot_seq=len(log)))
+        db.add_all(log)
+    db.commit()
+    return db
+
+
+def run(quest_count: int, worker_counts):
+    db = build_session(quest_count)
+    print(f"{quest_count:,} completed quests, {os.cpu_count()} cores")
+    for workers in worker_counts:
+        start = time.perf_counter()
+        report = verify_completed_quests(db, workers=workers, chunk_size=200)
+        elapsed = time.perf_counter() - start
+        assert report.checked == quest_count and not report.discrepancies
+        print(f"  {workers:>2} workers  {quest_count / elapsed:>10,.0f} quests/s")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    workers = [int(arg) for arg in sys.argv[2:]] or [1, 2, 4]
+    run(count, workers)
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark the Monte Carlo risk engine on one core
+
+"scenarios" generates a fresh seed's matrix and "frontier" is the best-return
+search over the allocation grid; together they are a new instance's cold cost
+(about 120 ms), paid by a background task when the quest starts. "evaluate" is
+VaR, CVaR and drawdown for one allocation against a cached matrix: the
+per-action cost once that task has run. An action that arrives before it, or on
+a worker whose cache was evicted, pays the cold cost in a threadpool.
+
+Usage (from backend/):
+    python -m benchmarks.bench_risk
+"""
+import time
+from app.services.risk import SCENARIOS, allocation_weights, best_expected_return, evaluate_allocation, scenario_matrix
+
+
+def milliseconds(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(i)
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+if __name__ == "__main__":
+    weights = allocation_weights({"USDA": 50, "STX-sBTC-LP": 30, "ALEX": 20})
+    scenario_matrix.cache_clear()
+
+    print(f"{SCENARIOS:,} scenarios")
+    print(f"  scenarios  {milliseconds(lambda i: scenario_matrix(f'seed-{i}'), 10):>8.2f} ms")
+    print(f"  evaluate   {milliseconds(lambda i: evaluate_allocation('seed-0', weights), 1000):>8.2f} ms")
+    print(f"  frontier   {milliseconds(lambda i: best_expected_return('seed-0', 0.3 + i / 1000), 10):>8.2f} ms")
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark the yield pool screener on one core
+
+"generate" builds a fresh seed's columnar universe; "top_k" screens it with
+the min_apy/TVL/risk masks and ranks the top 5 by risk-adjusted APY.
+
+Usage (from backend/):
+    python -m benchmarks.bench_yield_screener [pool_count ...]
+"""
+import sys
+import time
+from app.services.yield_screener import seeded_universe
+
+
+def milliseconds(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(i)
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def run(pool_count: int):
+    seeded_universe.cache_clear()
+    generate = milliseconds(lambda i: seeded_universe(f"seed-{i}", pool_count), 10)
+    universe = seeded_universe("seed-0", pool_count)
+    top_k = milliseconds(lambda i: universe.top_k(5, min_apy=5, min_tvl=100_000, max_risk=0.7), 100)
+
+    print(f"{pool_count:>9,} pools")
+    print(f"  generate  {generate:>8.2f} ms")
+    print(f"  top_k     {top_k:>8.2f} ms")
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    for count in counts:
+        run(count)
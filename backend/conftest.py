@@ -75,6 +75,27 @@ def client(db_session):
     app.dependency_overrides.clear()
 
 
+@pytest.fixture(scope="function")
+def api_client(db_session):
+    """Create a test client with the v1 API routers mounted."""
+    from fastapi import FastAPI
+    from app.api.v1 import api_router
+    
+    api_app = FastAPI()
+    api_app.include_router(api_router, prefix="/api/v1")
+    
+    def override_get_db():
+        try:
+            yield db_session
+        finally:
+            pass
+    
+    api_app.dependency_overrides[get_db] = override_get_db
+    
+    with TestClient(api_app) as test_client:
+        yield test_client
+
+
 @pytest.fixture
 def sample_user():
     """Create a sample user for testing."""
@@ -192,11 +213,60 @@ def mock_celery():
     return mock_celery
 
 
+class QueryCounter:
+    """Count SQL statements executed against the test engine"""
+    
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+    
+    def _on_execute(self, *args):
+        self.count += 1
+    
+    def __enter__(self):
+        from sqlalchemy import event
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+    
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+@pytest.fixture(autouse=True)
+def reset_leaderboard_store():
+    """Drop the leaderboard stores so they reload from each test's database."""
+    from app.services.leaderboard_store import leaderboard_store
+    from app.services.leaderboard_windows import window_leaderboards
+    from app.services.xp_distribution import xp_distribution
+    
+    leaderboard_store.clear()
+    window_leaderboards.clear()
+    xp_distribution.clear()
+    yield
+    leaderboard_store.clear()
+    xp_distribution.clear()
+    window_leaderboards.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_quest_catalog():
+    """Drop the cached quest catalog so it reloads from each test's database."""
+    from app.services.quest_catalog import quest_catalog
+    
+    quest_catalog.invalidate()
+    yield
+    quest_catalog.invalidate()
+
+
 @pytest.fixture(autouse=True)
 def cleanup_test_files():
     """Clean up test files after each test."""
     yield
     
+    # Release the pooled connection so the next test reopens a fresh file
+    engine.dispose()
+    
     # Clean up any test files
     test_files = ["test.db", "test.db-journal"]
     for file in test_files:
@@ -0,0 +1,99 @@
+"""
+Add columns and indexes declared on the models that an existing database is missing
+
+    python migrate_indexes.py [--dry-run]
+
+`Base.metadata.create_all` only creates missing tables, so columns and
+indexes added to a table that already exists (e.g. user_quests.action_count
+and snapshot_seq, or the user_quests lookup indexes) never reach older
+databases. This job compares each table's declared columns and indexes with
+the ones the database has and adds the missing ones, columns first; it is
+safe to rerun. Added columns get their scalar default as a server default,
+so existing rows read it too. Partial indexes keep their WHERE clause on
+backends that support one.
+"""
+import argparse
+from typing import List
+from sqlalchemy import Column, Index, inspect, literal, text
+from sqlalchemy.engine import Engine
+from app.core.database import Base, engine
+import app.models  # noqa: F401  (registers every table on Base.metadata)
+
+
+def missing_columns(bind: Engine) -> List[Column]:
+    """Declared columns of existing tables that the database does not have"""
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue  # create_all builds it with its columns
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        missing.extend(column for column in table.columns if column.name not in existing)
+
+    return missing
+
+
+def add_column(bind: Engine, column: Column):
+    """ALTER TABLE ... ADD COLUMN, with the column's scalar default filling existing rows"""
+    preparer = bind.dialect.identifier_preparer
+    ddl = (f"ALTER TABLE {preparer.format_table(column.table)} "
+           f"ADD COLUMN {preparer.format_column(column)} {column.type.compile(dialect=bind.dialect)}")
+
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if default is not None:
+        ddl += f" DEFAULT {literal(default).compile(dialect=bind.dialect, compile_kwargs={'literal_binds': True})}"
+    elif not column.nullable:
+        raise ValueError(f"Cannot add NOT NULL column {column.table.name}.{column.name} without a scalar default")
+    if not column.nullable:
+        ddl += " NOT NULL"
+
+    with bind.begin() as conn:
+        conn.execute(text(ddl))
+
+
+def missing_indexes(bind: Engine) -> List[Index]:
+    """Declared indexes on existing tables that the database does not have"""
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue  # create_all builds it with its indexes
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        missing.extend(index for index in sorted(table.indexes, key=lambda index: index.name)
+                       if index.name not in existing)
+
+    return missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add model columns and indexes missing from the database")
+    parser.add_argument("--dry-run", action="store_true", help="list missing columns and indexes without adding them")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+
+    # Columns first: a new index may cover a new column
+    columns = missing_columns(engine)
+    for column in columns:
+        if not args.dry_run:
+            add_column(engine, column)
+        print(f"{'Would add' if args.dry_run else 'Added'} column {column.name} to {column.table.name}")
+    if not columns:
+        print("All columns present")
+
+    indexes = missing_indexes(engine)
+
+    for index in indexes:
+        if not args.dry_run:
+            index.create(bind=engine)
+        print(f"{'Would create' if args.dry_run else 'Created'} {index.name} on {index.table.name}")
+    if not indexes:
+        print("All indexes present")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Rebuild the materialized leaderboard from completed quests and report drift
+
+    python reconcile_leaderboard.py [--chunk-size N] [--dry-run]
+
+Completed `user_quests` rows are streamed in keyset-paginated chunks and
+each chunk of users is reconciled and committed on its own, so the job
+runs in bounded memory without holding a long transaction. Only drifted
+rows are written. With --dry-run nothing is written; the report shows
+what would change.
+"""
+import argparse
+from app.core.database import SessionLocal, engine
+from app.core.database import Base
+from app.services.leaderboard import reconcile_leaderboard
+
+# Create tables
+Base.metadata.create_all(bind=engine)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the leaderboard from completed quests")
+    parser.add_argument("--chunk-size", type=int, default=10_000, help="rows and users per chunk")
+    parser.add_argument("--dry-run", action="store_true", help="report drift without writing")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+
+    try:
+        report = reconcile_leaderboard(db, chunk_size=args.chunk_size, dry_run=args.dry_run)
+    finally:
+        db.close()
+
+    verb = "Would change" if args.dry_run else "Changed"
+    print(f"Scanned {report.users} users with completed quests")
+    print(f"{verb}: {report.inserted} inserted, {report.updated} updated, {report.removed} removed "
+          f"({report.unchanged} unchanged)")
+    for user_id, stored, recomputed in report.samples:
+        print(f"  {user_id}: {stored if stored is not None else '-'} -> "
+              f"{recomputed if recomputed is not None else '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+Scheduled job that rolls the daily, weekly and season leaderboards over
+
+Run from cron shortly after midnight UTC:
+
+    python rollover_leaderboards.py
+
+Window boards switch to a new bucket on their own as soon as the date
+changes; this job prunes buckets older than the previous one so the
+`leaderboard_windows` table and Redis stay bounded.
+"""
+from app.core.database import SessionLocal, engine
+from app.core.database import Base
+from app.services.leaderboard_windows import rollover
+
+# Create tables
+Base.metadata.create_all(bind=engine)
+
+
+def rollover_leaderboards():
+    """Prune expired leaderboard window buckets"""
+    db = SessionLocal()
+    
+    try:
+        removed = rollover(db)
+        print(f"Removed {removed} expired leaderboard buckets")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    rollover_leaderboards()
@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from app.core.database import SessionLocal, engine
 from app.core.database import Base
 from app.models.quest import Quest
+from app.services.leaderboard import rebuild_leaderboard
 import json
 
 # Create tables
@@ -147,5 +148,17 @@ def seed_quests():
         db.close()
 
 
+def seed_leaderboard():
+    """Backfill the materialized leaderboard from completed quests"""
+    db = SessionLocal()
+    
+    try:
+        users = rebuild_leaderboard(db)
+        print(f"Rebuilt leaderboard for {users} users")
+    finally:
+        db.close()
+
+
 if __name__ == "__main__":
     seed_quests()
+    seed_leaderboard()
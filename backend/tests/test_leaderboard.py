@@ -278,3 +278,821 @@ def test_get_leaderboard_default_limit(sample_users, sample_user_quests):
         assert response.status_code == 200
         data = response.json()
         assert len(data["entries"]) == 1
+
+
+def _create_player(db_session, wallet_address, xp=None, badges=None):
+    """Persist a user and, optionally, their materialized leaderboard row"""
+    from app.models.leaderboard import Leaderboard
+    
+    user = User(id=str(uuid.uuid4()), wallet_address=wallet_address, display_name=wallet_address)
+    db_session.add(user)
+    if xp is not None:
+        db_session.add(Leaderboard(user_id=user.id, xp=xp, badges=badges or []))
+    db_session.commit()
+    return user
+
+
+def test_leaderboard_reads_materialized_rows(api_client, db_session):
+    """Test leaderboard is served from the leaderboard table ordered by XP"""
+    low = _create_player(db_session, "SP100", xp=25, badges=["quest_a"])
+    high = _create_player(db_session, "SP200", xp=150, badges=["quest_a", "quest_b"])
+    _create_player(db_session, "SP300")  # no completions, not ranked
+    
+    response = api_client.get("/api/v1/leaderboard/?limit=10")
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert [entry["user_id"] for entry in data["entries"]] == [high.id, low.id]
+    assert data["entries"][0]["xp"] == 150
+    assert data["entries"][0]["badges"] == ["quest_a", "quest_b"]
+    assert data["entries"][0]["rank"] == 1
+    assert data["total"] == 2
+
+
+def test_user_rank_reads_materialized_rows(api_client, db_session):
+    """Test user rank is counted from higher leaderboard XP"""
+    _create_player(db_session, "SP100", xp=300)
+    target = _create_player(db_session, "SP200", xp=120, badges=["quest_a"])
+    _create_player(db_session, "SP300", xp=50)
+    
+    data = api_client.get(f"/api/v1/leaderboard/user/{target.id}").json()
+    
+    assert data["xp"] == 120
+    assert data["rank"] == 2
+    assert data["badges"] == ["quest_a"]
+    assert data["completed_quests"] == 1
+
+
+def test_quest_completion_updates_leaderboard(api_client, db_session):
+    """Test completing a quest credits XP and badge in the leaderboard row"""
+    from app.models.quest import Quest
+    from app.models.leaderboard import Leaderboard
+    from app.core.security import create_access_token
+    
+    user = _create_player(db_session, "SP100")
+    quest = Quest(id=str(uuid.uuid4()), slug="liquidity-kata", title="Liquidity Kata",
+                  game_rules={"type": "liquidity-kata", "steps": [{"action": "simulate_add_liquidity"}]})
+    db_session.add(quest)
+    db_session.commit()
+    
+    api_client.headers.update({"Authorization": f"Bearer {create_access_token({'sub': user.id})}"})
+    started = api_client.post(f"/api/v1/quests/{quest.id}/start", json={}).json()
+    response = api_client.post(f"/api/v1/quests/{quest.id}/action", json={
+        "user_quest_id": started["user_quest_id"],
+        "action": "simulate_add_liquidity",
+        "payload": {"pair": "STX/sBTC", "amount": 5}
+    })
+    
+    assert response.status_code == 200
+    assert response.json()["state"] == "completed"
+    # The liquidity score depends on the instance's simulated market, so it varies with the seed
+    xp = int(response.json()["score"])
+    assert xp > 0
+    
+    entry = db_session.query(Leaderboard).filter(Leaderboard.user_id == user.id).one()
+    assert entry.xp == xp
+    assert entry.badges == [f"quest_{quest.id}"]
+    
+    data = api_client.get("/api/v1/leaderboard/").json()
+    assert data["entries"][0]["user_id"] == user.id
+    assert data["entries"][0]["xp"] == xp
+
+
+def test_rebuild_leaderboard_from_completed_quests(db_session):
+    """Test backfilling the leaderboard from completed quests"""
+    from app.models.leaderboard import Leaderboard
+    from app.services.leaderboard import rebuild_leaderboard
+    
+    user = _create_player(db_session, "SP100")
+    for state, score in [("completed", 100), ("completed", 50), ("started", 80)]:
+        db_session.add(UserQuest(id=str(uuid.uuid4()), user_id=user.id,
+                                 quest_id=str(uuid.uuid4()), state=state, score=score))
+    db_session.commit()
+    
+    assert rebuild_leaderboard(db_session) == 1
+    
+    entry = db_session.query(Leaderboard).filter(Leaderboard.user_id == user.id).one()
+    assert entry.xp == 150
+    assert len(entry.badges) == 2
+
+
+@pytest.mark.parametrize("limit", [1, 10, 100])
+def test_leaderboard_query_count_independent_of_limit(api_client, db_session, limit):
+    """Test a leaderboard page costs no queries once the store is loaded"""
+    from conftest import QueryCounter, engine
+    
+    for i in range(100):
+        _create_player(db_session, f"SP{i:03d}", xp=i * 10, badges=[f"quest_{i}"])
+    
+    with QueryCounter(engine) as counter:
+        api_client.get("/api/v1/leaderboard/?limit=1")
+    
+    assert counter.count == 2  # one-off store load and its revision
+    
+    with QueryCounter(engine) as counter:
+        response = api_client.get(f"/api/v1/leaderboard/?limit={limit}")
+    
+    assert len(response.json()["entries"]) == limit
+    assert counter.count == 0
+
+
+def test_user_rank_query_count(api_client, db_session):
+    """Test a rank lookup costs a fixed number of queries"""
+    from conftest import QueryCounter, engine
+    
+    target_id = _create_player(db_session, "SP100", xp=50, badges=["quest_a", "quest_b"]).id
+    unranked_id = _create_player(db_session, "SP101").id
+    for i in range(20):
+        _create_player(db_session, f"SP2{i:02d}", xp=i * 10)
+    
+    with QueryCounter(engine) as counter:
+        data = api_client.get(f"/api/v1/leaderboard/user/{target_id}").json()
+    
+    assert data["completed_quests"] == 2
+    assert counter.count == 2  # one-off store load and its revision
+    
+    with QueryCounter(engine) as counter:
+        api_client.get(f"/api/v1/leaderboard/user/{target_id}")
+    
+    assert counter.count == 0
+    
+    with QueryCounter(engine) as counter:
+        data = api_client.get(f"/api/v1/leaderboard/user/{unranked_id}").json()
+    
+    assert data["rank"] == 22  # below all 21 ranked players
+    assert counter.count == 1  # profile lookup for a user with no completions
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    """Each leaderboard store backend, empty and loaded"""
+    from app.services.leaderboard_store import MemoryLeaderboardStore, RedisLeaderboardStore
+    
+    if request.param == "redis":
+        fakeredis = pytest.importorskip("fakeredis")
+        store = RedisLeaderboardStore(fakeredis.FakeRedis())
+    else:
+        store = MemoryLeaderboardStore()
+    
+    store.load([])
+    return store
+
+
+def _entry(user_id, xp):
+    from app.services.leaderboard_store import StoredEntry
+    return StoredEntry(user_id=user_id, xp=xp, wallet_address=f"SP{user_id}", badges=[f"quest_{user_id}"])
+
+
+def test_store_orders_by_xp_then_user_id(store):
+    """Test paging follows XP descending, ties by user id descending, while tied players share a rank"""
+    store.load([_entry("a", 300), _entry("b", 120), _entry("c", 120), _entry("d", 50)])
+    
+    assert [entry.user_id for entry in store.top(10)] == ["a", "c", "b", "d"]
+    assert [entry.user_id for entry in store.top(2, offset=1)] == ["c", "b"]
+    assert store.top(5, offset=4) == []
+    assert [store.position(user_id) for user_id in "acbd"] == [1, 2, 3, 4]
+    assert [store.rank(user_id) for user_id in "acbd"] == [1, 2, 2, 4]
+    assert (store.xp_rank(500), store.xp_rank(120), store.xp_rank(0)) == (1, 2, 5)
+    assert {user_id: rank for user_id, (_, rank) in store.rank_many(["b", "c"]).items()} == {"b": 2, "c": 2}
+    assert store.rank("missing") is None
+    assert store.position("missing") is None
+    assert store.count() == 4
+    assert store.get("b").badges == ["quest_b"]
+
+
+def test_store_upsert_moves_entry(store):
+    """Test upserting re-ranks an existing entry and adds new ones"""
+    store.load([_entry("a", 300), _entry("b", 120)])
+    
+    store.upsert(_entry("b", 500))
+    store.upsert(_entry("e", 10))
+    
+    assert [entry.user_id for entry in store.top(10)] == ["b", "a", "e"]
+    assert store.get("b").xp == 500
+    assert store.rank("e") == 3
+
+
+def test_store_upsert_ignored_until_loaded(store):
+    """Test updates before the first load are left to the load itself"""
+    store.clear()
+    assert not store.is_loaded()
+    
+    store.upsert(_entry("a", 100))
+    assert store.count() == 0
+    
+    store.load([_entry("a", 100)])
+    assert store.is_loaded()
+    assert store.rank("a") == 1
+
+
+def test_redis_store_reloads_after_eviction(db_session):
+    """Test a board whose data was evicted while its loaded flag survived reads as cold and reloads"""
+    fakeredis = pytest.importorskip("fakeredis")
+    from app.services.leaderboard_store import RedisLeaderboardStore
+    
+    store = RedisLeaderboardStore(fakeredis.FakeRedis())
+    store.load([])
+    assert store.is_loaded()
+    store.upsert(_entry("a", 100))
+    assert store.is_loaded()
+    
+    for key in (store.scores_key, store.entries_key):
+        store.load([_entry("a", 100)])
+        store.client.delete(key)  # what allkeys-lru does to a key
+        assert not store.is_loaded()
+    
+    _create_player(db_session, "SP100", xp=90)
+    store.ensure_loaded(db_session)
+    assert store.is_loaded() and store.count() == 1
+
+
+def test_store_ensure_loaded_reads_leaderboard_table(store, db_session):
+    """Test a cold store loads profiles and XP from the database"""
+    store.clear()
+    leader = _create_player(db_session, "SP100", xp=90, badges=["quest_a"])
+    _create_player(db_session, "SP200", xp=10)
+    
+    store.ensure_loaded(db_session)
+    
+    top = store.top(1)[0]
+    assert top.user_id == leader.id
+    assert top.wallet_address == "SP100"
+    assert top.badges == ["quest_a"]
+    assert store.count() == 2
+
+
+def test_quest_completion_updates_store(api_client, db_session):
+    """Test a completion re-ranks the user in an already loaded store"""
+    from app.models.quest import Quest
+    from app.core.security import create_access_token
+    
+    _create_player(db_session, "SP100", xp=90)
+    player = _create_player(db_session, "SP200")
+    quest = Quest(id=str(uuid.uuid4()), slug="tx-quest", title="Tx Quest")
+    db_session.add(quest)
+    db_session.commit()
+    
+    assert api_client.get(f"/api/v1/leaderboard/user/{player.id}").json()["rank"] == 2
+    
+    api_client.headers.update({"Authorization": f"Bearer {create_access_token({'sub': player.id})}"})
+    started = api_client.post(f"/api/v1/quests/{quest.id}/start", json={}).json()
+    api_client.post(f"/api/v1/quests/{quest.id}/action", json={
+        "user_quest_id": started["user_quest_id"],
+        "action": "submit_tx_proof",
+        "payload": {"txid": "0xabc"}
+    })
+    
+    data = api_client.get(f"/api/v1/leaderboard/user/{player.id}").json()
+    assert data["rank"] == 1
+    assert data["xp"] == 100
+    assert data["badges"] == [f"quest_{quest.id}"]
+
+
+def test_store_position_after_key(store):
+    """Test keyset positions, including keys whose user has since moved"""
+    store.load([_entry("a", 300), _entry("b", 120), _entry("c", 120), _entry("d", 50)])
+    
+    assert store.position_after(300, "a") == 1
+    assert store.position_after(120, "c") == 2
+    assert store.position_after(120, "b") == 3
+    
+    # "c" moved after the page was served; the key still resumes after it
+    store.upsert(_entry("c", 400))
+    assert [entry.user_id for entry in store.top(10, offset=store.position_after(120, "c"))] == ["b", "d"]
+
+
+def test_leaderboard_cursor_pagination(api_client, db_session):
+    """Test following cursors walks the whole board without gaps or repeats"""
+    for i in range(25):
+        _create_player(db_session, f"SP{i:03d}", xp=(i % 7) * 10)
+    
+    full = api_client.get("/api/v1/leaderboard/?limit=100").json()
+    assert full["next_cursor"] is None
+    
+    seen = []
+    cursor = None
+    while True:
+        url = "/api/v1/leaderboard/?limit=10" + (f"&cursor={cursor}" if cursor else "")
+        page = api_client.get(url).json()
+        seen.extend(page["entries"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    
+    assert [entry["user_id"] for entry in seen] == [entry["user_id"] for entry in full["entries"]]
+    
+    # Tied players share a rank, including across page boundaries
+    xps = [entry["xp"] for entry in seen]
+    assert [entry["rank"] for entry in seen] == [1 + sum(other > xp for other in xps) for xp in xps]
+    assert [entry["rank"] for entry in seen][:7] == [1, 1, 1, 4, 4, 4, 7]
+
+
+def test_leaderboard_invalid_cursor(api_client, db_session):
+    """Test a malformed cursor is rejected"""
+    import base64
+    
+    response = api_client.get("/api/v1/leaderboard/?cursor=not-a-cursor")
+    assert response.status_code == 400
+    
+    for payload in (b'[1e400, "a"]', b'[NaN, "a"]', b'{"xp": 1}'):
+        cursor = base64.urlsafe_b64encode(payload).decode().rstrip("=")
+        assert api_client.get(f"/api/v1/leaderboard/?cursor={cursor}").status_code == 400, payload
+
+
+def test_period_buckets():
+    """Test bucket keys and their predecessors for each window"""
+    from datetime import datetime
+    from app.services.leaderboard_windows import period_bucket, previous_bucket
+    
+    at = datetime(2026, 1, 1, 12, 0)
+    assert period_bucket("daily", at) == "2026-01-01"
+    assert period_bucket("weekly", at) == "2026-W01"
+    assert period_bucket("season", at) == "2026-Q1"
+    assert previous_bucket("daily", at) == "2025-12-31"
+    assert previous_bucket("weekly", at) == "2025-W52"
+    assert previous_bucket("season", at) == "2025-Q4"
+
+
+def test_quest_completion_updates_window_boards(api_client, db_session):
+    """Test a completion credits every window and shows on the window boards"""
+    from app.models.quest import Quest
+    from app.models.leaderboard import LeaderboardWindow
+    from app.core.security import create_access_token
+    
+    _create_player(db_session, "SP100", xp=900)  # all-time leader with no XP this window
+    player = _create_player(db_session, "SP200")
+    quest = Quest(id=str(uuid.uuid4()), slug="tx-quest", title="Tx Quest")
+    db_session.add(quest)
+    db_session.commit()
+    
+    # Warm the daily store so the completion has to update it in place
+    assert api_client.get("/api/v1/leaderboard/?window=daily").json()["entries"] == []
+    
+    api_client.headers.update({"Authorization": f"Bearer {create_access_token({'sub': player.id})}"})
+    started = api_client.post(f"/api/v1/quests/{quest.id}/start", json={}).json()
+    api_client.post(f"/api/v1/quests/{quest.id}/action", json={
+        "user_quest_id": started["user_quest_id"],
+        "action": "submit_tx_proof",
+        "payload": {"txid": "0xabc"}
+    })
+    
+    rows = db_session.query(LeaderboardWindow).filter(LeaderboardWindow.user_id == player.id).all()
+    assert sorted(row.period for row in rows) == ["daily", "season", "weekly"]
+    assert all(row.xp == 100 for row in rows)
+    
+    for window in ["daily", "weekly", "season"]:
+        data = api_client.get(f"/api/v1/leaderboard/?window={window}").json()
+        assert [entry["user_id"] for entry in data["entries"]] == [player.id]
+        assert data["entries"][0]["xp"] == 100
+        
+        rank = api_client.get(f"/api/v1/leaderboard/user/{player.id}?window={window}").json()
+        assert rank["rank"] == 1
+    
+    assert api_client.get(f"/api/v1/leaderboard/user/{player.id}").json()["rank"] == 2
+
+
+def test_window_board_starts_fresh_each_bucket(db_session):
+    """Test a new bucket is served from a new, empty store"""
+    from datetime import datetime
+    from app.models.leaderboard import LeaderboardWindow
+    from app.services.leaderboard_windows import WindowedLeaderboards
+    
+    player = _create_player(db_session, "SP100", xp=100)
+    db_session.add(LeaderboardWindow(period="daily", bucket="2026-10-16", user_id=player.id, xp=100))
+    db_session.commit()
+    
+    boards = WindowedLeaderboards()
+    assert boards.ensure_loaded(db_session, "daily", at=datetime(2026, 10, 16, 23)).count() == 1
+    assert boards.ensure_loaded(db_session, "daily", at=datetime(2026, 10, 17, 0)).count() == 0
+
+
+def test_rollover_prunes_expired_buckets(db_session):
+    """Test rollover keeps the current and previous bucket of each window"""
+    from datetime import datetime
+    from app.models.leaderboard import LeaderboardWindow
+    from app.services.leaderboard_windows import rollover
+    
+    player = _create_player(db_session, "SP100")
+    for period, bucket in [("daily", "2026-10-17"), ("daily", "2026-10-16"), ("daily", "2026-10-15"),
+                           ("weekly", "2026-W42"), ("weekly", "2026-W40"),
+                           ("season", "2026-Q4"), ("season", "2026-Q3"), ("season", "2026-Q2")]:
+        db_session.add(LeaderboardWindow(period=period, bucket=bucket, user_id=player.id, xp=10))
+    db_session.commit()
+    
+    assert rollover(db_session, at=datetime(2026, 10, 17, 0, 5)) == 3
+    
+    remaining = sorted((row.period, row.bucket) for row in db_session.query(LeaderboardWindow).all())
+    assert remaining == [("daily", "2026-10-16"), ("daily", "2026-10-17"),
+                         ("season", "2026-Q3"), ("season", "2026-Q4"), ("weekly", "2026-W42")]
+
+
+def test_leaderboard_invalid_window(api_client, db_session):
+    """Test unknown windows are rejected"""
+    assert api_client.get("/api/v1/leaderboard/?window=hourly").status_code == 422
+
+
+def test_leaderboard_around_user(api_client, db_session):
+    """Test the window around a user holds radius players either side"""
+    players = [_create_player(db_session, f"SP{i:03d}", xp=1000 - i * 10) for i in range(20)]
+    
+    data = api_client.get(f"/api/v1/leaderboard/around/{players[10].id}?radius=3").json()
+    
+    assert data["rank"] == 11
+    assert [entry["rank"] for entry in data["entries"]] == list(range(8, 15))
+    assert [entry["user_id"] for entry in data["entries"]] == [p.id for p in players[7:14]]
+    
+    # Clipped at the top and bottom of the board
+    top = api_client.get(f"/api/v1/leaderboard/around/{players[1].id}?radius=3").json()
+    assert [entry["rank"] for entry in top["entries"]] == [1, 2, 3, 4, 5]
+    bottom = api_client.get(f"/api/v1/leaderboard/around/{players[19].id}?radius=3").json()
+    assert [entry["rank"] for entry in bottom["entries"]] == [17, 18, 19, 20]
+
+
+def test_leaderboard_around_unranked_and_unknown_user(api_client, db_session):
+    """Test unranked users see the bottom of the board and unknown users 404"""
+    for i in range(5):
+        _create_player(db_session, f"SP{i:03d}", xp=100 - i)
+    newcomer = _create_player(db_session, "SP999")
+    
+    data = api_client.get(f"/api/v1/leaderboard/around/{newcomer.id}?radius=2").json()
+    assert data["rank"] == 6
+    assert [entry["rank"] for entry in data["entries"]] == [4, 5]
+    
+    assert api_client.get(f"/api/v1/leaderboard/around/{uuid.uuid4()}").status_code == 404
+
+
+def test_store_rank_many(store):
+    """Test batched rank lookups skip unranked users"""
+    store.load([_entry("a", 300), _entry("b", 120), _entry("c", 50)])
+    
+    ranked = store.rank_many(["c", "missing", "a"])
+    
+    assert {user_id: rank for user_id, (_, rank) in ranked.items()} == {"a": 1, "c": 3}
+    assert ranked["c"][0].badges == ["quest_c"]
+    assert store.rank_many([]) == {}
+
+
+def test_bulk_ranks_by_id_and_wallet(api_client, db_session):
+    """Test bulk lookup mixes ids and wallets and reports unknown keys"""
+    from conftest import QueryCounter, engine
+    
+    players = [_create_player(db_session, f"SP{i:03d}", xp=1000 - i * 10, badges=[f"quest_{i}"]) for i in range(50)]
+    newcomer = _create_player(db_session, "SP999")
+    ids = [players[30].id, players[2].id, newcomer.id, "missing-id"]
+    wallets = ["SP010", "SPNOPE"]
+    api_client.get("/api/v1/leaderboard/")  # warm the store
+    
+    with QueryCounter(engine) as counter:
+        response = api_client.post("/api/v1/leaderboard/ranks", json={"user_ids": ids, "wallet_addresses": wallets})
+    
+    assert counter.count == 1
+    data = response.json()
+    assert [(entry["wallet_address"], entry["rank"]) for entry in data["entries"]] == [
+        ("SP002", 3), ("SP010", 11), ("SP030", 31), ("SP999", 51)
+    ]
+    assert data["entries"][0]["badges"] == ["quest_2"]
+    assert data["entries"][-1]["xp"] == 0
+    assert data["not_found"] == ["missing-id", "SPNOPE"]
+
+
+def test_bulk_ranks_limits_request_size(api_client, db_session):
+    """Test oversized bulk requests are rejected"""
+    response = api_client.post("/api/v1/leaderboard/ranks", json={"user_ids": [str(i) for i in range(501)]})
+    assert response.status_code == 422
+
+
+def _add_run(db_session, user, quest_id, score, state="completed"):
+    db_session.add(UserQuest(id=str(uuid.uuid4()), user_id=user.id, quest_id=quest_id, state=state, score=score))
+
+
+def test_quest_leaderboard_top_runs(api_client, db_session):
+    """Test a quest board ranks completed runs of that quest only"""
+    from app.models.quest import Quest
+    
+    quest = Quest(id=str(uuid.uuid4()), slug="arbitrage-master", title="Arbitrage Master")
+    other_quest_id = str(uuid.uuid4())
+    db_session.add(quest)
+    alice = _create_player(db_session, "SP100")
+    bob = _create_player(db_session, "SP200")
+    _add_run(db_session, alice, quest.id, 70)
+    _add_run(db_session, bob, quest.id, 95)
+    _add_run(db_session, alice, quest.id, 99, state="ongoing")
+    _add_run(db_session, alice, other_quest_id, 100)
+    db_session.commit()
+    
+    data = api_client.get(f"/api/v1/leaderboard/quest/{quest.id}").json()
+    
+    assert [(entry["wallet_address"], entry["score"], entry["rank"]) for entry in data["entries"]] == [
+        ("SP200", 95.0, 1), ("SP100", 70.0, 2)
+    ]
+    assert api_client.get(f"/api/v1/leaderboard/quest/{uuid.uuid4()}").status_code == 404
+
+
+def test_quest_leaderboard_query_uses_composite_index(db_session):
+    """Test the quest board is an index range read with no sort step"""
+    from sqlalchemy import text
+    from app.api.v1.leaderboard import quest_top_scores_query
+    
+    query = quest_top_scores_query(db_session, "some-quest", 10)
+    sql = str(query.statement.compile(db_session.bind, compile_kwargs={"literal_binds": True}))
+    plan = " | ".join(row[-1] for row in db_session.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+    
+    assert "ix_user_quests_quest_state_score" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_store_version_changes_on_write(store):
+    """Test every write gives the store a new version"""
+    versions = [store.version()]
+    
+    store.upsert(_entry("a", 100))
+    versions.append(store.version())
+    store.clear()
+    versions.append(store.version())
+    store.load([_entry("a", 100)])
+    versions.append(store.version())
+    
+    assert len(set(versions)) == 4
+    assert store.version() == versions[-1]
+
+
+def test_leaderboard_etag_not_modified(api_client, db_session):
+    """Test unchanged polls get a 304 without touching the database"""
+    from conftest import QueryCounter, engine
+    
+    _create_player(db_session, "SP100", xp=100)
+    
+    first = api_client.get("/api/v1/leaderboard/?limit=5")
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    assert first.json()["entries"][0]["xp"] == 100
+    
+    with QueryCounter(engine) as counter:
+        response = api_client.get("/api/v1/leaderboard/?limit=5", headers={"If-None-Match": etag})
+    
+    assert response.status_code == 304
+    assert counter.count == 0
+    
+    # A different page has its own tag
+    other = api_client.get("/api/v1/leaderboard/?limit=6", headers={"If-None-Match": etag})
+    assert other.status_code == 200
+    assert other.headers["etag"] != etag
+
+
+def test_leaderboard_snapshot_reused_until_xp_changes(api_client, db_session):
+    """Test pages are serialized once per store version"""
+    from app.services.leaderboard_store import leaderboard_store
+    import app.api.v1.leaderboard as leaderboard_api
+    
+    player = _create_player(db_session, "SP100", xp=100)
+    
+    with patch.object(leaderboard_api, "build_leaderboard_page", wraps=leaderboard_api.build_leaderboard_page) as build:
+        first = api_client.get("/api/v1/leaderboard/")
+        second = api_client.get("/api/v1/leaderboard/")
+        assert build.call_count == 1
+        assert second.content == first.content
+        
+        leaderboard_store.upsert(_entry(player.id, 250))
+        third = api_client.get("/api/v1/leaderboard/", headers={"If-None-Match": first.headers["etag"]})
+    
+    assert build.call_count == 2
+    assert third.status_code == 200
+    assert third.json()["entries"][0]["xp"] == 250
+
+
+def test_snapshot_cache_evicts_least_recently_used():
+    """Test the page cache stays bounded"""
+    from app.services.leaderboard_cache import SnapshotCache, etag_matches
+    
+    cache = SnapshotCache(max_entries=2)
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    cache.get("a")
+    cache.put("c", b"3")
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+    assert etag_matches('"x", W/"y"', '"y"')
+    assert not etag_matches(None, '"y"')
+
+
+def test_store_reloads_after_reconcile_elsewhere(api_client, db_session, monkeypatch):
+    """Test in-process stores pick up a reconcile run by another process once its revision lands"""
+    from sqlalchemy import text
+    from app.services.leaderboard_store import bump_leaderboard_revision, leaderboard_store
+    from app.services.xp_distribution import xp_distribution
+    
+    player = _create_player(db_session, "SP100", xp=100)
+    _create_player(db_session, "SP200", xp=50)
+    assert api_client.get(f"/api/v1/leaderboard/user/{player.id}").json()["xp"] == 100
+    assert api_client.get("/api/v1/leaderboard/histogram").status_code == 200
+    
+    # The CLI's own clear() cannot reach this process; only the table and its revision change
+    db_session.execute(text("UPDATE leaderboard SET xp = 10 WHERE user_id = :id"), {"id": player.id})
+    db_session.commit()
+    assert api_client.get(f"/api/v1/leaderboard/user/{player.id}").json()["xp"] == 100
+    
+    bump_leaderboard_revision(db_session)
+    db_session.commit()
+    for cache in (leaderboard_store, xp_distribution):
+        monkeypatch.setattr(cache._revision, "interval_seconds", 0)
+    
+    data = api_client.get(f"/api/v1/leaderboard/user/{player.id}").json()
+    assert (data["xp"], data["rank"]) == (10, 2)
+    assert api_client.get(f"/api/v1/leaderboard/percentile/{player.id}").json()["top_percent"] == 100.0
+
+
+def test_publish_completion_reports_rank_change(db_session):
+    """Test publishing a completion reports the old and new all-time rank"""
+    from app.models.leaderboard import Leaderboard
+    from app.services.leaderboard import publish_completion
+    from app.services.leaderboard_store import leaderboard_store
+    
+    _create_player(db_session, "SP100", xp=300)
+    _create_player(db_session, "SP200", xp=200)
+    player = _create_player(db_session, "SP300", xp=100)
+    entry = db_session.query(Leaderboard).filter(Leaderboard.user_id == player.id).one()
+    
+    # Cold store: nothing to compare against
+    entry.xp = 150
+    assert publish_completion(player, entry, []) is None
+    
+    leaderboard_store.ensure_loaded(db_session)
+    entry.xp = 250
+    change = publish_completion(player, entry, [], previous_xp=150)
+    assert (change.previous_rank, change.rank, change.xp, change.previous_xp) == (3, 2, 250, 150)
+
+
+def test_completion_increments_xp_in_sql(db_session):
+    """Test a completion adds to the stored XP, not to a stale copy loaded earlier"""
+    from datetime import datetime
+    from sqlalchemy import text
+    from app.models.leaderboard import Leaderboard, LeaderboardWindow
+    from app.models.quest import UserQuest
+    from app.services.leaderboard import record_quest_completion
+    from app.services.leaderboard_windows import record_window_xp
+    
+    player = _create_player(db_session, "SP100", xp=100, badges=["quest_a"])
+    db_session.add(LeaderboardWindow(period="daily", bucket="2026-10-17", user_id=player.id, xp=100))
+    db_session.commit()
+    assert db_session.query(Leaderboard).get(player.id).xp == 100
+    
+    # Another request's completion commits after this session loaded the rows
+    db_session.execute(text("UPDATE leaderboard SET xp = xp + 50"))
+    db_session.execute(text("UPDATE leaderboard_windows SET xp = xp + 50"))
+    
+    user_quest = UserQuest(user_id=player.id, quest_id="b", server_seed="seed", state="completed", score=20)
+    entry = record_quest_completion(db_session, user_quest)
+    rows = record_window_xp(db_session, user_quest, at=datetime(2026, 10, 17, 12))
+    db_session.commit()
+    
+    assert (entry.xp, entry.badges) == (170, ["quest_a", "quest_b"])
+    assert {row.period: row.xp for row in rows} == {"daily": 170, "weekly": 20, "season": 20}
+    assert db_session.query(Leaderboard).get(player.id).xp == 170
+
+
+def test_kll_sketch_rank_and_quantile_error():
+    """Test sketch answers stay within a small rank error of the exact values"""
+    import random
+    from bisect import bisect_left
+    from app.services.xp_distribution import KllSketch
+    
+    rng = random.Random(1)
+    values = [rng.randint(0, 100_000) for _ in range(50_000)]
+    sketch = KllSketch(seed=1)
+    for value in values:
+        sketch.update(value)
+    
+    ordered = sorted(values)
+    assert sum(len(items) for items in sketch.compactors) < 1_000
+    for q in (0.1, 0.5, 0.9, 0.99):
+        exact_rank = bisect_left(ordered, sketch.quantile(q))
+        assert abs(exact_rank / len(values) - q) < 0.02
+    assert abs(sketch.rank(ordered[25_000]) - 25_000) < 0.02 * len(values)
+
+
+def test_kll_sketch_merge():
+    """Test merging two sketches matches a sketch of the combined stream"""
+    from app.services.xp_distribution import KllSketch
+    
+    low, high = KllSketch(seed=1), KllSketch(seed=2)
+    for value in range(10_000):
+        low.update(value)
+        high.update(value + 10_000)
+    low.merge(high)
+    
+    assert low.n == 20_000
+    assert abs(low.quantile(0.5) - 10_000) < 400
+    assert abs(low.rank(15_000) - 15_000) < 400
+
+
+def test_xp_distribution_tracks_moves_and_reloads_when_stale(db_session):
+    """Test recorded moves update the histogram and too many force a reload"""
+    from app.services.xp_distribution import XpDistribution
+    
+    for i in range(10):
+        _create_player(db_session, f"SP{i:03d}", xp=50)
+    distribution = XpDistribution(max_stale_fraction=0.1)
+    distribution.ensure_loaded(db_session)
+    
+    distribution.record(None, 300)
+    distribution.record(50, 150)
+    assert [players for _, _, players in distribution.histogram()][:3] == [9, 1, 1]
+    assert distribution.player_count() == 11
+    assert distribution.top_percent(300) < 10
+    assert distribution.is_loaded()
+    
+    distribution.record(50, 150)
+    assert not distribution.is_loaded()
+
+
+def test_xp_distribution_endpoints(api_client, db_session):
+    """Test percentile, quantile and histogram endpoints"""
+    players = [_create_player(db_session, f"SP{i:03d}", xp=i * 100) for i in range(100)]
+    
+    data = api_client.get(f"/api/v1/leaderboard/percentile/{players[93].id}").json()
+    assert data["xp"] == 9300
+    assert data["top_percent"] == pytest.approx(7, abs=1)
+    assert data["total_players"] == 100
+    
+    data = api_client.get("/api/v1/leaderboard/quantiles?q=0.5&q=0.9").json()
+    assert [row["quantile"] for row in data["quantiles"]] == [0.5, 0.9]
+    assert data["quantiles"][0]["xp"] == pytest.approx(5000, abs=200)
+    
+    buckets = api_client.get("/api/v1/leaderboard/histogram").json()["buckets"]
+    assert buckets[0] == {"min_xp": 0, "max_xp": 99, "players": 1}
+    assert buckets[-1]["max_xp"] is None
+    assert sum(bucket["players"] for bucket in buckets) == 100
+    
+    assert api_client.get("/api/v1/leaderboard/quantiles?q=1.5").status_code == 400
+    assert api_client.get("/api/v1/leaderboard/percentile/unknown").status_code == 404
+
+
+def test_quest_completion_updates_histogram(api_client, db_session):
+    """Test a completion moves the player into a higher histogram bucket"""
+    from app.models.quest import Quest
+    from app.core.security import create_access_token
+    
+    player = _create_player(db_session, "SP100", xp=50)
+    quest = Quest(id=str(uuid.uuid4()), slug="tx-quest", title="Tx Quest")
+    db_session.add(quest)
+    db_session.commit()
+    
+    assert api_client.get("/api/v1/leaderboard/histogram").json()["buckets"][0]["players"] == 1
+    
+    api_client.headers.update({"Authorization": f"Bearer {create_access_token({'sub': player.id})}"})
+    started = api_client.post(f"/api/v1/quests/{quest.id}/start", json={}).json()
+    api_client.post(f"/api/v1/quests/{quest.id}/action", json={
+        "user_quest_id": started["user_quest_id"],
+        "action": "submit_tx_proof",
+        "payload": {"txid": "0xabc"}
+    })
+    
+    buckets = api_client.get("/api/v1/leaderboard/histogram").json()["buckets"]
+    assert [bucket["players"] for bucket in buckets[:2]] == [0, 1]
+
+
+def test_iter_completed_totals_streams_across_chunks(db_session):
+    """Test per-user totals are exact when a user's runs straddle chunk boundaries"""
+    from app.services.leaderboard import iter_completed_totals
+    
+    users = [_create_player(db_session, f"SP{i}") for i in range(3)]
+    for i, user in enumerate(users):
+        for score in range(i + 2):
+            _add_run(db_session, user, str(uuid.uuid4()), score * 10)
+    _add_run(db_session, users[0], str(uuid.uuid4()), 500, state="started")
+    db_session.commit()
+    
+    totals = list(iter_completed_totals(db_session, chunk_size=2))
+    
+    assert [user_id for user_id, _, _ in totals] == sorted(str(user.id) for user in users)
+    by_user = {user_id: (xp, len(badges)) for user_id, xp, badges in totals}
+    assert [by_user[str(user.id)] for user in users] == [(10, 2), (30, 3), (60, 4)]
+
+
+def test_reconcile_leaderboard_fixes_drift(db_session):
+    """Test reconcile inserts, updates and removes only the drifted rows"""
+    from app.models.leaderboard import Leaderboard
+    from app.services.leaderboard import badge_name, reconcile_leaderboard
+    
+    quest_id = str(uuid.uuid4())
+    correct = _create_player(db_session, "SP100", xp=100, badges=[badge_name(quest_id)])
+    drifted = _create_player(db_session, "SP200", xp=999, badges=[badge_name(quest_id)])
+    missing = _create_player(db_session, "SP300")
+    stale = _create_player(db_session, "SP400", xp=50)
+    for user in (correct, drifted, missing):
+        _add_run(db_session, user, quest_id, 100)
+    db_session.commit()
+    
+    report = reconcile_leaderboard(db_session, chunk_size=1, dry_run=True)
+    assert (report.users, report.inserted, report.updated, report.removed, report.unchanged) == (3, 1, 1, 1, 1)
+    assert db_session.query(Leaderboard).filter(Leaderboard.user_id == drifted.id).one().xp == 999
+    assert (str(drifted.id), 999, 100) in report.samples
+    
+    reconcile_leaderboard(db_session, chunk_size=1)
+    db_session.expire_all()
+    
+    rows = {row.user_id: row.xp for row in db_session.query(Leaderboard)}
+    assert rows == {str(correct.id): 100, str(drifted.id): 100, str(missing.id): 100}
+    assert stale.id not in rows
+    assert reconcile_leaderboard(db_session).drifted == 0
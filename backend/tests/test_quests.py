@@ -42,3 +42,677 @@ def test_quest_status_unauthorized():
     """Test quest status without authentication"""
     response = client.get("/api/v1/quests/test-user-quest-id/status")
     assert response.status_code == 401
+
+
+LIQUIDITY_RULES = {
+    "type": "liquidity-kata",
+    "steps": [
+        {"action": "simulate_add_liquidity", "params": {"pair": "STX/sBTC", "min_amount": 1}},
+        {"action": "predict_price_move", "params": {"window_minutes": 15}}
+    ],
+    "scoring": {"correctness": 0.6, "efficiency": 0.4},
+    "max_score": 100
+}
+
+
+def _right_direction(server_seed, minutes=15):
+    from app.services.price_paths import price_change
+    return "up" if price_change(server_seed, minutes) >= 0 else "down"
+
+
+def _wrong_direction(server_seed, minutes=15):
+    return "down" if _right_direction(server_seed, minutes) == "up" else "up"
+
+
+def test_validator_completes_after_every_step():
+    """Test a stepped quest completes once all its steps pass, averaging step scores"""
+    from app.services.quest_rules import QuestValidator
+    
+    validator = QuestValidator(LIQUIDITY_RULES)
+    
+    score, progress, state = validator.validate("simulate_add_liquidity", {"pair": "STX/sBTC", "amount": 5}, {}, "seed")
+    assert (score, state) == (50.0, "ongoing")
+    assert progress["liquidity_added"] is True
+    
+    # A confident miss scores nothing for the step
+    score, progress, state = validator.validate("predict_price_move", {"prediction": _wrong_direction("seed"), "confidence": 5}, progress, "seed")
+    assert (score, state) == (50.0, "completed")
+    assert progress["step_scores"] == {"simulate_add_liquidity": 100.0, "predict_price_move": 0.0}
+
+
+def test_validator_enforces_step_params():
+    """Test a step failing its rule params makes no progress"""
+    from app.services.quest_rules import QuestValidator
+    
+    validator = QuestValidator(LIQUIDITY_RULES)
+    
+    score, progress, state = validator.validate("simulate_add_liquidity", {"pair": "STX/USDA", "amount": 5}, {}, "seed")
+    assert (score, progress, state) == (0.0, {}, "ongoing")
+    
+    score, progress, state = validator.validate("simulate_add_liquidity", {"pair": "STX/sBTC", "amount": 0.5}, {}, "seed")
+    assert progress == {}
+
+
+def test_validator_rejects_unknown_actions_and_missing_params():
+    """Test actions outside the rules and incomplete payloads are rejected"""
+    from app.services.quest_rules import QuestRuleError, QuestValidator
+    
+    validator = QuestValidator(LIQUIDITY_RULES)
+    
+    with pytest.raises(QuestRuleError, match="not allowed"):
+        validator.validate("submit_tx_proof", {"txid": "0x1"}, {}, "seed")
+    with pytest.raises(QuestRuleError, match="amount"):
+        validator.validate("simulate_add_liquidity", {"pair": "STX/sBTC"}, {}, "seed")
+    with pytest.raises(QuestRuleError, match="number"):
+        validator.validate("simulate_add_liquidity", {"pair": "STX/sBTC", "amount": "lots"}, {}, "seed")
+
+
+def test_validator_rejects_non_finite_numbers_and_scores():
+    """Test NaN and infinite inputs are rejected instead of being recorded as a passed step"""
+    from app.services.quest_rules import ACTION_HANDLERS, QuestRuleError, QuestValidator, StepResult, action_handler
+    
+    validator = QuestValidator(LIQUIDITY_RULES)
+    for amount in ("nan", "inf", "1e400", float("nan"), float("-inf")):
+        with pytest.raises(QuestRuleError, match="finite"):
+            validator.validate("simulate_add_liquidity", {"pair": "STX/sBTC", "amount": amount}, {}, "seed")
+    
+    @action_handler("broken_step")
+    def broken_step(payload, params, progress, server_seed):
+        return StepResult(passed=True, quality=float("nan"))
+    
+    try:
+        with pytest.raises(QuestRuleError, match="could not be scored"):
+            QuestValidator({"steps": [{"action": "broken_step"}]}).validate("broken_step", {}, {}, "seed")
+    finally:
+        del ACTION_HANDLERS["broken_step"]
+
+
+def test_validator_score_survives_json_round_trip():
+    """Test a score is the same whether progress is passed along directly or read back from a JSON column"""
+    import json
+    from app.services.quest_rules import QuestValidator
+    
+    # Step scores of 99.99 and 98.4 total exactly 99.195 for this seed
+    seed = "c0bd7da3680e1ce0298e387202729f850c226dbf67b5ab21b6f96337f1efb7ea"
+    validator = QuestValidator(LIQUIDITY_RULES)
+    actions = [
+        ("simulate_add_liquidity", {"pair": "STX/sBTC", "amount": 5}),
+        ("predict_price_move", {"prediction": "down", "confidence": 3})
+    ]
+    
+    scores = []
+    for round_trip in (False, True):
+        progress = {}
+        for action, payload in actions:
+            score, progress, _ = validator.validate(action, payload, progress, seed)
+            if round_trip:
+                progress = json.loads(json.dumps(progress))
+        scores.append(score)
+    
+    assert scores[0] == scores[1]
+    assert all(type(value) is float for value in progress["step_scores"].values())
+
+
+def test_validator_free_form_quest_completes_on_tx_proof():
+    """Test a quest without steps accepts any action and completes on a tx proof"""
+    from app.services.quest_rules import QuestValidator
+    
+    validator = QuestValidator({})
+    
+    score, progress, state = validator.validate("predict_price_move", {"prediction": _right_direction("seed"), "confidence": 1}, {}, "seed")
+    assert (score, state) == (84.0, "ongoing")  # Brier score at 60% confidence
+    
+    score, progress, state = validator.validate("submit_tx_proof", {"txid": "0xabc"}, progress, "seed")
+    assert (score, state) == (100.0, "completed")
+    assert progress["txid"] == "0xabc"
+
+
+def test_registered_handler_needs_no_validator_changes():
+    """Test a new quest type only needs a handler registration"""
+    from app.services.quest_rules import ACTION_HANDLERS, QuestValidator, StepResult, action_handler
+    
+    @action_handler("stake_tokens", required=("amount",))
+    def stake_tokens(payload, params, progress, server_seed):
+        staked = payload["amount"] >= params["min_stake"]
+        return StepResult(passed=staked, quality=1.0, metrics={"timing": 0.5}, progress={"staked": staked})
+    
+    try:
+        validator = QuestValidator({
+            "type": "staking",
+            "steps": [{"action": "stake_tokens", "params": {"min_stake": 10}}],
+            "scoring": {"amount": 0.5, "timing": 0.5}
+        })
+        score, progress, state = validator.validate("stake_tokens", {"amount": 20}, {}, "seed")
+    finally:
+        del ACTION_HANDLERS["stake_tokens"]
+    
+    assert (score, state, progress["staked"]) == (75.0, "completed", True)
+
+
+def test_validator_cache_recompiles_when_rules_change():
+    """Test validators are compiled once per (quest id, rules hash)"""
+    from app.services.quest_rules import ValidatorCache
+    
+    cache = ValidatorCache()
+    first = cache.get("quest-1", LIQUIDITY_RULES)
+    
+    assert cache.get("quest-1", dict(LIQUIDITY_RULES)) is first
+    assert cache.get("quest-2", LIQUIDITY_RULES) is not first
+    
+    changed = cache.get("quest-1", {**LIQUIDITY_RULES, "max_score": 200})
+    assert changed is not first
+    assert changed.max_score == 200
+
+
+def test_submit_action_rejects_invalid_action(api_client, db_session):
+    """Test the action endpoint turns rule violations into a 400"""
+    import uuid
+    from app.models.quest import Quest
+    from app.models.user import User
+    from app.core.security import create_access_token
+    
+    user = User(id=str(uuid.uuid4()), wallet_address="SP100")
+    quest = Quest(id=str(uuid.uuid4()), slug="liquidity-kata", title="Liquidity Kata", game_rules=LIQUIDITY_RULES)
+    db_session.add_all([user, quest])
+    db_session.commit()
+    
+    api_client.headers.update({"Authorization": f"Bearer {create_access_token({'sub': user.id})}"})
+    started = api_client.post(f"/api/v1/quests/{quest.id}/start", json={}).json()
+    response = api_client.post(f"/api/v1/quests/{quest.id}/action", json={
+        "user_quest_id": started["user_quest_id"],
+        "action": "submit_tx_proof",
+        "payload": {"txid": "0xabc"}
+    })
+    
+    assert response.status_code == 400
+    assert "not allowed" in response.json()["detail"]
+
+
+def test_quest_catalog_served_from_cache(api_client, db_session):
+    """Test the catalog lists active quests and repeat requests skip the database"""
+    from conftest import QueryCounter, engine
+    from app.models.quest import Quest
+    
+    db_session.add_all([
+        Quest(id="q1", slug="liquidity-kata", title="Liquidity Kata", difficulty=1, active=True),
+        Quest(id="q2", slug="retired", title="Retired", difficulty=2, active=False)
+    ])
+    db_session.commit()
+    
+    data = api_client.get("/api/v1/quests/public").json()
+    assert [quest["slug"] for quest in data] == ["liquidity-kata"]
+    assert set(data[0]) == {"id", "slug", "title", "description", "difficulty", "reward_json", "active"}
+    
+    with QueryCounter(engine) as counter:
+        assert api_client.get("/api/v1/quests/public").json() == data
+    assert counter.count == 0
+
+
+def test_quest_catalog_invalidated_on_quest_commit(api_client, db_session):
+    """Test committing a quest change refreshes the catalog"""
+    from app.models.quest import Quest
+    
+    quest = Quest(id="q1", slug="liquidity-kata", title="Liquidity Kata", difficulty=1, active=True)
+    db_session.add(quest)
+    db_session.commit()
+    assert api_client.get("/api/v1/quests/public").json()[0]["title"] == "Liquidity Kata"
+    
+    quest.title = "Liquidity Kata II"
+    db_session.flush()
+    db_session.rollback()
+    assert api_client.get("/api/v1/quests/public").json()[0]["title"] == "Liquidity Kata"
+    
+    quest.title = "Liquidity Kata II"
+    db_session.commit()
+    assert api_client.get("/api/v1/quests/public").json()[0]["title"] == "Liquidity Kata II"
+
+
+def test_quest_catalog_ttl_and_racing_invalidation(db_session):
+    """Test the catalog reloads after its TTL and never caches a load that raced a write"""
+    from app.models.quest import Quest
+    from app.services.quest_catalog import QuestCatalogCache
+    
+    now = [0.0]
+    catalog = QuestCatalogCache(ttl_seconds=60, clock=lambda: now[0])
+    db_session.add(Quest(id="q1", slug="a", title="A", difficulty=1, active=True))
+    db_session.commit()
+    
+    first = catalog.get(db_session)
+    db_session.query(Quest).update({"title": "B"})  # bulk update bypasses invalidation
+    db_session.commit()
+    assert catalog.get(db_session) is first
+    
+    now[0] = 61
+    assert b'"B"' in catalog.get(db_session)
+    
+    # A write committed while a load is in flight must not leave that load cached
+    original_query = db_session.query
+    def query_then_invalidate(*args):
+        result = original_query(*args)
+        catalog.invalidate()
+        return result
+    db_session.query = query_then_invalidate
+    catalog.invalidate()
+    catalog.get(db_session)
+    assert catalog._body is None
+
+
+def _start_quest(api_client, db_session, game_rules):
+    """Create a user and quest, authenticate as the user and start the quest"""
+    import uuid
+    from app.models.quest import Quest
+    from app.models.user import User
+    from app.core.security import create_access_token
+    
+    user = User(id=str(uuid.uuid4()), wallet_address=f"SP{uuid.uuid4().hex[:8]}")
+    quest = Quest(id=str(uuid.uuid4()), slug=f"quest-{uuid.uuid4().hex[:8]}", title="Quest", game_rules=game_rules)
+    db_session.add_all([user, quest])
+    db_session.commit()
+    
+    api_client.headers.update({"Authorization": f"Bearer {create_access_token({'sub': user.id})}"})
+    started = api_client.post(f"/api/v1/quests/{quest.id}/start", json={}).json()
+    return user, quest, started["user_quest_id"]
+
+
+def test_submit_actions_batch_single_commit(api_client, db_session):
+    """Test a batch returns each intermediate state and commits once"""
+    from unittest.mock import patch
+    from app.models.leaderboard import Leaderboard
+    from app.models.quest import UserQuest
+    from app.services.quest_rules import QuestValidator
+    
+    user, quest, user_quest_id = _start_quest(api_client, db_session, LIQUIDITY_RULES)
+    server_seed = db_session.query(UserQuest).filter(UserQuest.id == user_quest_id).one().server_seed
+    
+    with patch.object(db_session, "commit", wraps=db_session.commit) as commit:
+        response = api_client.post(f"/api/v1/quests/{quest.id}/actions", json={
+            "user_quest_id": user_quest_id,
+            "actions": [
+                {"action": "simulate_add_liquidity", "payload": {"pair": "STX/sBTC", "amount": 5}},
+                {"action": "predict_price_move", "payload": {"prediction": _right_direction(server_seed), "confidence": 5}}
+            ]
+        })
+    
+    assert response.status_code == 200
+    data = response.json()
+    # The liquidity step's efficiency depends on the instance's simulated market
+    first, progress, _ = QuestValidator(LIQUIDITY_RULES).validate("simulate_add_liquidity", {"pair": "STX/sBTC", "amount": 5}, {}, server_seed)
+    total = round((progress["step_scores"]["simulate_add_liquidity"] + 100.0) / 2, 2)
+    assert [(result["score"], result["state"]) for result in data["results"]] == [(first, "ongoing"), (total, "completed")]
+    assert "price_predicted" not in data["results"][0]["progress"]
+    assert (data["score"], data["state"]) == (total, "completed")
+    assert commit.call_count == 1
+    assert db_session.query(Leaderboard).filter(Leaderboard.user_id == user.id).one().xp == int(total)
+
+
+def test_submit_actions_batch_is_all_or_nothing(api_client, db_session):
+    """Test a rejected action leaves the quest untouched"""
+    from app.models.quest import UserQuest
+    
+    _, quest, user_quest_id = _start_quest(api_client, db_session, LIQUIDITY_RULES)
+    
+    response = api_client.post(f"/api/v1/quests/{quest.id}/actions", json={
+        "user_quest_id": user_quest_id,
+        "actions": [
+            {"action": "simulate_add_liquidity", "payload": {"pair": "STX/sBTC", "amount": 5}},
+            {"action": "predict_price_move", "payload": {"prediction": "up"}}
+        ]
+    })
+    
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Action 1:")
+    user_quest = db_session.query(UserQuest).filter(UserQuest.id == user_quest_id).one()
+    assert (user_quest.state, user_quest.progress) == ("started", {})
+
+
+def test_submit_actions_batch_rejects_actions_after_completion(api_client, db_session):
+    """Test a batch cannot keep acting on a quest it already completed"""
+    _, quest, user_quest_id = _start_quest(api_client, db_session, {})
+    
+    response = api_client.post(f"/api/v1/quests/{quest.id}/actions", json={
+        "user_quest_id": user_quest_id,
+        "actions": [
+            {"action": "submit_tx_proof", "payload": {"txid": "0x1"}},
+            {"action": "submit_tx_proof", "payload": {"txid": "0x2"}}
+        ]
+    })
+    
+    assert response.status_code == 400
+    assert "completed by action 0" in response.json()["detail"]
+    
+    empty = api_client.post(f"/api/v1/quests/{quest.id}/actions", json={"user_quest_id": user_quest_id, "actions": []})
+    assert empty.status_code == 422
+
+
+def test_price_path_deterministic_and_cached():
+    """Test paths are reproducible per seed, cached and read-only"""
+    from app.services.price_paths import PathModel, simulate_price_path
+    
+    path = simulate_price_path("seed-a", 15)
+    
+    assert path.shape == (16,)
+    assert path[0] == 1.0
+    assert simulate_price_path("seed-a", 15) is path
+    assert (simulate_price_path.__wrapped__("seed-a", 15) == path).all()
+    assert not (simulate_price_path("seed-b", 15) == path).all()
+    assert not path.flags.writeable
+    
+    calm = simulate_price_path("seed-a", 15, PathModel(volatility=0.01, jump_intensity=0))
+    assert abs(calm[-1] - 1) < 1e-3
+
+
+def test_price_path_distribution_matches_model():
+    """Test simulated log returns have the model's drift and volatility"""
+    import numpy as np
+    from app.services.price_paths import MINUTES_PER_YEAR, PathModel, simulate_price_path
+    
+    model = PathModel(drift=0.1, volatility=0.5, jump_intensity=0)
+    log_returns = np.diff(np.log(simulate_price_path.__wrapped__("stats", 200_000, model)))
+    dt = 1 / MINUTES_PER_YEAR
+    
+    assert log_returns.std() / np.sqrt(dt) == pytest.approx(0.5, rel=0.01)
+    assert log_returns.mean() / dt == pytest.approx(0.1 - 0.5 * 0.5 ** 2, abs=1.5)
+
+
+def test_predict_price_move_scored_against_simulated_outcome():
+    """Test predictions are scored by direction and calibrated confidence"""
+    from app.services.quest_rules import QuestRuleError, QuestValidator
+    
+    validator = QuestValidator({"steps": [{"action": "predict_price_move", "params": {"window_minutes": 30}}]})
+    right, wrong = _right_direction("seed", 30), _wrong_direction("seed", 30)
+    
+    scores = {
+        (direction, confidence): validator.validate("predict_price_move", {"prediction": direction, "confidence": confidence}, {}, "seed")[0]
+        for direction in (right, wrong) for confidence in (0, 5)
+    }
+    
+    assert scores[(right, 5)] == 100.0
+    assert scores[(right, 0)] == scores[(wrong, 0)] == 75.0
+    assert scores[(wrong, 5)] == 0.0
+    
+    _, progress, _ = validator.validate("predict_price_move", {"prediction": wrong, "confidence": 0}, {}, "seed")
+    assert progress["outcome"] == right
+    
+    # The outcome is revealed, so the prediction cannot be retried with it
+    with pytest.raises(QuestRuleError, match="already submitted"):
+        validator.validate("predict_price_move", {"prediction": right, "confidence": 5}, progress, "seed")
+    
+    with pytest.raises(QuestRuleError):
+        validator.validate("predict_price_move", {"prediction": "sideways", "confidence": 1}, {}, "seed")
+
+
+def test_actions_are_logged_and_progress_compacted(api_client, db_session, monkeypatch):
+    """Test each action appends a log row and the progress snapshot is only rewritten periodically"""
+    from app.core.config import settings
+    from app.models.quest import UserQuest
+    from app.models.quest_action import QuestAction
+    
+    monkeypatch.setattr(settings, "quest_progress_compact_every", 2)
+    _, quest, user_quest_id = _start_quest(api_client, db_session, {"steps": [
+        {"action": "simulate_add_liquidity", "params": {"pair": "STX/sBTC", "min_amount": 1}},
+        {"action": "predict_price_move"},
+        {"action": "submit_tx_proof"}
+    ]})
+    
+    def act(action, payload):
+        response = api_client.post(f"/api/v1/quests/{quest.id}/action", json={"user_quest_id": user_quest_id, "action": action, "payload": payload})
+        assert response.status_code == 200
+        return response.json()
+    
+    def snapshot():
+        db_session.expire_all()
+        return db_session.query(UserQuest).filter(UserQuest.id == user_quest_id).one()
+    
+    first = act("simulate_add_liquidity", {"pair": "STX/sBTC", "amount": 5})
+    assert (snapshot().progress, snapshot().action_count, snapshot().snapshot_seq) == ({}, 1, 0)
+    
+    # The status endpoint folds the pending log into the snapshot
+    status_progress = api_client.get(f"/api/v1/quests/{user_quest_id}/status").json()["progress"]
+    assert status_progress == first["progress"]
+    
+    second = act("predict_price_move", {"prediction": "up", "confidence": 1})
+    assert snapshot().progress == second["progress"]
+    assert snapshot().snapshot_seq == 2
+    
+    # Completion always writes the final snapshot
+    third = act("submit_tx_proof", {"txid": "0xabc"})
+    assert third["state"] == "completed"
+    assert (snapshot().progress, snapshot().snapshot_seq) == (third["progress"], 3)
+    
+    log = db_session.query(QuestAction).filter(QuestAction.user_quest_id == user_quest_id).order_by(QuestAction.seq).all()
+    assert [(entry.seq, entry.action, entry.state) for entry in log] == [
+        (1, "simulate_add_liquidity", "ongoing"), (2, "predict_price_move", "ongoing"), (3, "submit_tx_proof", "completed")
+    ]
+    assert log[2].progress_delta["txid"] == "0xabc"
+    assert "liquidity_added" not in log[2].progress_delta
+    assert sum(entry.score_delta for entry in log) == pytest.approx(third["score"])
+
+
+def test_batch_actions_are_logged_in_order(api_client, db_session):
+    """Test a batch appends one log row per action, and a rejected batch none"""
+    from app.models.quest_action import QuestAction
+    
+    _, quest, user_quest_id = _start_quest(api_client, db_session, LIQUIDITY_RULES)
+    actions = [
+        {"action": "simulate_add_liquidity", "payload": {"pair": "STX/sBTC", "amount": 5}},
+        {"action": "predict_price_move", "payload": {"prediction": "up"}}
+    ]
+    
+    rejected = api_client.post(f"/api/v1/quests/{quest.id}/actions", json={"user_quest_id": user_quest_id, "actions": actions})
+    assert rejected.status_code == 400
+    assert db_session.query(QuestAction).count() == 0
+    
+    actions[1]["payload"]["confidence"] = 0
+    data = api_client.post(f"/api/v1/quests/{quest.id}/actions", json={"user_quest_id": user_quest_id, "actions": actions}).json()
+    
+    log = db_session.query(QuestAction).filter(QuestAction.user_quest_id == user_quest_id).order_by(QuestAction.seq).all()
+    assert [entry.action for entry in log] == ["simulate_add_liquidity", "predict_price_move"]
+    assert [entry.score_delta for entry in log] == [data["results"][0]["score"], data["score"] - data["results"][0]["score"]]
+
+
+def test_concurrent_action_conflict_returns_409(api_client, db_session):
+    """Test an action that loses the race for its log seq gets a 409 and writes nothing"""
+    from app.models.quest import UserQuest
+    from app.models.quest_action import QuestAction
+    
+    _, quest, user_quest_id = _start_quest(api_client, db_session, LIQUIDITY_RULES)
+    
+    # Another request logged seq 1 after this one read the instance
+    db_session.add(QuestAction(user_quest_id=user_quest_id, seq=1, action="simulate_add_liquidity", payload={}, state="ongoing"))
+    db_session.commit()
+    
+    response = api_client.post(f"/api/v1/quests/{quest.id}/action", json={
+        "user_quest_id": user_quest_id,
+        "action": "simulate_add_liquidity",
+        "payload": {"pair": "STX/sBTC", "amount": 5}
+    })
+    assert response.status_code == 409
+    
+    user_quest = db_session.query(UserQuest).filter(UserQuest.id == user_quest_id).one()
+    assert user_quest.state == "started" and (user_quest.action_count or 0) == 0
+    assert db_session.query(QuestAction).count() == 1
+
+
+def test_replay_verifier_flags_tampered_quests(api_client, db_session):
+    """Test completed quests replay from their logs, and a tampered score is reported"""
+    import uuid
+    from app.models.quest import UserQuest
+    from app.services.quest_replay import iter_replay_shards, verify_completed_quests
+    
+    user, quest, user_quest_id = _start_quest(api_client, db_session, LIQUIDITY_RULES)
+    for action, payload in (
+        ("simulate_add_liquidity", {"pair": "STX/sBTC", "amount": 5}),
+        ("predict_price_move", {"prediction": "down", "confidence": 3})
+    ):
+        api_client.post(f"/api/v1/quests/{quest.id}/action", json={"user_quest_id": user_quest_id, "action": action, "payload": payload})
+    
+    # Completed before the action log existed: nothing to replay
+    db_session.add(UserQuest(id=str(uuid.uuid4()), user_id=user.id, quest_id=quest.id, state="completed", score=100, progress={}))
+    db_session.commit()
+    
+    report = verify_completed_quests(db_session, workers=1)
+    assert (report.checked, report.unlogged, report.discrepancies) == (1, 1, [])
+    
+    user_quest = db_session.query(UserQuest).filter(UserQuest.id == user_quest_id).one()
+    user_quest.score = 100
+    db_session.commit()
+    
+    report = verify_completed_quests(db_session, workers=2)
+    assert [(found.user_quest_id, found.reason, found.stored_score) for found in report.discrepancies] == [
+        (user_quest_id, "score mismatch", 100.0)
+    ]
+    
+    # Shards never split a user's quests
+    assert [len(shard.quests) for shard in iter_replay_shards(db_session, chunk_size=1)] == [2]
+
+
+def test_start_warms_seeded_simulations(api_client, db_session):
+    """Test starting a quest builds its risk scenarios off the action's request path"""
+    from app.models.quest import UserQuest
+    from app.services import risk
+    
+    _, _, user_quest_id = _start_quest(api_client, db_session, {"steps": [
+        {"action": "calculate_risk_reward", "params": {"max_risk": 0.25}}
+    ]})
+    server_seed = db_session.query(UserQuest).filter(UserQuest.id == user_quest_id).one().server_seed
+    
+    hits = risk.best_expected_return.cache_info().hits
+    risk.best_expected_return(server_seed, 0.25, 0.95)
+    assert risk.best_expected_return.cache_info().hits == hits + 1
+
+
+def test_market_lists_the_pools_actions_are_scored_against(api_client, db_session):
+    """Test a player can pick yield pools from the instance's listed universe"""
+    rules = {
+        "steps": [{"action": "analyze_yield_opportunities", "params": {"pool_count": 500, "top_k": 3}}],
+        "scoring": {"apy_achieved": 1.0}
+    }
+    user, quest, user_quest_id = _start_quest(api_client, db_session, rules)
+    
+    market = api_client.get(f"/api/v1/quests/{user_quest_id}/market", params={"limit": 1000}).json()
+    assert len(market["pools"]) == 10 and market["prices"]["USDA"] == 1.0
+    listed = market["yield_pools"]
+    assert listed["total"] == 500 and [pool["id"] for pool in listed["pools"]] == list(range(500))
+    
+    page = api_client.get(f"/api/v1/quests/{user_quest_id}/market", params={"offset": 490, "limit": 20}).json()
+    assert page["yield_pools"]["pools"] == listed["pools"][490:]
+    
+    best = sorted(listed["pools"], key=lambda pool: pool["apy"] * (1 - pool["risk"]), reverse=True)[:3]
+    response = api_client.post(f"/api/v1/quests/{quest.id}/action", json={
+        "user_quest_id": user_quest_id,
+        "action": "analyze_yield_opportunities",
+        "payload": {"pools": [pool["id"] for pool in best]}
+    })
+    assert response.status_code == 200
+    assert response.json()["state"] == "completed" and response.json()["score"] == 100
+    
+    # Another player's instance stays hidden
+    _start_quest(api_client, db_session, rules)
+    assert api_client.get(f"/api/v1/quests/{user_quest_id}/market").status_code == 404
+
+
+def test_user_quest_lookups_use_indexes(api_client, db_session):
+    """Test no quest endpoint scans user_quests or quest_actions in full"""
+    from unittest.mock import patch
+    from sqlalchemy import event
+    from conftest import engine
+    
+    statements = []
+    
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and ("user_quests" in statement or "quest_actions" in statement):
+            statements.append((statement, parameters))
+    
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        user, quest, user_quest_id = _start_quest(api_client, db_session, LIQUIDITY_RULES)
+        assert api_client.post(f"/api/v1/quests/{quest.id}/start", json={}).status_code == 400
+        assert api_client.post(f"/api/v1/quests/{quest.id}/action", json={
+            "user_quest_id": user_quest_id,
+            "action": "simulate_add_liquidity",
+            "payload": {"pair": "STX/sBTC", "amount": 5}
+        }).status_code == 200
+        assert api_client.get(f"/api/v1/quests/{user_quest_id}/status").status_code == 200
+        with patch("app.api.v1.ai.generate_ai_hint_task"):
+            assert api_client.post("/api/v1/ai/hint", json={
+                "user_id": user.id, "user_quest_id": user_quest_id, "context": {}
+            }).status_code == 200
+        
+        assert api_client.post(f"/api/v1/quests/{quest.id}/action", json={
+            "user_quest_id": user_quest_id,
+            "action": "predict_price_move",
+            "payload": {"prediction": "up", "confidence": 0}
+        }).json()["state"] == "completed"
+        assert api_client.post("/api/v1/rewards/prepare", json={"user_quest_id": user_quest_id}).status_code == 200
+        assert api_client.get(f"/api/v1/leaderboard/quest/{quest.id}").status_code == 200
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    
+    plans = {}
+    for statement, parameters in statements:
+        rows = db_session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+        plans[statement] = " | ".join(row[-1] for row in rows)
+    
+    assert plans
+    for statement, plan in plans.items():
+        assert "SCAN user_quests" not in plan and "SCAN quest_actions" not in plan, (statement, plan)
+    
+    # start_quest's "already started" check
+    assert any("ix_user_quests_user_quest_state" in plan for plan in plans.values())
+    
+    # SQLite only matches the partial index against literal states, never bound ones; INDEXED BY fails if it cannot apply
+    active_plan = db_session.connection().exec_driver_sql(
+        "EXPLAIN QUERY PLAN SELECT id FROM user_quests INDEXED BY ix_user_quests_active "
+        "WHERE user_id = ? AND quest_id = ? AND state IN ('started', 'ongoing')", (user.id, quest.id)
+    ).fetchall()
+    assert "SEARCH user_quests USING INDEX ix_user_quests_active" in " | ".join(row[-1] for row in active_plan)
+
+
+def test_migrate_indexes_creates_missing(db_session):
+    """Test the index migration finds indexes an older database lacks"""
+    from sqlalchemy import text
+    from conftest import engine
+    from migrate_indexes import missing_indexes
+    
+    assert missing_indexes(engine) == []
+    
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_user_quests_user_quest_state"))
+        conn.execute(text("DROP INDEX ix_user_quests_active"))
+    missing = missing_indexes(engine)
+    assert [index.name for index in missing] == ["ix_user_quests_active", "ix_user_quests_user_quest_state"]
+    
+    for index in missing:
+        index.create(bind=engine)
+    assert missing_indexes(engine) == []
+
+
+def test_migrate_indexes_adds_missing_columns(api_client, db_session):
+    """Test the migration adds columns an older user_quests table lacks, defaulting existing rows"""
+    from sqlalchemy import text
+    from conftest import engine
+    from migrate_indexes import add_column, missing_columns
+    
+    _, quest, user_quest_id = _start_quest(api_client, db_session, LIQUIDITY_RULES)
+    db_session.close()
+    assert missing_columns(engine) == []
+    
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE user_quests DROP COLUMN action_count"))
+        conn.execute(text("ALTER TABLE user_quests DROP COLUMN snapshot_seq"))
+    missing = missing_columns(engine)
+    assert [(column.table.name, column.name) for column in missing] == [
+        ("user_quests", "action_count"), ("user_quests", "snapshot_seq")
+    ]
+    
+    for column in missing:
+        add_column(engine, column)
+    assert missing_columns(engine) == []
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT action_count, snapshot_seq FROM user_quests")).fetchall() == [(0, 0)]
+    
+    assert api_client.post(f"/api/v1/quests/{quest.id}/action", json={
+        "user_quest_id": user_quest_id,
+        "action": "simulate_add_liquidity",
+        "payload": {"pair": "STX/sBTC", "amount": 5}
+    }).status_code == 200
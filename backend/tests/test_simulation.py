@@ -0,0 +1,352 @@
+import pytest
+import numpy as np
+
+
+def test_pool_swap_keeps_invariant_and_charges_fee():
+    """Test swaps never shrink k and the fee stays in the pool"""
+    from app.services.amm import Pool
+    
+    pool = Pool(1_000.0, 2_000.0, fee=0.003)
+    k = pool.reserve_x * pool.reserve_y
+    
+    received = pool.swap_x_for_y(10.0)
+    
+    assert received == pytest.approx(2_000 * 9.97 / 1_009.97)
+    assert pool.reserve_x * pool.reserve_y > k
+    assert pool.swap_y_for_x(received) < 10.0  # round trip loses both fees
+
+
+def test_pool_liquidity_shares_round_trip():
+    """Test LP shares are minted pro rata and redeem for the same slice"""
+    from app.services.amm import Pool
+    
+    pool = Pool(1_000.0, 2_000.0)
+    shares, used_x, used_y = pool.add_liquidity(100.0, 500.0)  # Y side over-supplied
+    
+    assert (used_x, used_y) == (100.0, 200.0)
+    assert shares / pool.total_shares == pytest.approx(100 / 1_100)
+    assert pool.remove_liquidity(shares) == pytest.approx((100.0, 200.0))
+    assert not hasattr(pool, "__dict__")
+
+
+def test_impermanent_loss_curve():
+    """Test the vectorized IL curve against known values"""
+    from app.services.amm import impermanent_loss
+    
+    curve = impermanent_loss([1.0, 4.0, 0.25, 2.0])
+    
+    assert curve[0] == 0
+    assert curve[1] == pytest.approx(-0.2)
+    assert curve[2] == pytest.approx(-0.2)
+    assert curve[3] == pytest.approx(-0.05719, abs=1e-5)
+
+
+def test_liquidity_position_matches_closed_form():
+    """Test a held position's value equals holding times (1 + IL), plus fees"""
+    from app.services.amm import Pool, impermanent_loss, simulate_liquidity_position
+    
+    path = np.array([1.0, 1.5, 2.0, 4.0])
+    outcome = simulate_liquidity_position(Pool(1_000.0, 1_000.0, fee=0.003), 10.0, None, path)
+    
+    # HODL is measured on the deposited tokens
+    assert outcome.lp_value / outcome.hodl_value == pytest.approx(1 + impermanent_loss(4.0))
+    assert outcome.fees_earned > 0
+    assert outcome.used_fraction == 1.0
+    
+    lopsided = simulate_liquidity_position(Pool(1_000.0, 1_000.0), 10.0, 30.0, path)
+    assert lopsided.used_fraction == pytest.approx(20 / 40)
+
+
+def test_simulate_add_liquidity_scores_from_outcome():
+    """Test the liquidity step is scored from the seeded simulation"""
+    from app.services.quest_rules import QuestValidator
+    
+    validator = QuestValidator({
+        "steps": [{"action": "simulate_add_liquidity", "params": {"pair": "STX/sBTC", "min_amount": 1}}],
+        "scoring": {"correctness": 0.6, "efficiency": 0.4}
+    })
+    
+    balanced = validator.validate("simulate_add_liquidity", {"pair": "STX/sBTC", "amount": 5}, {}, "seed")
+    assert balanced == validator.validate("simulate_add_liquidity", {"pair": "STX/sBTC", "amount": 5}, {}, "seed")
+    assert balanced[2] == "completed"
+    assert balanced[1]["lp_shares"] > 0
+    
+    # Offering far too little of the second token wastes most of the deposit
+    lopsided_score, _, _ = validator.validate("simulate_add_liquidity", {"pair": "STX/sBTC", "amount": 5, "amount_y": 0.01}, {}, "seed")
+    assert 60 <= lopsided_score < balanced[0]
+
+
+def test_market_graph_finds_arbitrage_only_when_mispriced():
+    """Test Bellman-Ford on -log rates returns a profitable loop, and none in a fair market"""
+    from app.services.market_graph import MarketGraph, seeded_market
+    
+    market = seeded_market("seed")
+    cycle = market.find_arbitrage()
+    assert cycle[0] == cycle[-1]
+    assert market.spot_rate(cycle) > 1
+    assert market.arbitrage_cycles[0][0] >= market.spot_rate(cycle)
+    
+    # Three tokens priced consistently: every loop loses the fees
+    fair = MarketGraph(("A", "B", "C"), np.array([[0, 100.0, 100.0], [200.0, 0, 100.0], [50.0, 25.0, 0]]))
+    assert fair.find_arbitrage() is None
+    assert fair.arbitrage_cycles == []
+
+
+def test_every_seeded_market_has_a_loop_worth_finding():
+    """Test every seed's best loop clears the spread quests ask for, including seeds whose first draw had none"""
+    from app.services.market_graph import MIN_ARBITRAGE_SPREAD, seeded_market
+    from app.services.quest_rules import QuestValidator
+    
+    validator = QuestValidator({"steps": [{"action": "identify_price_differences", "params": {"min_spread": 0.01}}]})
+    for seed in ["2477"] + [str(i) for i in range(1000)]:
+        cycles = seeded_market(seed).arbitrage_cycles
+        assert cycles and cycles[0][0] - 1 >= MIN_ARBITRAGE_SPREAD, seed
+    
+    best = [seeded_market("2477").tokens[i] for i in seeded_market("2477").arbitrage_cycles[0][1]]
+    assert validator.validate("identify_price_differences", {"cycle": best}, {}, "2477")[2] == "completed"
+
+
+def test_market_graph_best_route_matches_exhaustive_search():
+    """Test the bounded-hop route search against quoting every route"""
+    from itertools import permutations
+    from app.services.market_graph import seeded_market
+    
+    market = seeded_market("seed")
+    start, end = market.index["STX"], market.index["sBTC"]
+    others = [i for i in range(len(market.tokens)) if i not in (start, end)]
+    routes = [[start, *middle, end] for hops in range(3) for middle in permutations(others, hops)]
+    
+    best = market.best_route(start, end, 50_000.0, max_hops=3)
+    assert best.amount_out == pytest.approx(max(float(market.quote(route, 50_000.0)) for route in routes))
+    assert len(best.tokens) <= 4
+
+
+def test_arbitrage_steps_score_against_best_loop():
+    """Test spotting and trading loops is scored against the market's optimum"""
+    from app.services.market_graph import seeded_market
+    from app.services.quest_rules import QuestRuleError, QuestValidator
+    
+    validator = QuestValidator({
+        "steps": [
+            {"action": "identify_price_differences", "params": {"min_spread": 0.01}},
+            {"action": "execute_arbitrage", "params": {"max_slippage": 0.005}}
+        ],
+        "scoring": {"profit_margin": 0.7, "execution_speed": 0.3}
+    })
+    market = seeded_market("seed")
+    _, best = market.arbitrage_cycles[0]
+    best_cycle = [market.tokens[i] for i in best]
+    
+    score, progress, state = validator.validate("identify_price_differences", {"cycle": best_cycle}, {}, "seed")
+    assert progress["spread"] == progress["best_spread"]
+    assert state == "ongoing"
+    
+    # Trading the best loop at its best size within the slippage limit earns full profit margin
+    amount, _ = market.best_arbitrage_amount(best, 0.005)
+    score, progress, state = validator.validate("execute_arbitrage", {"cycle": best_cycle, "amount": amount}, progress, "seed")
+    assert state == "completed"
+    assert progress["slippage"] <= 0.005
+    
+    # Too large a trade slips past the limit
+    _, _, state = validator.validate("execute_arbitrage", {"cycle": best_cycle, "amount": amount * 100}, {}, "seed")
+    assert state == "ongoing"
+    
+    with pytest.raises(QuestRuleError):
+        validator.validate("identify_price_differences", {"cycle": ["STX", "USDA", "STX"]}, {}, "seed")
+    with pytest.raises(QuestRuleError):
+        validator.validate("identify_price_differences", {"cycle": ["STX", "DOGE", "USDA", "STX"]}, {}, "seed")
+
+
+def test_multi_hop_swap_scored_against_best_route():
+    """Test a swap route is scored by output and swap count against the best route"""
+    from app.services.market_graph import seeded_market
+    from app.services.quest_rules import QuestRuleError, QuestValidator
+    
+    validator = QuestValidator({
+        "steps": [{"action": "multi_hop_swap", "params": {"max_hops": 3}}],
+        "scoring": {"gas_efficiency": 0.3, "profit_optimization": 0.7}
+    })
+    best = seeded_market("seed").best_route(0, 1, 1_000.0)
+    
+    score, progress, state = validator.validate("multi_hop_swap", {"route": best.tokens, "amount": 1_000}, {}, "seed")
+    assert (score, state) == (100.0, "completed")
+    assert progress["best_route"] == best.tokens
+    
+    worse = ["STX", "sBTC"] if best.tokens != ["STX", "sBTC"] else ["STX", "USDA", "sBTC"]
+    assert validator.validate("multi_hop_swap", {"route": worse, "amount": 1_000}, {}, "seed")[0] < 100
+    
+    # Longer than max_hops does not pass
+    _, _, state = validator.validate("multi_hop_swap", {"route": ["STX", "USDA", "ALEX", "xBTC", "sBTC"], "amount": 1_000}, {}, "seed")
+    assert state == "ongoing"
+    
+    # Amounts that cannot be routed are a 400, not a crash
+    for amount in ("inf", "nan", "1e400", 1e-320):
+        with pytest.raises(QuestRuleError):
+            validator.validate("multi_hop_swap", {"route": best.tokens, "amount": amount}, {}, "seed")
+
+
+def test_risk_engine_tail_metrics():
+    """Test VaR/CVaR on a known loss distribution and that the scenario matrix is cached"""
+    from app.services.risk import SCENARIOS, allocation_weights, evaluate_allocation, scenario_matrix, tail_risk
+    
+    var, cvar = tail_risk(np.arange(100, dtype=float), 0.95)
+    assert (var, cvar) == (95.0, 97.0)
+    
+    assert scenario_matrix("seed") is scenario_matrix("seed")
+    assert scenario_matrix("seed").shape[-1] == SCENARIOS
+    
+    stable = evaluate_allocation("seed", allocation_weights({"USDA": 1}))
+    volatile = evaluate_allocation("seed", allocation_weights({"ALEX": 1}))
+    assert stable.cvar >= stable.var
+    assert volatile.cvar > volatile.var > stable.var
+    assert volatile.max_drawdown > stable.max_drawdown
+    assert evaluate_allocation("seed", allocation_weights({"USDA": 2, "ALEX": 2})) == \
+        evaluate_allocation("seed", allocation_weights({"USDA": 0.5, "ALEX": 0.5}))
+
+
+def test_calculate_risk_reward_enforces_max_risk():
+    """Test allocations over the CVaR budget fail and those inside it are scored"""
+    from app.services.quest_rules import QuestRuleError, QuestValidator
+    
+    validator = QuestValidator({
+        "steps": [{"action": "calculate_risk_reward", "params": {"max_risk": 0.3}}],
+        "scoring": {"apy_achieved": 0.4, "risk_management": 0.6}
+    })
+    
+    _, _, state = validator.validate("calculate_risk_reward", {"allocation": {"ALEX": 100}}, {}, "seed")
+    assert state == "ongoing"
+    
+    score, progress, state = validator.validate("calculate_risk_reward", {"allocation": {"USDA": 60, "STX-sBTC-LP": 40}}, {}, "seed")
+    assert state == "completed"
+    assert progress["cvar"] <= 0.3
+    assert 0 < score < 100
+    
+    with pytest.raises(QuestRuleError):
+        validator.validate("calculate_risk_reward", {"allocation": {"DOGE": 1}}, {}, "seed")
+    with pytest.raises(QuestRuleError):
+        validator.validate("calculate_risk_reward", {"allocation": {"USDA": "lots"}}, {}, "seed")
+    for amount in (float("nan"), "nan", "inf"):
+        with pytest.raises(QuestRuleError, match="finite"):
+            validator.validate("calculate_risk_reward", {"allocation": {"USDA": 1, "STX": amount}}, {}, "seed")
+
+
+def test_yield_screener_top_k_matches_full_sort():
+    """Test the argpartition ranking against sorting the whole screened universe"""
+    from app.services.yield_screener import seeded_universe
+    
+    universe = seeded_universe("seed", 100_000)
+    assert universe is seeded_universe("seed", 100_000)
+    
+    mask = universe.screen(min_apy=5, min_tvl=100_000, max_risk=0.5)
+    ranked = np.flatnonzero(mask)[np.argsort(-universe.risk_adjusted_apy()[mask], kind="stable")]
+    
+    top = universe.top_k(10, min_apy=5, min_tvl=100_000, max_risk=0.5)
+    assert top.tolist() == ranked[:10].tolist()
+    assert (universe.apy[top] >= 5).all()
+    assert universe.top_k(10, min_apy=1e9).size == 0
+
+
+def test_analyze_yield_opportunities_scores_against_top_k():
+    """Test yield picks are screened by min_apy and scored against the true top-k"""
+    from app.services.quest_rules import QuestRuleError, QuestValidator
+    from app.services.yield_screener import seeded_universe
+    
+    validator = QuestValidator({
+        "steps": [{"action": "analyze_yield_opportunities", "params": {"min_apy": 5, "top_k": 3}}]
+    })
+    universe = seeded_universe("seed")
+    best = universe.top_k(3, min_apy=5).tolist()
+    
+    score, progress, state = validator.validate("analyze_yield_opportunities", {"pools": best}, {}, "seed")
+    assert (score, state) == (100.0, "completed")
+    assert progress["best_pools"] == best
+    
+    # The highest headline APY is usually a risky pool
+    headline = np.argsort(universe.apy)[-3:].tolist()
+    assert validator.validate("analyze_yield_opportunities", {"pools": headline}, {}, "seed")[0] < 100
+    
+    below_min = int(np.flatnonzero(universe.apy < 5)[0])
+    _, _, state = validator.validate("analyze_yield_opportunities", {"pools": [below_min]}, {}, "seed")
+    assert state == "ongoing"
+    
+    with pytest.raises(QuestRuleError):
+        validator.validate("analyze_yield_opportunities", {"pools": best + [below_min]}, {}, "seed")
+    with pytest.raises(QuestRuleError):
+        validator.validate("analyze_yield_opportunities", {"pools": [len(universe)]}, {}, "seed")
+    with pytest.raises(QuestRuleError):
+        validator.validate("analyze_yield_opportunities", {"pools": [True]}, {}, "seed")
+
+
+def _flash_loan_ops(market, cycle, amount):
+    """Borrow the loop's first token, swap around the loop and repay"""
+    tokens = [market.tokens[i] for i in cycle]
+    return (
+        [{"op": "borrow", "token": tokens[0], "amount": amount}]
+        + [{"op": "swap", "from": source, "to": target} for source, target in zip(tokens, tokens[1:])]
+        + [{"op": "repay", "token": tokens[0]}]
+    )
+
+
+def test_flash_loan_snapshots_are_copy_on_write():
+    """Test strategies only touch their own snapshot, and reverts leave it unchanged"""
+    from app.services.flash_loans import GAS_COSTS, PoolSnapshot, simulate_strategy, strategy_gas
+    from app.services.market_graph import seeded_market
+    
+    market = seeded_market("seed")
+    _, cycle = market.arbitrage_cycles[0]
+    amount, _ = market.best_arbitrage_amount(cycle, 1.0)
+    ops = _flash_loan_ops(market, cycle, amount)
+    
+    base = PoolSnapshot(market)
+    fork = base.fork()
+    result = simulate_strategy(fork, ops)
+    
+    assert result.success and result.profit > 0
+    assert result.gas_used == strategy_gas(len(cycle) - 1) == sum(GAS_COSTS[op.get("op", "transaction")] for op in [{}] + ops)
+    assert fork.reserves(cycle[0], cycle[1]) != base.reserves(cycle[0], cycle[1])
+    assert base.reserves(cycle[0], cycle[1]) == (market.reserves[cycle[0], cycle[1]], market.reserves[cycle[1], cycle[0]])
+    
+    # Running it again on the moved pools earns less
+    assert simulate_strategy(fork, ops).profit < result.profit
+    
+    unpaid = simulate_strategy(fork, ops[:-1])
+    assert (unpaid.success, unpaid.failed_step) == (False, len(ops) - 1)
+    assert "not repaid" in unpaid.failure
+    
+    out_of_gas = simulate_strategy(base, ops, max_gas=200_000)
+    assert out_of_gas.failure.startswith("out of gas")
+    assert base.reserves(cycle[0], cycle[1]) == (market.reserves[cycle[0], cycle[1]], market.reserves[cycle[1], cycle[0]])
+
+
+def test_flash_loan_strategy_step_scores_profit_and_gas():
+    """Test the DeFi Ninja flash loan step against the best single-loop loan"""
+    from app.services.flash_loans import best_flash_loan
+    from app.services.market_graph import seeded_market
+    from app.services.quest_rules import QuestRuleError, QuestValidator
+    
+    validator = QuestValidator({
+        "steps": [{"action": "flash_loan_strategy", "params": {"max_gas": 500000}}],
+        "scoring": {"gas_efficiency": 0.3, "profit_optimization": 0.7}
+    })
+    market = seeded_market("seed")
+    _, cycle = market.arbitrage_cycles[0]
+    amount, _ = market.best_arbitrage_amount(cycle, 1.0)
+    
+    score, progress, state = validator.validate("flash_loan_strategy", {"ops": _flash_loan_ops(market, cycle, amount)}, {}, "seed")
+    assert state == "completed"
+    assert progress["profit"] <= best_flash_loan("seed", 500000)[0] + 1e-6
+    assert score > 50
+    
+    with pytest.raises(QuestRuleError, match="Strategy reverted at op 1"):
+        validator.validate("flash_loan_strategy", {"ops": [
+            {"op": "borrow", "token": "USDA", "amount": 1000},
+            {"op": "swap", "from": "STX", "to": "USDA"}
+        ]}, {}, "seed")
+    with pytest.raises(QuestRuleError):
+        validator.validate("flash_loan_strategy", {"ops": [{"op": "mint", "token": "USDA"}]}, {}, "seed")
+    for amount in ("nan", "inf"):
+        with pytest.raises(QuestRuleError, match="Strategy reverted at op 0"):
+            validator.validate("flash_loan_strategy", {"ops": [
+                {"op": "borrow", "token": "USDA", "amount": amount},
+                {"op": "repay", "token": "USDA", "amount": amount}
+            ]}, {}, "seed")
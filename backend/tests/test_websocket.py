@@ -249,3 +249,108 @@ def test_websocket_unknown_message_type(mock_token_payload):
             
             # Should handle gracefully (no response expected)
             # The WebSocket will continue to work
+
+
+def _connected_manager(*user_ids):
+    """ConnectionManager with one mock socket per user"""
+    import asyncio
+    from unittest.mock import AsyncMock
+    
+    manager = ConnectionManager()
+    sockets = {}
+    for user_id in user_ids:
+        sockets[user_id] = AsyncMock()
+        asyncio.run(manager.connect(sockets[user_id], user_id))
+    return manager, sockets
+
+
+def _sent(socket):
+    return [json.loads(call.args[0]) for call in socket.send_text.call_args_list]
+
+
+def test_connection_manager_topics():
+    """Test topic subscribers receive published messages until they disconnect"""
+    import asyncio
+    
+    manager, sockets = _connected_manager("a", "b")
+    manager.subscribe(sockets["a"], "leaderboard")
+    manager.subscribe(sockets["a"], "leaderboard")
+    
+    asyncio.run(manager.publish("leaderboard", {"type": "leaderboard_update"}))
+    
+    assert _sent(sockets["a"]) == [{"type": "leaderboard_update"}]
+    assert _sent(sockets["b"]) == []
+    
+    manager.disconnect(sockets["a"], "a")
+    assert "leaderboard" not in manager.topic_connections
+
+
+def test_push_rank_change_notifies_moved_players():
+    """Test only players between the new and old rank get a delta"""
+    import asyncio
+    from app.services.leaderboard import RankChange
+    from app.services.leaderboard_store import MemoryLeaderboardStore, StoredEntry
+    from app.websocket.rank_updates import push_rank_change
+    
+    store = MemoryLeaderboardStore()
+    store.load([StoredEntry(user_id=user_id, xp=xp) for user_id, xp in
+                [("top", 500), ("mover", 400), ("passed", 300), ("also", 250), ("below", 100)]])
+    manager, sockets = _connected_manager("top", "mover", "passed", "below")
+    manager.subscribe(sockets["top"], "leaderboard")
+    
+    # "mover" climbed from 4th to 2nd, passing "passed" and "also"
+    change = RankChange(user_id="mover", xp=400, previous_rank=4, rank=2, previous_xp=200)
+    asyncio.run(push_rank_change(change, store=store, connections=manager))
+    
+    assert _sent(sockets["mover"]) == [
+        {"type": "rank_update", "user_id": "mover", "xp": 400, "rank": 2, "previous_rank": 4}
+    ]
+    assert _sent(sockets["passed"]) == [
+        {"type": "rank_update", "user_id": "passed", "xp": 300, "rank": 3, "previous_rank": 2}
+    ]
+    assert _sent(sockets["below"]) == []
+    assert _sent(sockets["top"]) == [
+        {"type": "leaderboard_update", "user_id": "mover", "xp": 400, "rank": 2, "previous_rank": 4}
+    ]
+
+
+def test_push_rank_change_new_entrant_pushes_down_everyone_below():
+    """Test a first completion shifts every lower ranked player"""
+    import asyncio
+    from app.services.leaderboard import RankChange
+    from app.services.leaderboard_store import MemoryLeaderboardStore, StoredEntry
+    from app.websocket.rank_updates import push_rank_change
+    
+    store = MemoryLeaderboardStore()
+    store.load([StoredEntry(user_id=user_id, xp=xp) for user_id, xp in
+                [("top", 500), ("new", 200), ("last", 100)]])
+    manager, sockets = _connected_manager("top", "last")
+    
+    asyncio.run(push_rank_change(RankChange(user_id="new", xp=200, previous_rank=None, rank=2),
+                                 store=store, connections=manager))
+    
+    assert _sent(sockets["top"]) == []
+    assert [message["rank"] for message in _sent(sockets["last"])] == [3]
+
+
+def test_push_rank_change_notifies_players_tied_at_the_old_xp():
+    """Test passing a group tied with the mover's old XP moves the whole group down"""
+    import asyncio
+    from app.services.leaderboard import RankChange
+    from app.services.leaderboard_store import MemoryLeaderboardStore, StoredEntry
+    from app.websocket.rank_updates import push_rank_change
+    
+    store = MemoryLeaderboardStore()
+    store.load([StoredEntry(user_id=user_id, xp=xp) for user_id, xp in
+                [("a", 300), ("m", 200), ("b", 100), ("c", 100), ("d", 50)]])
+    manager, sockets = _connected_manager("a", "b", "c", "d")
+    
+    # "m" was tied with "b" and "c" at rank 2
+    asyncio.run(push_rank_change(RankChange(user_id="m", xp=200, previous_rank=2, rank=2, previous_xp=100),
+                                 store=store, connections=manager))
+    
+    for user_id in ("b", "c"):
+        assert _sent(sockets[user_id]) == [
+            {"type": "rank_update", "user_id": user_id, "xp": 100, "rank": 3, "previous_rank": 2}
+        ]
+    assert _sent(sockets["a"]) == [] and _sent(sockets["d"]) == []